@@ -0,0 +1,122 @@
+import os
+import re
+import sys
+import time
+import shutil
+import random
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import collect_data
+
+################################
+# Synthetic reports
+################################
+
+# A 6_report.log of about "size_mb" MB: report_checks paths around a
+# report_power table, design area and instance_count, like the finish report
+def write_report(path, size_mb, rnd):
+    path_line = "  0.{:04d}    0.{:04d} ^ _{:06d}_/CLK (sky130_fd_sc_hs__dfxtp_1)\n"
+    num_lines = int(size_mb * 1024 * 1024 / len(path_line.format(0, 0, 0)))
+    with open(path, "w") as wf:
+        wf.write("==========================================================================\n")
+        wf.write("finish report_tns\n--------------------------------------------------------------------------\n")
+        wf.write("tns {:.2f}\n\n".format(-rnd.random() * 100))
+        wf.write("finish report_wns\n--------------------------------------------------------------------------\n")
+        wf.write("wns {:.2f}\n\n".format(-rnd.random()))
+        for i in range(num_lines // 2):
+            wf.write(path_line.format(i % 10000, (i * 7) % 10000, i))
+        wf.write("finish report_power\n--------------------------------------------------------------------------\n")
+        wf.write("Group                  Internal  Switching    Leakage      Total\n")
+        wf.write("                          Power      Power      Power      Power (Watts)\n")
+        for group in ["Sequential", "Combinational", "Macro", "Pad"]:
+            wf.write("{:<20} {:.2e} {:.2e} {:.2e} {:.2e} {:.1f}%\n".format(group, *[rnd.random() * 1e-3 for _ in range(4)], 25.0))
+        wf.write("----------------------------------------------------------------\n")
+        wf.write("Total                {:.2e} {:.2e} {:.2e} {:.2e} 100.0%\n".format(*[rnd.random() * 1e-3 for _ in range(4)]))
+        wf.write("                     40.0%    50.0%    10.0%\n\n")
+        for i in range(num_lines // 2, num_lines):
+            wf.write(path_line.format(i % 10000, (i * 7) % 10000, i))
+        wf.write("Design area 123456 u^2 45% utilization.\n\n")
+        wf.write("instance_count\n--------------------------------------------------------------------------\n")
+        wf.write("{:d}\n".format(rnd.randint(10000, 100000)))
+
+
+def write_design(design, size_mb, rnd):
+    log_folder = os.path.join(design, "logs", collect_data.PLATFORM, collect_data.DESIGN)
+    os.makedirs(log_folder)
+    for step in ["2_1_floorplan", "3_3_resizer", "4_1_cts"]:
+        with open(os.path.join(log_folder, step + ".log"), "w") as wf:
+            wf.write("Loading design\n" * 1000)
+            wf.write("tns {:.2f}\nwns {:.2f}\n".format(-rnd.random() * 100, -rnd.random()))
+    with open(os.path.join(log_folder, "4_2_cts_fillcell.log"), "w") as wf:
+        wf.write("Placed {:d} filler instances.\n".format(rnd.randint(100, 1000)))
+    write_report(os.path.join(log_folder, "6_report.log"), size_mb, rnd)
+
+################################
+# Benchmark
+################################
+
+# The whole-file regexes collect_data.py used before its block parsers
+def regex_report(log_file):
+    with open(log_file, "r") as rf:
+        filedata = rf.read()
+    tns_group = re.search("tns (.*)", filedata)
+    wns_group = re.search("wns (.*)", filedata)
+    power_group = re.search("report_power(\n.*)*(Total .*)", filedata)
+    instance_group = re.search("instance_count(\n.*)\n(\d+)", filedata)
+    return [tns_group.group(1), wns_group.group(1), power_group.group(2), instance_group.group(2)]
+
+
+# Values, time and peak of allocated memory, which is measured in a second
+# pass as tracing slows down the allocations
+def measure(extract, log_files):
+    start = time.perf_counter()
+    values = [extract(log_file) for log_file in log_files]
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    extract(log_files[0])
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return values, elapsed, peak
+
+
+def parse_args():
+  parser = argparse.ArgumentParser(description='Time the 6_report.log parsing of collect_data.py on synthetic reports')
+  parser.add_argument('--designs', type=int, default=5, help='Number of synthetic designs')
+  parser.add_argument('--size', type=float, default=8, help='Size of each 6_report.log in MB')
+  parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic values')
+  return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    rnd = random.Random(args.seed)
+    root = tempfile.mkdtemp(prefix="bench_collect_data_")
+    try:
+        designs = [os.path.join(root, "ctest", "design{:d}".format(i)) for i in range(args.designs)]
+        for design in designs:
+            write_design(design, args.size, rnd)
+        log_files = [os.path.join(design, "logs", collect_data.PLATFORM, collect_data.DESIGN, "6_report.log")
+                     for design in designs]
+
+        old_values, old_elapsed, old_peak = measure(regex_report, log_files)
+        new_values, new_elapsed, new_peak = measure(collect_data.extract_report, log_files)
+        if old_values != new_values:
+            print("Values differ: {} != {}".format(old_values, new_values))
+            sys.exit(1)
+        print("{:d} reports of {:.1f} MB".format(args.designs, args.size))
+        for name, elapsed, peak in [("regex", old_elapsed, old_peak), ("block parsers", new_elapsed, new_peak)]:
+            print("{:<14}{:8.1f} ms per report {:8.1f} MB/s {:8.1f} MiB peak".format(
+                  name, 1000 * elapsed / args.designs, args.designs * args.size / elapsed, peak / 2**20))
+
+        # the whole collection, for its output files
+        cwd = os.getcwd()
+        os.chdir(root)
+        start = time.perf_counter()
+        collect_data.collect(designs)
+        print("collect: {:.1f} ms per design".format(1000 * (time.perf_counter() - start) / args.designs))
+        os.chdir(cwd)
+    finally:
+        shutil.rmtree(root)
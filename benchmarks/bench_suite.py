@@ -0,0 +1,327 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import datetime
+import platform
+import tempfile
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+import results_store
+import gen_corpus
+
+################################
+# Suite settings
+################################
+
+# Phases of a sweep, in the order they run on the synthetic corpus. Each one
+# runs in its own process started in the corpus root, so that its peak RSS
+# is its own; its time is measured around the work only, without the imports
+# and the loading of the plan.
+#   sample             run_design.py: LHS samples, dedupe, ledger plan
+#   render             run_design.py: templates and the flow files of every run
+#   harvest            run_design.py: move into ./data, manifest, harvest policy
+#   extract            genMetrics_bigDoE.py --force on ./data
+#   extract_unchanged  genMetrics_bigDoE.py again, nothing changed
+#   collect            collect_data.py on ./data
+#   store              results_store.py import of the data index and metrics
+#   profile            profile_sweep.py on ./data
+PHASES = ["sample", "render", "harvest", "extract", "extract_unchanged", "collect", "store", "profile"]
+
+# Results of the runs the suite is compared with, written by --save-baseline.
+# Throughput and peaks depend on the machine, a baseline is only meaningful
+# on the machine it was recorded on.
+BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+
+# Relative change of the throughput or peak RSS of a phase that is reported
+# as a regression
+TOLERANCE = 0.2
+
+# Folder of the suite files in the corpus root
+STATE_DIR = "bench_state"
+
+################################
+# Phases
+################################
+
+# The imports of the phases are done in their own process only
+
+def load_plan():
+    import run_design
+    ledger = run_design.open_ledger(run_design.LEDGER_FILE)
+    run_design.ledger = ledger
+    run_design.attrs_names, run_design.knobs_list = run_design.load_plan(ledger)
+    return run_design
+
+
+def get_data_folders():
+    return sorted(it.path for it in os.scandir("./data")
+                  if it.is_dir() and os.path.isfile(os.path.join(it.path, results_store.RUN_MANIFEST)))
+
+
+def run_script(script, script_args):
+    # the stub of gen_corpus answers the openroad version query
+    env = dict(os.environ, PATH=os.path.abspath("bin") + os.pathsep + os.environ.get("PATH", ""))
+    start = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(REPO_DIR, script)] + script_args, env=env, check=True)
+    return time.perf_counter() - start
+
+
+def phase_sample(config):
+    import numpy as np
+    import run_design
+    os.makedirs(run_design.SWEEP_DIR)
+    run_design.LHS_SAMPLES = config["runs"]
+    np.random.seed(config["seed"])
+    start = time.perf_counter()
+    attrs_names, knobs_list = run_design.prepare_samples()
+    run_design.attrs_names = attrs_names
+    knobs_list, multiplicity = run_design.dedupe_knobs(knobs_list)
+    run_design.save_plan(run_design.open_ledger(run_design.LEDGER_FILE), attrs_names, knobs_list, multiplicity)
+    run_design.log_knobs(knobs_list)
+    return len(knobs_list), time.perf_counter() - start
+
+
+def phase_render(config):
+    run_design = load_plan()
+    os.makedirs(run_design.FLOW_DIR)
+    os.makedirs(run_design.RUNS_DIR)
+    run_design.tool_versions = {"synth": run_design.get_tool_version(["yosys", "-V"])}
+    run_design.stage_sources = {"synth": []}
+    for source_file in ["./designs/" + run_design.PLATFORM + "/" + run_design.DESIGN + "/config.mk", run_design.PLATFORM_DIR + "/config.mk"]:
+        with open(source_file, "r") as rf:
+            run_design.stage_sources["synth"].append(rf.read())
+
+    start = time.perf_counter()
+    run_design.templates = run_design.load_templates()
+    workspaces = []
+    for idx, knobs in enumerate(run_design.knobs_list):
+        workspace = run_design.RUNS_DIR + "/run" + str(idx)
+        os.mkdir(workspace)
+        cache_keys, flow_files = run_design.setup_run(workspace, knobs)
+        workspaces.append((workspace, flow_files))
+    elapsed = time.perf_counter() - start
+
+    # for the corpus generation and the harvest
+    with open(os.path.join(STATE_DIR, "workspaces.json"), "w") as wf:
+        json.dump([[workspace, flow_files, dict(zip(run_design.attrs_names, knobs))]
+                   for (workspace, flow_files), knobs in zip(workspaces, run_design.knobs_list.tolist())], wf)
+    return len(workspaces), elapsed
+
+
+# "drop" rules, if enabled in HARVEST_POLICY, extract the metrics of every run
+# first, which is measured by the extract phase
+def phase_harvest(config):
+    run_design = load_plan()
+    run_design.store = results_store.open_store(run_design.RESULTS_STORE)
+    run_design.HARVEST_POLICY = [(pattern, action) for pattern, action in run_design.HARVEST_POLICY if action != "drop"]
+    os.makedirs("./data", exist_ok=True)
+    with open(os.path.join(STATE_DIR, "workspaces.json"), "r") as rf:
+        workspaces = json.load(rf)
+
+    start = time.perf_counter()
+    for idx, (workspace, flow_files, knobs) in enumerate(workspaces):
+        target_folder = run_design.harvest_run(workspace, idx, flow_files)
+        run_design.set_run_state(run_design.ledger, idx, "done", end=time.time(), exit_code=0, target_folder=target_folder)
+        run_design.record_run(run_design.ledger, idx, target_folder, flow_files)
+        run_design.apply_harvest_policy(target_folder)
+    return len(workspaces), time.perf_counter() - start
+
+
+def phase_extract(config):
+    return len(get_data_folders()), run_script("genMetrics_bigDoE.py", ["--force", "-j", str(config["jobs"])])
+
+
+def phase_extract_unchanged(config):
+    return len(get_data_folders()), run_script("genMetrics_bigDoE.py", ["-j", str(config["jobs"])])
+
+
+def phase_collect(config):
+    import collect_data
+    collect_data.PLATFORM = gen_corpus.PLATFORM
+    collect_data.DESIGN = gen_corpus.DESIGN
+    designs = get_data_folders()
+    start = time.perf_counter()
+    collect_data.collect(designs)
+    return len(designs), time.perf_counter() - start
+
+
+def phase_store(config):
+    db = results_store.open_store(os.path.join(STATE_DIR, "store.db"))
+    start = time.perf_counter()
+    results_store.import_index(db, results_store.DATA_INDEX)
+    num_runs = results_store.import_metrics(db, "./data")
+    return num_runs, time.perf_counter() - start
+
+
+def phase_profile(config):
+    return len(get_data_folders()), run_script("profile_sweep.py", ["--output", "./doe_profile"])
+
+
+PHASE_FUNCTIONS = {"sample": phase_sample, "render": phase_render, "harvest": phase_harvest,
+                   "extract": phase_extract, "extract_unchanged": phase_extract_unchanged,
+                   "collect": phase_collect, "store": phase_store, "profile": phase_profile}
+
+################################
+# Suite
+################################
+
+# Run "phase" in its own process; returns its runs, time, throughput in
+# runs/s and the peak RSS in MiB of its largest process
+def run_phase(root, phase):
+    log_file = os.path.join(root, STATE_DIR, phase + ".log")
+    with open(log_file, "w") as lf:
+        p = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--phase", phase, "--root", root],
+                             cwd=root, stdout=lf, stderr=subprocess.STDOUT)
+        # the rusage of the phase includes the processes it waited for
+        pid, status, rusage = os.wait4(p.pid, 0)
+    p.returncode = os.waitstatus_to_exitcode(status)
+    if p.returncode != 0:
+        with open(log_file, "r") as rf:
+            print(rf.read()[-4000:])
+        print("Phase " + phase + " failed with exit code {:d}, see {}".format(p.returncode, log_file))
+        sys.exit(1)
+    with open(os.path.join(root, STATE_DIR, phase + ".json"), "r") as rf:
+        result = json.load(rf)
+    result["throughput"] = result["runs"] / max(result["time"], 1e-9)
+    result["peak_rss"] = rusage.ru_maxrss / 1024
+    return result
+
+
+# Runs of every run_design.py workspace, written between the render and the
+# harvest phases like the flow would
+def generate(root, config):
+    rnd = random.Random(config["seed"])
+    route_logs = gen_corpus.write_route_logs(os.path.join(root, STATE_DIR, "route_logs"), config["route_logs"],
+                                             config["route_log_mb"], rnd)
+    with open(os.path.join(root, STATE_DIR, "workspaces.json"), "r") as rf:
+        workspaces = json.load(rf)
+    ends = gen_corpus.get_run_ends(len(workspaces))
+    for idx, (workspace, flow_files, knobs) in enumerate(workspaces):
+        gen_corpus.write_run(os.path.join(root, workspace), knobs, rnd, ends[idx], route_logs[idx % len(route_logs)],
+                             config["log_kb"], config["report_log_mb"], config["result_kb"])
+
+
+# Relative changes of "result" to "base", and whether they are regressions
+def compare(result, base, tolerance):
+    throughput = result["throughput"] / max(base["throughput"], 1e-9) - 1
+    peak_rss = result["peak_rss"] / max(base["peak_rss"], 1e-9) - 1
+    flags = []
+    if throughput < -tolerance:
+        flags.append("SLOWER")
+    if peak_rss > tolerance:
+        flags.append("MORE MEMORY")
+    return throughput, peak_rss, flags
+
+
+def print_results(results, baseline, tolerance):
+    print("{:<18}{:>8}{:>10}{:>12}{:>10}".format("phase", "runs", "time s", "runs/s", "peak MiB") +
+          ("   vs baseline runs/s, peak" if baseline else ""))
+    regressions = []
+    for phase, result in results.items():
+        line = "{:<18}{:>8d}{:>10.2f}{:>12.1f}{:>10.1f}".format(phase, result["runs"], result["time"], result["throughput"], result["peak_rss"])
+        base = baseline["phases"].get(phase) if baseline else None
+        if base is not None:
+            throughput, peak_rss, flags = compare(result, base, tolerance)
+            line += "   {:+7.1%} {:+7.1%} {}".format(throughput, peak_rss, " ".join(flags))
+            if flags:
+                regressions.append(phase)
+        print(line)
+    return regressions
+
+
+def get_config(args):
+    return {"runs": args.runs, "seed": args.seed, "jobs": args.jobs, "route_log_mb": args.route_log_mb,
+            "route_logs": args.route_logs, "report_log_mb": args.report_log_mb, "log_kb": args.log_kb,
+            "result_kb": args.result_kb}
+
+
+def parse_args():
+  parser = argparse.ArgumentParser(description='Time sampling, rendering, harvest and metrics extraction of the DOE scripts on a synthetic sweep, against a stored baseline')
+  parser.add_argument('--runs', type=int, default=1000, help='Number of runs of the synthetic sweep (1k to 100k)')
+  parser.add_argument('--route-log-mb', type=float, default=4, help='Size of each 5_2_TritonRoute.log in MB')
+  parser.add_argument('--route-logs', type=int, default=8, help='Distinct route logs, hardlinked into the runs')
+  parser.add_argument('--report-log-mb', type=float, default=0.25, help='Size of each 6_report.log in MB')
+  parser.add_argument('--log-kb', type=int, default=16, help='Size of the other step logs in KB')
+  parser.add_argument('--result-kb', type=int, default=32, help='Size of each results file in KB')
+  parser.add_argument('--seed', type=int, default=0, help='Seed of the samples and the synthetic values')
+  parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count(), help='Workers of genMetrics_bigDoE.py')
+  parser.add_argument('--root', default=None, help='Folder of the synthetic sweep, a temporary folder by default')
+  parser.add_argument('--keep', action='store_true', help='Keep the synthetic sweep')
+  parser.add_argument('--baseline', default=BASELINE, help='Baseline results to compare with')
+  parser.add_argument('--save-baseline', action='store_true', help='Save the results as the baseline instead of comparing')
+  parser.add_argument('--tolerance', type=float, default=TOLERANCE, help='Relative change reported as a regression')
+  parser.add_argument('--output', '-o', default=None, help='Also write the results to this JSON file')
+  parser.add_argument('--phase', default=None, choices=PHASES, help=argparse.SUPPRESS)
+  return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if args.phase is not None:
+        os.chdir(args.root)
+        with open(os.path.join(STATE_DIR, "config.json"), "r") as rf:
+            config = json.load(rf)
+        num_runs, elapsed = PHASE_FUNCTIONS[args.phase](config)
+        with open(os.path.join(STATE_DIR, args.phase + ".json"), "w") as wf:
+            json.dump({"runs": num_runs, "time": elapsed}, wf)
+        sys.exit(0)
+
+    config = get_config(args)
+    baseline = None
+    if not args.save_baseline and os.path.isfile(args.baseline):
+        with open(args.baseline, "r") as rf:
+            baseline = json.load(rf)
+        if baseline["config"] != config:
+            print("[WARN] " + args.baseline + " was recorded with " + json.dumps(baseline["config"]))
+
+    if args.root is not None:
+        os.makedirs(args.root)
+        root = os.path.abspath(args.root)
+    else:
+        root = tempfile.mkdtemp(prefix="bench_suite_")
+    try:
+        os.makedirs(os.path.join(root, STATE_DIR))
+        with open(os.path.join(root, STATE_DIR, "config.json"), "w") as wf:
+            json.dump(config, wf)
+        gen_corpus.check_space(root, args.runs * gen_corpus.get_run_size(args.log_kb, args.report_log_mb, args.result_kb) +
+                               args.route_logs * args.route_log_mb * 1024 * 1024)
+        gen_corpus.write_flow(root)
+
+        results = {}
+        for phase in PHASES:
+            if phase == "harvest":
+                start = time.perf_counter()
+                generate(root, config)
+                print("{:d} synthetic runs generated in {:.1f} s".format(args.runs, time.perf_counter() - start), flush=True)
+            results[phase] = run_phase(root, phase)
+            print("{}: {:.2f} s".format(phase, results[phase]["time"]), flush=True)
+    finally:
+        if args.keep:
+            print("Synthetic sweep kept in " + root)
+        else:
+            shutil.rmtree(root)
+
+    print("{:d} runs, {:.1f} MB route logs, {:d} genMetrics workers".format(args.runs, args.route_log_mb, args.jobs))
+    regressions = print_results(results, baseline, args.tolerance)
+    record = {"config": config, "host": platform.node(), "cpus": os.cpu_count(), "python": platform.python_version(),
+              "date": datetime.datetime.now().strftime("%Y-%m-%d %H:%M"), "phases": results}
+    if args.output:
+        with open(args.output, "w") as wf:
+            json.dump(record, wf, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as wf:
+            json.dump(record, wf, indent=2)
+        print("Baseline saved to " + args.baseline)
+    elif baseline is None:
+        print("No baseline in " + args.baseline + ", save one with --save-baseline")
+    elif regressions:
+        print("Regressions beyond {:.0%}: {}".format(args.tolerance, ", ".join(regressions)))
+        sys.exit(1)
@@ -0,0 +1,461 @@
+import os
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import results_store
+
+################################
+# Corpus settings
+################################
+
+# The synthetic runs are ibex on sky130hs, the defaults of run_design.py.
+# Their logs are in the formats genMetrics_bigDoE.py, collect_data.py and
+# profile_sweep.py parse: tns/wns/worst slack lines, the report_power table,
+# instance_count, the report_clock_skew Latency sections, TritonRoute totals
+# and the GNU time line ending every step log.
+PLATFORM = "sky130hs"
+DESIGN = "ibex"
+DESIGN_NAME = "ibex_core"
+
+# Step logs of a run: (step, share of the run wall time, CPU %, peak MB)
+STEPS = [
+    ("1_1_yosys", 0.08, 99, 600),
+    ("2_1_floorplan", 0.02, 99, 350),
+    ("2_4_mplace", 0.01, 99, 300),
+    ("3_1_place_gp", 0.10, 390, 700),
+    ("3_2_place_iop", 0.01, 99, 320),
+    ("3_3_resizer", 0.06, 99, 650),
+    ("3_4_opendp", 0.03, 99, 500),
+    ("4_1_cts", 0.09, 99, 800),
+    ("4_2_cts_fillcell", 0.01, 99, 450),
+    ("5_1_fastroute", 0.12, 99, 1200),
+    ("5_2_TritonRoute", 0.42, 395, 3200),
+    ("6_report", 0.05, 99, 900),
+]
+
+# Concurrent runs of the sweep the step times are laid out for
+SLOTS = 96
+
+################################
+# Flow tree
+################################
+
+# Platform, design and scripts of the flow, just enough for load_templates()
+# and setup_run() of run_design.py to render them
+FLOW_FILES = {
+    "platforms/sky130hs/config.mk": (
+        "export PROCESS = 130\n"
+        "export PLATFORM = sky130hs\n"
+        "export TECH_LEF = $(PLATFORM_DIR)/lef/sky130_fd_sc_hs.tlef\n"
+        "export SC_LEF = $(PLATFORM_DIR)/lef/sky130_fd_sc_hs_merged.lef\n"
+        "export LIB_FILES = $(PLATFORM_DIR)/lib/sky130_fd_sc_hs__tt_025C_1v80.lib\n"
+        "export GDS_FILES = $(PLATFORM_DIR)/gds/sky130_fd_sc_hs.gds\n"
+        "export PLACE_SITE = unit\n"
+        "export CELL_PAD_IN_SITES_GLOBAL_PLACEMENT ?= 4\n"
+        "export CELL_PAD_IN_SITES_DETAIL_PLACEMENT ?= 2\n"
+        "export MIN_ROUTING_LAYER = met1\n"
+        "export MAX_ROUTING_LAYER = met5\n"
+        "export FASTROUTE_TCL = $(PLATFORM_DIR)/fastroute.tcl\n"
+        "export FILL_CELLS ?= sky130_fd_sc_hs__fill_1 sky130_fd_sc_hs__fill_2 sky130_fd_sc_hs__fill_4 sky130_fd_sc_hs__fill_8\n"),
+    "platforms/sky130hs/fastroute.tcl": (
+        "set_global_routing_layer_adjustment $::env(MIN_ROUTING_LAYER)-$::env(MAX_ROUTING_LAYER) 0.5\n"
+        "set_routing_layers -signal $::env(MIN_ROUTING_LAYER)-$::env(MAX_ROUTING_LAYER)\n"
+        "global_route -guide_file $::env(RESULTS_DIR)/route.guide \\\n"
+        "             -congestion_iterations 100 \\\n"
+        "             -verbose 2\n"),
+    "designs/sky130hs/ibex/config.mk": (
+        "export DESIGN_NICKNAME = ibex\n"
+        "export DESIGN_NAME = ibex_core\n"
+        "export PLATFORM    = sky130hs\n"
+        "export VERILOG_FILES = $(sort $(wildcard ./designs/src/$(DESIGN_NICKNAME)/*.v))\n"
+        "export SDC_FILE      = ./designs/$(PLATFORM)/$(DESIGN_NICKNAME)/constraint.sdc\n"
+        "export DIE_AREA    = 0 0 1000 1000\n"
+        "export CORE_AREA   = 10 10 990 990\n"),
+    "designs/sky130hs/ibex/constraint.sdc": (
+        "current_design ibex_core\n"
+        "set clk_name  core_clock\n"
+        "set clk_port_name clk_i\n"
+        "create_clock -name core_clock -period 6.0 -waveform {0 3.0} [get_ports clk_i]\n"
+        "set_input_delay 1.2 -clock core_clock [all_inputs]\n"
+        "set_output_delay 1.2 -clock core_clock [all_outputs]\n"),
+    "scripts/synth.tcl": (
+        "yosys -import\n"
+        "read_verilog -defer -sv $::env(VERILOG_FILES)\n"
+        "synth -top $::env(DESIGN_NAME) -flatten\n"
+        "opt -purge\n"
+        "abc -D [expr $::env(ABC_CLOCK_PERIOD_IN_PS)] -constr $::env(OBJECTS_DIR)/abc.constr\n"
+        "write_verilog -noattr -noexpr -nohex -nodec $::env(RESULTS_DIR)/1_1_yosys.v\n"),
+    "scripts/io_placement.tcl": (
+        "source $::env(SCRIPTS_DIR)/load.tcl\n"
+        "load_design 3_1_place_gp_skip_io.odb 2_floorplan.sdc\n"
+        "place_pins -hor_layers $::env(IO_PLACER_H) \\\n"
+        "           -ver_layers $::env(IO_PLACER_V)\n"
+        "write_db $::env(RESULTS_DIR)/3_2_place_iop.odb\n"),
+    "scripts/cts.tcl": (
+        "source $::env(SCRIPTS_DIR)/load.tcl\n"
+        "load_design 3_place.odb 3_place.sdc\n"
+        "set cluster_size 30\n"
+        "set cluster_diameter 100\n"
+        "clock_tree_synthesis -root_buf $::env(CTS_BUF_CELL) -buf_list $::env(CTS_BUF_CELL) \\\n"
+        "                     -sink_clustering_enable \\\n"
+        "                     -sink_clustering_size $cluster_size \\\n"
+        "                     -sink_clustering_max_diameter $cluster_diameter\n"
+        "report_clock_skew\n"),
+}
+
+MAKEFILE = """DESIGN_CONFIG ?= ./designs/sky130hs/ibex/config.mk
+
+default: finish
+
+include $(DESIGN_CONFIG)
+export PLATFORM_DIR = ./platforms/$(PLATFORM)
+include $(PLATFORM_DIR)/config.mk
+export DESIGN_NICKNAME ?= $(DESIGN_NAME)
+export LOG_DIR     = ./logs/$(PLATFORM)/$(DESIGN_NICKNAME)
+export OBJECTS_DIR = ./objects/$(PLATFORM)/$(DESIGN_NICKNAME)
+export REPORTS_DIR = ./reports/$(PLATFORM)/$(DESIGN_NICKNAME)
+export RESULTS_DIR = ./results/$(PLATFORM)/$(DESIGN_NICKNAME)
+export SCRIPTS_DIR = ./scripts
+SYNTH_SCRIPT ?= scripts/synth.tcl
+TIME_CMD = /usr/bin/time -f "%Eelapsed %PCPU %MmemKB"
+OPENROAD_CMD = openroad -exit -no_init
+
+$(RESULTS_DIR)/1_1_yosys.v:
+\tmkdir -p $(RESULTS_DIR) $(LOG_DIR) $(REPORTS_DIR)
+\t($(TIME_CMD) yosys -c $(SYNTH_SCRIPT)) 2>&1 | tee $(LOG_DIR)/1_1_yosys.log
+synth: $(RESULTS_DIR)/1_1_yosys.v
+
+$(RESULTS_DIR)/3_2_place_iop.odb: $(RESULTS_DIR)/3_1_place_gp_skip_io.odb
+\t($(TIME_CMD) $(OPENROAD_CMD) $(SCRIPTS_DIR)/io_placement.tcl) 2>&1 | tee $(LOG_DIR)/3_2_place_iop.log
+
+$(RESULTS_DIR)/4_1_cts.odb: $(RESULTS_DIR)/3_place.odb
+\t($(TIME_CMD) $(OPENROAD_CMD) $(SCRIPTS_DIR)/cts.tcl) 2>&1 | tee $(LOG_DIR)/4_1_cts.log
+cts: $(RESULTS_DIR)/4_1_cts.odb
+
+$(RESULTS_DIR)/5_1_grt.odb: $(RESULTS_DIR)/4_cts.odb
+\t($(TIME_CMD) $(OPENROAD_CMD) $(SCRIPTS_DIR)/global_route.tcl) 2>&1 | tee $(LOG_DIR)/5_1_fastroute.log
+route: $(RESULTS_DIR)/5_1_grt.odb
+
+finish: $(REPORTS_DIR)/6_final_report.rpt
+"""
+
+# openroad on the PATH of genMetrics_bigDoE.py, which only asks its version
+OPENROAD_STUB = "#!/bin/sh\necho v2.0-bench synthetic\n"
+
+
+def write_flow(root):
+    for path, filedata in FLOW_FILES.items():
+        os.makedirs(os.path.join(root, os.path.dirname(path)), exist_ok=True)
+        with open(os.path.join(root, path), "w") as wf:
+            wf.write(filedata)
+    with open(os.path.join(root, "Makefile"), "w") as wf:
+        wf.write(MAKEFILE)
+    os.makedirs(os.path.join(root, "bin"), exist_ok=True)
+    with open(os.path.join(root, "bin", "openroad"), "w") as wf:
+        wf.write(OPENROAD_STUB)
+    os.chmod(os.path.join(root, "bin", "openroad"), 0o755)
+
+################################
+# Synthetic logs
+################################
+
+def format_elapsed(seconds):
+    minutes, seconds = divmod(seconds, 60)
+    if minutes >= 60:
+        return "{:d}:{:02d}:{:02d}".format(int(minutes // 60), int(minutes % 60), int(seconds))
+    return "{:d}:{:05.2f}".format(int(minutes), seconds)
+
+
+# Lines of the tool chatter around the values, "size" bytes of them
+def filler(tool, size, rnd):
+    lines = []
+    total = 0
+    i = 0
+    while total < size:
+        line = "[INFO {}-{:04d}] {} {:d} {:.3f}\n".format(tool, rnd.randint(1, 400), rnd.choice(
+            ["Iteration", "Overflow", "HPWL", "Processing", "Inserted", "Repaired"]), i, rnd.random() * 1000)
+        lines.append(line)
+        total += len(line)
+        i += 1
+    return "".join(lines)
+
+
+def timing_lines(tns, wns):
+    return ("report_tns\n--------------------------------------------------------------------------\n"
+            "tns {:.2f}\n\n"
+            "report_wns\n--------------------------------------------------------------------------\n"
+            "wns {:.2f}\n\n"
+            "report_worst_slack\n--------------------------------------------------------------------------\n"
+            "worst slack {:.2f}\n\n").format(tns, wns, wns)
+
+
+def design_area_lines(area, util):
+    return "Design area {:.0f} u^2 {:.0f}% utilization.\n".format(area, util)
+
+
+# report_clock_skew as read by get_skew_latency: a Latency section per clock
+def skew_lines(latency, skew):
+    return ("Clock core_clock\n"
+            "Latency      CRPR       Skew\n"
+            "_24104_/CLK ^\n"
+            "   {:.2f}\n"
+            "_23800_/CLK ^\n"
+            "   {:.2f}      0.00       {:.2f}\n\n").format(latency, latency - skew, skew)
+
+
+def power_lines(rnd):
+    rows = ["Group                  Internal  Switching    Leakage      Total\n",
+            "                          Power      Power      Power      Power (Watts)\n",
+            "----------------------------------------------------------------\n"]
+    total = [0.0] * 4
+    for group in ["Sequential", "Combinational", "Macro", "Pad"]:
+        values = [rnd.random() * 1e-3, rnd.random() * 1e-3, rnd.random() * 1e-8, 0.0]
+        values[3] = sum(values[:3])
+        total = [t + v for t, v in zip(total, values)]
+        rows.append("{:<20} {:.2e} {:.2e} {:.2e} {:.2e} {:.1f}%\n".format(group, *values, 25.0))
+    rows.append("----------------------------------------------------------------\n")
+    rows.append("Total                {:.2e} {:.2e} {:.2e} {:.2e} 100.0%\n".format(*total))
+    rows.append("                     40.0%      59.9%       0.1%\n\n")
+    return "finish report_power\n--------------------------------------------------------------------------\n" + "".join(rows)
+
+
+# A 5_2_TritonRoute.log of about "size_mb" MB: optimization iterations with
+# their violation tables, then the wire length and via totals
+def write_route_log(path, size_mb, rnd):
+    layers = ["li1", "mcon", "met1", "via", "met2", "via2", "met3", "via3", "met4", "via4", "met5"]
+    size = int(size_mb * 1024 * 1024)
+    with open(path, "w") as wf:
+        wf.write("[INFO DRT-0149] Reading tech and libs.\n[INFO DRT-0150] Reading design.\n")
+        written = 0
+        iteration = 0
+        violations = rnd.randint(20000, 40000)
+        while written < size:
+            block = ["[INFO DRT-0195] Start {:d}th optimization iteration.\n".format(iteration)]
+            for percent in range(10, 110, 10):
+                block.append("    Completing {:d}% with {:d} violations.\n".format(percent, violations))
+                block.append("    elapsed time = 00:{:02d}:{:02d}, memory = {:.2f} (MB).\n".format(
+                             rnd.randint(0, 59), rnd.randint(0, 59), 2000 + rnd.random() * 1000))
+            block.append("[INFO DRT-0199]   Number of violations = {:d}.\n".format(violations))
+            block.append("Viol/Layer        " + "".join("{:>7}".format(layer) for layer in layers) + "\n")
+            for kind in ["Cut Spacing", "Metal Spacing", "Min Hole", "Recheck", "Short"]:
+                block.append("{:<18}".format(kind) + "".join("{:>7d}".format(rnd.randint(0, violations // 50 + 1)) for layer in layers) + "\n")
+            for i in range(200):
+                block.append("[WARNING DRT-0349] LEF58_ENCLOSURE with no CUTCLASS is not supported. Skipping for layer via{:d}\n".format(i % 4 + 1))
+            block = "".join(block)
+            wf.write(block)
+            written += len(block)
+            iteration += 1
+            violations = max(0, violations // 3 - rnd.randint(0, 10))
+        wf.write("[INFO DRT-0198] Complete detail routing.\n")
+        wire_length = 0
+        for layer in layers[::2]:
+            length = rnd.randint(10000, 400000)
+            wire_length += length
+            wf.write("Total wire length on LAYER {} = {:d} um.\n".format(layer, length))
+        wf.write("total wire length = {:d} um\n".format(wire_length))
+        wf.write("total number of vias = {:d}\n".format(rnd.randint(50000, 150000)))
+        wf.write("[INFO DRT-0267] cpu time = 01:32:10, elapsed time = 00:24:05, memory = 3125.12 (MB), peak = 3276.50 (MB)\n")
+        wf.write("24:05.31elapsed 395%CPU {:d}memKB\n".format(rnd.randint(3000000, 3500000)))
+
+
+# Distinct route logs, hardlinked into the runs by write_run so that large
+# corpora fit on disk. Runs sharing a route log also share its GNU time line
+# and mtime.
+def write_route_logs(folder, count, size_mb, rnd):
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for i in range(count):
+        path = os.path.join(folder, "5_2_TritonRoute_{:d}.log".format(i))
+        write_route_log(path, size_mb, rnd)
+        paths.append(path)
+    return paths
+
+################################
+# Synthetic runs
+################################
+
+# Logs, reports, results and objects of a finished run with knob values
+# "knobs" (attribute -> value) in "workspace". The QoR follows the knobs like
+# a real sweep does: timing gets worse away from 30% utilization and 0.8
+# placement density, routing gets slower with density. The step logs end
+# at "end" (epoch seconds) and are "log_kb" KB of chatter each, 6_report.log
+# is "report_mb" MB and results files "result_kb" KB.
+def write_run(workspace, knobs, rnd, end, route_log, log_kb=16, report_mb=0.25, result_kb=32):
+    folders = {folder: os.path.join(workspace, folder, PLATFORM, DESIGN) for folder in ["logs", "reports", "results", "objects"]}
+    for folder in folders.values():
+        os.makedirs(folder, exist_ok=True)
+
+    utilization = knobs.get("CORE_UTILIZATION", 30)
+    density = knobs.get("PLACE_DENSITY", 0.8)
+    clock = knobs.get("CLK_PERIOD", 6.0)
+    penalty = ((utilization - 30) ** 2) / 100 + (density - 0.8) ** 2 * 10
+    wns = round(min(0.0, -penalty + rnd.gauss(0, 0.05)), 2)
+    tns = round(wns * rnd.randint(50, 500), 2)
+    area = 150000 * (1 + rnd.random() * 0.05)
+    instances = int(20000 + 2000 * rnd.random())
+    fillers = int(5000 * (1 - utilization / 100))
+    wall = 1800 * (1 + 2 * max(0.0, density - 0.7)) * (1 + rnd.random() * 0.2)
+
+    values = {
+        "1_1_yosys": "Number of cells: {:d}\n".format(instances),
+        "2_1_floorplan": timing_lines(tns * 0.5, wns * 0.5) + design_area_lines(area, utilization),
+        "2_4_mplace": "Extracted # Macros: 0\n",
+        "3_1_place_gp": "TargetDensity: {:.2f}\nTotal wirelength: {:.0f}\n".format(density, 4e6 * (1 + rnd.random())) + timing_lines(tns * 0.8, wns * 0.8),
+        "3_2_place_iop": "Num of I/O      264\n",
+        "3_3_resizer": ("Inserted {:d} input buffers.\nInserted {:d} output buffers.\nResized {:d} instances.\n".format(
+                        rnd.randint(100, 300), rnd.randint(100, 300), rnd.randint(1000, 5000)) +
+                        timing_lines(tns * 0.8, wns * 0.8) + design_area_lines(area, utilization) +
+                        "instance_count\n--------------------------------------------------------------------------\n{:d}\n".format(instances)),
+        "3_4_opendp": ("Placement Analysis\n---------------------------------\n"
+                       "total displacement       {:.1f} u\naverage displacement        {:.1f} u\nmax displacement         {:.1f} u\n"
+                       "original HPWL         {:.1f} u\nlegalized HPWL        {:.1f} u\n").format(
+                       rnd.random() * 1e5, rnd.random(), rnd.random() * 20, 4e6, 4.1e6) + timing_lines(tns * 0.9, wns * 0.9),
+        "4_1_cts": skew_lines(0.5 + rnd.random() * 0.2, rnd.random() * 0.1) + timing_lines(tns, wns),
+        "4_2_cts_fillcell": "Placed {:d} filler instances.\n".format(fillers),
+        "5_1_fastroute": timing_lines(tns * 1.1, wns * 1.1),
+        "6_report": None,
+    }
+
+    start = end - wall
+    for step, share, cpu, mem in STEPS:
+        path = os.path.join(folders["logs"], step + ".log")
+        elapsed = wall * share
+        start += elapsed
+        if step == "5_2_TritonRoute":
+            os.link(route_log, path)
+            continue
+        with open(path, "w") as wf:
+            if step == "6_report":
+                write_report(wf, report_mb, tns, wns, area, utilization, instances + fillers, rnd)
+            else:
+                wf.write(filler("GPL" if step.startswith("3") else "ORD", log_kb * 512, rnd))
+                wf.write(values[step])
+                wf.write(filler("RSZ" if step.startswith("3") else "ORD", log_kb * 512, rnd))
+            wf.write("{}elapsed {:d}%CPU {:d}memKB\n".format(format_elapsed(elapsed), cpu, int(mem * 1024 * (0.9 + rnd.random() * 0.2))))
+        os.utime(path, (start, start))
+
+    with open(os.path.join(folders["reports"], "synth_stat.txt"), "w") as wf:
+        wf.write("=== ibex_core ===\n\n   Number of wires:              {:d}\n   Number of cells:              {:d}\n\n"
+                 "   Chip area for module '\\ibex_core': {:.6f}\n".format(instances * 2, instances, area * 0.8))
+    with open(os.path.join(folders["reports"], "5_route_drc.rpt"), "w") as wf:
+        for i in range(rnd.randint(0, 3)):
+            wf.write("violation type: Short\n  srcs: net{:d} net{:d}\n  bbox = ( 10, 20 ) - ( 11, 21 ) on Layer met2\n".format(i, i + 1))
+    with open(os.path.join(folders["reports"], "6_final_report.rpt"), "w") as wf:
+        wf.write(timing_lines(tns, wns))
+    with open(os.path.join(folders["results"], "2_floorplan.sdc"), "w") as wf:
+        wf.write(FLOW_FILES["designs/sky130hs/ibex/constraint.sdc"].replace("6.0", "{:.4f}".format(clock)))
+    # netlist, DEF, GDS and database: compressible and unique to the run
+    for name in ["1_synth.v", "6_final.v", "6_final.def", "6_final.gds", "6_final.odb"]:
+        write_result(os.path.join(folders["results"], name), result_kb, rnd)
+    write_result(os.path.join(folders["objects"], "5_route.guide"), result_kb, rnd)
+
+
+def write_report(wf, size_mb, tns, wns, area, util, instances, rnd):
+    path_line = "  0.{:04d}    0.{:04d} ^ _{:06d}_/CLK (sky130_fd_sc_hs__dfxtp_1)\n"
+    num_lines = int(size_mb * 1024 * 1024 / len(path_line.format(0, 0, 0)))
+    wf.write(timing_lines(tns, wns))
+    for i in range(num_lines // 2):
+        wf.write(path_line.format(i % 10000, (i * 7) % 10000, i))
+    wf.write(power_lines(rnd))
+    for i in range(num_lines // 2, num_lines):
+        wf.write(path_line.format(i % 10000, (i * 7) % 10000, i))
+    wf.write(design_area_lines(area, util))
+    wf.write("\ninstance_count\n--------------------------------------------------------------------------\n{:d}\n".format(instances))
+
+
+def write_result(path, size_kb, rnd):
+    line = "    - _{:06d}_ sky130_fd_sc_hs__{} + PLACED ( {:d} {:d} ) N ;\n"
+    cells = ["nand2_1", "dfxtp_1", "buf_2", "inv_1", "a21oi_1", "o21ai_1"]
+    with open(path, "w") as wf:
+        written = 0
+        i = 0
+        while written < size_kb * 1024:
+            data = line.format(i, rnd.choice(cells), rnd.randint(0, 999999), rnd.randint(0, 999999))
+            wf.write(data)
+            written += len(data)
+            i += 1
+
+
+# Bytes written by write_run with the given sizes, route logs not included
+def get_run_size(log_kb, report_mb, result_kb):
+    return len(STEPS) * log_kb * 1024 + report_mb * 1024 * 1024 + 6 * result_kb * 1024 + 8192
+
+
+# End time of every run of a sweep of "num_runs" runs of about "wall"
+# seconds each, "SLOTS" runs at a time
+def get_run_ends(num_runs, wall=3000, now=None):
+    now = time.time() if now is None else now
+    num_waves = math.ceil(num_runs / SLOTS)
+    return [now - (num_waves - idx // SLOTS - 1) * wall - (idx % SLOTS) * 7 for idx in range(num_runs)]
+
+################################
+# Command line
+################################
+
+# A ./data corpus as harvested by run_design.py: a data folder per run with
+# its run.json manifest, and the data index
+def write_corpus(root, runs, rnd, route_logs, log_kb, report_mb, result_kb):
+    import numpy as np
+    import run_design
+    np.random.seed(rnd.randint(0, 2**31))
+    run_design.attrs_names = list(run_design.LHS_ATTRS)
+    knobs_list = run_design.lhs_to_knobs(run_design.sample_lhs(len(run_design.LHS_ATTRS), runs))
+    data_dir = os.path.join(root, "data")
+    os.makedirs(data_dir, exist_ok=True)
+    ends = get_run_ends(runs)
+    cwd = os.getcwd()
+    os.chdir(root)
+    try:
+        with open(results_store.DATA_INDEX, "a") as af:
+            for idx, knobs in enumerate(knobs_list.tolist()):
+                target_folder = run_design.get_target_folder(knobs)
+                knobs = dict(zip(run_design.attrs_names, knobs))
+                write_run(target_folder, knobs, rnd, ends[idx], route_logs[idx % len(route_logs)], log_kb, report_mb, result_kb)
+                manifest = {"folder": target_folder, "sweep": "bench_" + DESIGN + "_" + PLATFORM, "idx": idx,
+                            "design": DESIGN, "platform": PLATFORM, "design_name": DESIGN, "knobs": knobs,
+                            "multiplicity": 1, "state": "done", "exit_code": 0, "start": ends[idx] - 3000,
+                            "end": ends[idx], "files": {}}
+                with open(os.path.join(target_folder, results_store.RUN_MANIFEST), "w") as wf:
+                    json.dump(manifest, wf, indent=2)
+                af.write(json.dumps(manifest) + "\n")
+    finally:
+        os.chdir(cwd)
+
+
+def check_space(root, size):
+    free = shutil.disk_usage(root).free
+    if size > free:
+        print("The corpus needs {:.1f} GiB, only {:.1f} GiB are free in {}".format(size / 1024**3, free / 1024**3, root))
+        sys.exit(1)
+
+
+def parse_args():
+  parser = argparse.ArgumentParser(description='Write a synthetic ./data corpus of harvested runs, with the logs and manifests the DOE scripts read')
+  parser.add_argument('--output', '-o', required=True, help='Folder the flow files and ./data are written to')
+  parser.add_argument('--runs', type=int, default=1000, help='Number of runs')
+  parser.add_argument('--route-log-mb', type=float, default=4, help='Size of each 5_2_TritonRoute.log in MB')
+  parser.add_argument('--route-logs', type=int, default=8, help='Distinct route logs, hardlinked into the runs')
+  parser.add_argument('--report-log-mb', type=float, default=0.25, help='Size of each 6_report.log in MB')
+  parser.add_argument('--log-kb', type=int, default=16, help='Size of the other step logs in KB')
+  parser.add_argument('--result-kb', type=int, default=32, help='Size of each results file in KB')
+  parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic values')
+  return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    rnd = random.Random(args.seed)
+    os.makedirs(args.output, exist_ok=True)
+    check_space(args.output, args.runs * get_run_size(args.log_kb, args.report_log_mb, args.result_kb) +
+                args.route_logs * args.route_log_mb * 1024 * 1024)
+    start = time.perf_counter()
+    write_flow(args.output)
+    route_logs = write_route_logs(os.path.join(args.output, "route_logs"), args.route_logs, args.route_log_mb, rnd)
+    write_corpus(args.output, args.runs, rnd, route_logs, args.log_kb, args.report_log_mb, args.result_kb)
+    print("{:d} runs written to {} in {:.1f} s".format(args.runs, os.path.join(args.output, "data"), time.perf_counter() - start))
@@ -7,180 +7,257 @@ import os
 PLATFORM = "SKY130HS"
 DESIGN = "jpeg"
 
-design_list = glob.glob("ctest/*")
-
-_2_1_floorplan_all_results_csv = []
-_3_3_resizer_all_results_csv = []
-_4_1_cts_all_results_csv = []
-_6_report_all_results_csv = []
-all_results_json = {}
-
-_2_1_floorplan_csv_columns = ["name", "tns", "wns"]
-_3_3_resizer_csv_columns = ["name", "tns", "wns"]
-_4_1_cts_csv_columns = ["name", "tns", "wns"]
-_6_report_csv_columns = ["name", "tns", "wns", "internal_power", "switching_power", "leakage_power", "total_power", "instance_count"]
-
-failed_designs = []
-
-for design in design_list:
-    logs_f = design + "/logs"
-    objects_f = design + "/objects"
-    reports_f = design + "/reports"
-    results_f = design + "/results"
-
-    design_name = design.split("/")[-1]
-    
-    all_results_json[design_name] = {}
-    
-    if os.path.isfile(logs_f + "/" + PLATFORM + "/" + DESIGN + "/2_1_floorplan.log"):
-        with open(logs_f + "/" + PLATFORM + "/" + DESIGN + "/2_1_floorplan.log", "r") as rf:
-            filedata = rf.read()
-        tns_group = re.search("tns (.*)", filedata)
-        wns_group = re.search("wns (.*)", filedata)
-        
-        results = {}
-        results["name"] = design_name
-        
-        try:
-            tns = tns_group.group(1)
-            wns = wns_group.group(1)
-            
-            results["tns"] = tns
-            results["wns"] = wns
+################################
+# Block parsers
+################################
 
-            all_results_json[design_name]["2_1_floorplan"] = results 
-            _2_1_floorplan_all_results_csv.append(results)
-        except:
-            print("Cannot extract 2_1_floorplan.log from: " + design)
-
-
-    if os.path.isfile(logs_f + "/" + PLATFORM + "/" + DESIGN + "/3_3_resizer.log"):
-        with open(logs_f + "/" + PLATFORM + "/" + DESIGN + "/3_3_resizer.log", "r") as rf:
-            filedata = rf.read()
-
-        tns_group = re.search("tns (.*)", filedata)
-        wns_group = re.search("wns (.*)", filedata)
-        
-        results = {}
-        results["name"] = design_name
-        
-        try:
-            tns = tns_group.group(1)
-            wns = wns_group.group(1)
-            
-            results["tns"] = tns
-            results["wns"] = wns
+# A log is read in blocks of whole lines, and every block is fed to small
+# parsers that keep only their own state between blocks, so that a log is
+# read once, in linear time and in memory bounded by BLOCK_SIZE, however
+# large it is. A parser is done when its value can not change anymore; the
+# log is not read further once all its parsers are.
+BLOCK_SIZE = 1 << 20
 
-            all_results_json[design_name]["3_3_resizer"] = results 
-            _3_3_resizer_all_results_csv.append(results)
-        except:
-            print("Cannot extract 3_3_resizer.log from: " + design)
-    
-
-    if os.path.isfile(logs_f + "/" + PLATFORM + "/" + DESIGN + "/4_1_cts.log"):
-        with open(logs_f + "/" + PLATFORM + "/" + DESIGN + "/4_1_cts.log", "r") as rf:
-            filedata = rf.read()
-
-        tns_group = re.search("tns (.*)", filedata)
-        wns_group = re.search("wns (.*)", filedata)
-        
-        results = {}
-        results["name"] = design_name
-        
-        try:
-            tns = tns_group.group(1)
-            wns = wns_group.group(1)
-            
-            results["tns"] = tns
-            results["wns"] = wns
+# Group 1 of the first match of "pattern", like re.search(pattern, filedata).group(1)
+# for patterns that match within one line
+class FirstMatch:
+    def __init__(self, pattern):
+        self.regex = re.compile(pattern)
+        self.value = None
+        self.done = False
+
+    def feed(self, block):
+        m = self.regex.search(block)
+        if m:
+            self.value = m.group(1)
+            self.done = True
+
+
+# The "Total ..." row of re.search("report_power(\n.*)*(Total .*)", filedata).group(2),
+# which backtracks over everything after report_power: the row right after
+# the first report_power at the end of a line or followed by "Total ", or
+# else the last "Total " after it
+class PowerTotal:
+    def __init__(self):
+        self.in_report = False
+        self.value = None
+        self.done = False
+
+    def feed(self, block):
+        start = 0
+        if not self.in_report:
+            pos = block.find("report_power")
+            while pos >= 0:
+                pos += len("report_power")
+                if block.startswith("Total ", pos):
+                    self.value = get_line_rest(block, pos)
+                    self.done = True
+                    return
+                if block.startswith("\n", pos):
+                    break
+                pos = block.find("report_power", pos)
+            if pos < 0:
+                return
+            # the last row is only known at the end of the log
+            self.in_report = True
+            start = pos + 1
+        pos = block.rfind("Total ", start)
+        if pos >= 0:
+            self.value = get_line_rest(block, pos)
+
+
+# The number starting the second line after "instance_count", like
+# re.search("instance_count(\n.*)\n(\d+)", filedata).group(2)
+class InstanceCount:
+    PATTERN = re.compile("instance_count(\n.*)\n(\d+)")
+
+    def __init__(self):
+        # last two lines of the previous block, which may start a match
+        self.tail = ""
+        self.value = None
+        self.done = False
+
+    def feed(self, block):
+        block = self.tail + block
+        m = self.PATTERN.search(block)
+        if m:
+            self.value = m.group(2)
+            self.done = True
+            return
+        pos = block.rfind("\n", 0, len(block) - 1)
+        pos = block.rfind("\n", 0, max(pos, 0))
+        self.tail = block[pos + 1:]
+
+
+# "block" from "pos" to the end of its line
+def get_line_rest(block, pos):
+    end = block.find("\n", pos)
+    return block[pos:] if end < 0 else block[pos:end]
+
+
+# Blocks of about "size" characters of "rf", cut after a newline
+def read_blocks(rf, size=BLOCK_SIZE):
+    rest = ""
+    while True:
+        data = rf.read(size)
+        if not data:
+            if rest:
+                yield rest
+            return
+        data = rest + data
+        end = data.rfind("\n") + 1
+        rest = data[end:]
+        if end > 0:
+            yield data[:end]
+
+
+def parse_log(log_file, parsers):
+    with open(log_file, "r") as rf:
+        for block in read_blocks(rf):
+            for parser in parsers:
+                if not parser.done:
+                    parser.feed(block)
+            if all(parser.done for parser in parsers):
+                break
+    return [parser.value for parser in parsers]
+
+################################
+# Logs
+################################
+
+# tns and wns of a step log, None if they are not found
+def extract_timing(log_file):
+    return parse_log(log_file, [FirstMatch("tns (.*)"), FirstMatch("wns (.*)")])
+
+
+# tns, wns, the fields of the report_power "Total" row and the instance count
+# of 6_report.log, None if they are not found
+def extract_report(log_file):
+    return parse_log(log_file, [FirstMatch("tns (.*)"), FirstMatch("wns (.*)"), PowerTotal(), InstanceCount()])
 
-            all_results_json[design_name]["4_1_cts"] = results 
-            _4_1_cts_all_results_csv.append(results)
-        except:
-            print("Cannot extract 4_1_cts.log from: " + design)
 
-    if os.path.isfile(logs_f + "/" + PLATFORM + "/" + DESIGN + "/6_report.log"):
-        with open(logs_f + "/" + PLATFORM + "/" + DESIGN + "/6_report.log", "r") as rf:
-            filedata = rf.read()
+# Number of filler instances placed in 4_2_cts_fillcell.log, None if not found
+def extract_filler_count(log_file):
+    return parse_log(log_file, [FirstMatch("Placed (\d+) filler instances")])[0]
 
-        tns_group = re.search("tns (.*)", filedata)
-        wns_group = re.search("wns (.*)", filedata)
-        power_group = re.search("report_power(\n.*)*(Total .*)", filedata)
-        instance_group = re.search("instance_count(\n.*)\n(\d+)", filedata)
 
-        results = {}
-        results["name"] = design_name
+def collect(design_list):
+    _2_1_floorplan_all_results_csv = []
+    _3_3_resizer_all_results_csv = []
+    _4_1_cts_all_results_csv = []
+    _6_report_all_results_csv = []
+    all_results_json = {}
 
+    _2_1_floorplan_csv_columns = ["name", "tns", "wns"]
+    _3_3_resizer_csv_columns = ["name", "tns", "wns"]
+    _4_1_cts_csv_columns = ["name", "tns", "wns"]
+    _6_report_csv_columns = ["name", "tns", "wns", "internal_power", "switching_power", "leakage_power", "total_power", "instance_count"]
 
-        try:
-            tns = tns_group.group(1)
-            wns = wns_group.group(1)
-            
-            power_all = power_group.group(2).split()
-            internal_poewr = power_all[1]
-            switching_power = power_all[2]
-            leakage_power = power_all[3]
-            total_power = power_all[4]
+    failed_designs = []
 
-            instance = instance_group.group(2)
-            
+    for design in design_list:
+        logs_f = design + "/logs"
+        objects_f = design + "/objects"
+        reports_f = design + "/reports"
+        results_f = design + "/results"
+
+        design_name = design.split("/")[-1]
+
+        all_results_json[design_name] = {}
+
+        for step, all_results_csv in [("2_1_floorplan", _2_1_floorplan_all_results_csv),
+                                      ("3_3_resizer", _3_3_resizer_all_results_csv),
+                                      ("4_1_cts", _4_1_cts_all_results_csv)]:
+            log_file = logs_f + "/" + PLATFORM + "/" + DESIGN + "/" + step + ".log"
+            if not os.path.isfile(log_file):
+                continue
+            tns, wns = extract_timing(log_file)
+
+            results = {}
+            results["name"] = design_name
+
+            if tns is None or wns is None:
+                print("Cannot extract " + step + ".log from: " + design)
+                continue
             results["tns"] = tns
             results["wns"] = wns
-            results["internal_power"] = internal_poewr
-            results["switching_power"] = switching_power
-            results["leakage_power"] = leakage_power
-            results["total_power"] = total_power
-            
-            with open(logs_f + "/" + PLATFORM + "/" + DESIGN + "/4_2_cts_fillcell.log", "r") as rf:
-                filler_filedata = rf.read()
-            
-            filler_group = re.search("Placed (\d+) filler instances", filler_filedata)
-            if filler_group:
-                filler_count = filler_group.group(1)
-                results["instance_count"] = int(instance) - int(filler_count)
-            else:
-                print("Cannot find filler nums")
-                results["instance_count"] = int(instance)
-    
-            all_results_json[design_name]["6_report"] = results 
-            _6_report_all_results_csv.append(results)
-        except:
-            print("Cannot extract 6_report.log from: " + design)
-    else:    
-        failed_designs.append(design_name)
-
-if not os.path.isdir("doe_reports"):
-    os.mkdir("doe_reports")
-
-with open("doe_reports/data_stream.json", "w") as wf:
-    wf.write(json.dumps(all_results_json))
-
-with open("doe_reports/2_1_floorplan_all.csv", "w") as wf:
-    writer = csv.DictWriter(wf, fieldnames=_2_1_floorplan_csv_columns)
-    writer.writeheader()
-    for data in _2_1_floorplan_all_results_csv:
-        writer.writerow(data)
-
-with open("doe_reports/3_3_resizer_all.csv", "w") as wf:
-    writer = csv.DictWriter(wf, fieldnames=_3_3_resizer_csv_columns)
-    writer.writeheader()
-    for data in _3_3_resizer_all_results_csv:
-        writer.writerow(data)
-
-with open("doe_reports/4_1_cts_all.csv", "w") as wf:
-    writer = csv.DictWriter(wf, fieldnames=_4_1_cts_csv_columns)
-    writer.writeheader()
-    for data in _4_1_cts_all_results_csv:
-        writer.writerow(data)
-
-with open("doe_reports/6_report_all.csv", "w") as wf:
-    writer = csv.DictWriter(wf, fieldnames=_6_report_csv_columns)
-    writer.writeheader()
-    for data in _6_report_all_results_csv:
-        writer.writerow(data)
-
-with open("doe_reports/failed_designs.txt", "w") as wf:
-    for design in failed_designs:
-        wf.write(design + "\n")
-
-print("Extraction done, data is stored in the doe_reports folder")
+
+            all_results_json[design_name][step] = results
+            all_results_csv.append(results)
+
+        if os.path.isfile(logs_f + "/" + PLATFORM + "/" + DESIGN + "/6_report.log"):
+            tns, wns, power, instance = extract_report(logs_f + "/" + PLATFORM + "/" + DESIGN + "/6_report.log")
+
+            results = {}
+            results["name"] = design_name
+
+            try:
+                power_all = power.split()
+                internal_poewr = power_all[1]
+                switching_power = power_all[2]
+                leakage_power = power_all[3]
+                total_power = power_all[4]
+
+                if tns is None or wns is None or instance is None:
+                    raise ValueError("missing tns, wns or instance_count")
+
+                results["tns"] = tns
+                results["wns"] = wns
+                results["internal_power"] = internal_poewr
+                results["switching_power"] = switching_power
+                results["leakage_power"] = leakage_power
+                results["total_power"] = total_power
+
+                filler_count = extract_filler_count(logs_f + "/" + PLATFORM + "/" + DESIGN + "/4_2_cts_fillcell.log")
+                if filler_count is not None:
+                    results["instance_count"] = int(instance) - int(filler_count)
+                else:
+                    print("Cannot find filler nums")
+                    results["instance_count"] = int(instance)
+
+                all_results_json[design_name]["6_report"] = results
+                _6_report_all_results_csv.append(results)
+            except:
+                print("Cannot extract 6_report.log from: " + design)
+        else:
+            failed_designs.append(design_name)
+
+    if not os.path.isdir("doe_reports"):
+        os.mkdir("doe_reports")
+
+    with open("doe_reports/data_stream.json", "w") as wf:
+        wf.write(json.dumps(all_results_json))
+
+    with open("doe_reports/2_1_floorplan_all.csv", "w") as wf:
+        writer = csv.DictWriter(wf, fieldnames=_2_1_floorplan_csv_columns)
+        writer.writeheader()
+        for data in _2_1_floorplan_all_results_csv:
+            writer.writerow(data)
+
+    with open("doe_reports/3_3_resizer_all.csv", "w") as wf:
+        writer = csv.DictWriter(wf, fieldnames=_3_3_resizer_csv_columns)
+        writer.writeheader()
+        for data in _3_3_resizer_all_results_csv:
+            writer.writerow(data)
+
+    with open("doe_reports/4_1_cts_all.csv", "w") as wf:
+        writer = csv.DictWriter(wf, fieldnames=_4_1_cts_csv_columns)
+        writer.writeheader()
+        for data in _4_1_cts_all_results_csv:
+            writer.writerow(data)
+
+    with open("doe_reports/6_report_all.csv", "w") as wf:
+        writer = csv.DictWriter(wf, fieldnames=_6_report_csv_columns)
+        writer.writeheader()
+        for data in _6_report_all_results_csv:
+            writer.writerow(data)
+
+    with open("doe_reports/failed_designs.txt", "w") as wf:
+        for design in failed_designs:
+            wf.write(design + "\n")
+
+    print("Extraction done, data is stored in the doe_reports folder")
+
+
+if __name__ == "__main__":
+    collect(glob.glob("ctest/*"))
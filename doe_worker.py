@@ -0,0 +1,350 @@
+import os
+import io
+import hmac
+import re
+import json
+import sys
+import glob
+import time
+import signal
+import shutil
+import socket
+import tarfile
+import argparse
+import threading
+import socketserver
+import subprocess as sp
+
+################################
+# Worker settings
+################################
+
+# A worker runs the rendered workspaces run_design.py sends to it inside its
+# own flow checkout (--root, which needs Makefile, scripts, platforms and
+# designs like the orchestrator's), and keeps them until they are fetched.
+# It does not depend on the orchestrator: its makes keep running when
+# run_design.py is restarted, and finished runs wait to be fetched.
+WORKER_PORT = 7700
+KILL_GRACE = 30 # in seconds between SIGTERM and SIGKILL of a killed run
+REQUEST_TIME_OUT = 10 # in seconds, for requests that do not move workspaces
+
+# Every request carries a token shared by the orchestrator and its workers,
+# as anyone who can reach a worker can run make in its checkout. It is taken
+# from this environment variable or a --token-file, a worker does not start
+# without one. Workers listen on localhost unless --host says otherwise.
+TOKEN_ENV = "DOE_WORKER_TOKEN"
+
+# Flow stages in Makefile order, indexed by the step number of their logs
+STAGES = ["synth", "floorplan", "place", "cts", "route", "finish"]
+
+# Written by TIME_CMD when a step has finished
+GNU_TIME_PATTERN = "^\S+elapsed \S+CPU \S+memKB"
+
+################################
+# Protocol
+################################
+
+# Token sent by request()
+token = os.environ.get(TOKEN_ENV)
+
+def read_token(path):
+    with open(path, "r") as rf:
+        return rf.read().strip()
+
+
+# Every message is one JSON line followed by "size" bytes of payload, a
+# gzipped tar of workspace files. A connection carries one request and its
+# reply; a reply with an "error" field is raised as RuntimeError.
+def send_message(sock_file, message, payload=b""):
+    message = dict(message, size=len(payload))
+    sock_file.write(json.dumps(message).encode("utf-8") + b"\n")
+    sock_file.write(payload)
+    sock_file.flush()
+
+
+def recv_message(sock_file):
+    line = sock_file.readline()
+    if not line:
+        raise ConnectionError("connection closed")
+    message = json.loads(line)
+    payload = sock_file.read(message["size"])
+    if len(payload) != message["size"]:
+        raise ConnectionError("connection closed after {:d} of {:d} bytes".format(len(payload), message["size"]))
+    return message, payload
+
+
+def request(address, message, payload=b"", timeout=REQUEST_TIME_OUT):
+    host, port = address.rsplit(":", 1)
+    with socket.create_connection((host, int(port)), timeout=timeout) as sock:
+        with sock.makefile("rwb") as sock_file:
+            send_message(sock_file, dict(message, token=token), payload)
+            reply, reply_payload = recv_message(sock_file)
+    if "error" in reply:
+        raise RuntimeError(address + ": " + reply["error"])
+    return reply, reply_payload
+
+
+# Tar "paths" (relative to "root") with their mtimes, which make relies on
+def pack_paths(root, paths):
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tf:
+        for path in paths:
+            tf.add(os.path.join(root, path), arcname=os.path.normpath(path))
+    return buf.getvalue()
+
+
+# Whether "path" is "root" or inside it
+def is_inside(root, path):
+    return os.path.commonpath([root, path]) == root
+
+
+# Tar members must stay inside "root": no absolute paths or "..", no links
+# pointing out of it and no devices, whether or not tarfile has the "data"
+# filter that checks the same
+def check_members(root, members):
+    root = os.path.realpath(root)
+    for member in members:
+        path = os.path.realpath(os.path.join(root, member.name))
+        if os.path.isabs(member.name) or not is_inside(root, path):
+            raise RuntimeError("tar member " + member.name + " is outside of " + root)
+        if member.issym() and not is_inside(root, os.path.realpath(os.path.join(os.path.dirname(path), member.linkname))):
+            raise RuntimeError("tar member " + member.name + " links outside of " + root)
+        if member.islnk() and not is_inside(root, os.path.realpath(os.path.join(root, member.linkname))):
+            raise RuntimeError("tar member " + member.name + " links outside of " + root)
+        if not (member.isfile() or member.isdir() or member.issym() or member.islnk()):
+            raise RuntimeError("tar member " + member.name + " is not a file, folder or link")
+
+
+# Files in "keep" are shared by several runs and not overwritten while
+# another run may be reading them
+def unpack_paths(root, payload, keep=()):
+    keep = set(os.path.normpath(path) for path in keep)
+    with tarfile.open(fileobj=io.BytesIO(payload), mode="r:gz") as tf:
+        members = tf.getmembers()
+        check_members(root, members)
+        members = [member for member in members
+                   if not (member.name in keep and os.path.exists(os.path.join(root, member.name)))]
+        if hasattr(tarfile, "data_filter"):
+            tf.extractall(root, members=members, filter="data")
+        else:
+            tf.extractall(root, members=members)
+
+################################
+# Worker
+################################
+
+def get_run_stage(workspace):
+    step = 0
+    for log_file in glob.glob(workspace + "/logs/*/*/[1-6]_*.log"):
+        step = max(step, int(os.path.basename(log_file)[0]))
+    if step == 0:
+        return None
+    return STAGES[step - 1]
+
+
+# Metrics of the finished step logs in "workspace" that are not in "parsed"
+# yet. "log_patterns" maps a log name to {metric: regex}, the last match of
+# a regex is the value. Returns {log name: {metric: value}} and adds to "parsed".
+def get_log_metrics(workspace, log_patterns, parsed):
+    metrics = {}
+    for log_name, patterns in log_patterns.items():
+        if log_name in parsed:
+            continue
+        for log_file in glob.glob(workspace + "/logs/*/*/" + log_name):
+            # the workspace may be fetched meanwhile
+            try:
+                with open(log_file, "r", errors="replace") as rf:
+                    content = rf.read()
+            except IOError:
+                continue
+            if not re.search(GNU_TIME_PATTERN, content, re.M):
+                continue
+            metrics[log_name] = {}
+            for metric, pattern in patterns.items():
+                values = re.findall(pattern, content, re.M)
+                try:
+                    metrics[log_name][metric] = float(values[-1])
+                except (IndexError, ValueError):
+                    pass
+            parsed[log_name] = metrics[log_name]
+    return metrics
+
+
+# Whether process group "pgid" still has members
+def is_group_alive(pgid):
+    try:
+        os.killpg(pgid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+# SIGTERM to the process group of make "p", and SIGKILL to what is left of
+# it after KILL_GRACE: openroad or yosys may ignore SIGTERM or outlive make
+def kill_make(p):
+    try:
+        os.killpg(p.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return p.wait()
+    deadline = time.time() + KILL_GRACE
+    while time.time() < deadline:
+        # make is reaped first, as a zombie it still counts as a group member
+        p.poll()
+        if not is_group_alive(p.pid):
+            return p.wait()
+        time.sleep(1)
+    try:
+        os.killpg(p.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    return p.wait()
+
+
+# Kill thread of a job, which is reported as running until it is done
+def kill_job(server, job, p):
+    kill_make(p)
+    with server.lock:
+        server.killing.discard(job)
+
+
+# Path of workspace "job" in the worker root, jobs that are not inside it
+# are refused
+def get_job_path(root, job):
+    if not isinstance(job, str) or not job:
+        raise RuntimeError("invalid job " + repr(job))
+    path = os.path.realpath(os.path.join(root, job))
+    if path == root or not is_inside(root, path):
+        raise RuntimeError("job " + job + " is outside of " + root)
+    return path
+
+
+# Jobs are keyed by their workspace path, which is relative to the root of
+# both the orchestrator and the worker
+def handle_request(server, message, payload):
+    if not hmac.compare_digest(str(message.get("token")).encode("utf-8"), server.token.encode("utf-8")):
+        raise RuntimeError("invalid token")
+    op = message["op"]
+    job = message.get("job")
+    if op == "info":
+        # the logs are read without the lock, so they do not hold up submit, fetch and kill
+        with server.lock:
+            states = [(name, p.poll() if name not in server.killing else None, server.log_metrics.setdefault(name, {}))
+                      for name, p in server.jobs.items()]
+        jobs = {}
+        for name, exit_code, parsed in states:
+            jobs[name] = {"state": "running" if exit_code is None else "done", "exit_code": exit_code,
+                          "stage": get_run_stage(os.path.join(server.root, name))}
+            # live metrics for early termination
+            if message.get("logs"):
+                get_log_metrics(os.path.join(server.root, name), message["logs"], parsed)
+                jobs[name]["metrics"] = parsed
+        return {"slots": server.slots, "jobs": jobs}, b""
+
+    if op == "submit":
+        get_job_path(server.root, job)
+        with server.lock:
+            if job in server.jobs:
+                raise RuntimeError(job + " is already submitted")
+            if len(server.jobs) >= server.slots:
+                raise RuntimeError("no free slot for " + job)
+            unpack_paths(server.root, payload, message.get("shared", []))
+            server.jobs[job] = sp.Popen(["make", "-f", os.path.join(job, "Makefile"), message["target"]],
+                                        cwd=server.root, stdout=sp.DEVNULL, start_new_session=True)
+        return {"job": job}, b""
+
+    if op == "kill":
+        # the run may take KILL_GRACE to stop, the reply does not wait for it
+        with server.lock:
+            p = server.jobs[job]
+            if job not in server.killing:
+                server.killing.add(job)
+                threading.Thread(target=kill_job, args=(server, job, p), daemon=True).start()
+        return {"job": job}, b""
+
+    if op == "fetch":
+        job_path = get_job_path(server.root, job)
+        with server.lock:
+            p = server.jobs[job]
+            if p.poll() is None or job in server.killing:
+                raise RuntimeError(job + " is still running")
+            del server.jobs[job]
+            server.log_metrics.pop(job, None)
+        try:
+            reply_payload = pack_paths(server.root, [job])
+        except Exception:
+            with server.lock:
+                server.jobs[job] = p
+            raise
+        shutil.rmtree(job_path)
+        exit_code = p.returncode
+        return {"job": job, "exit_code": exit_code}, reply_payload
+
+    if op == "drop":
+        job_path = get_job_path(server.root, job)
+        with server.lock:
+            p = server.jobs.pop(job, None)
+            server.log_metrics.pop(job, None)
+        if p is not None and p.poll() is None:
+            kill_make(p)
+        shutil.rmtree(job_path, ignore_errors=True)
+        return {"job": job}, b""
+
+    if op == "shutdown":
+        with server.lock:
+            killers = [threading.Thread(target=kill_make, args=(p,)) for p in server.jobs.values() if p.poll() is None]
+        for killer in killers:
+            killer.start()
+        def stop():
+            for killer in killers:
+                killer.join()
+            server.shutdown()
+        threading.Thread(target=stop).start()
+        return {}, b""
+
+    raise RuntimeError("unknown op " + str(op))
+
+
+class WorkerHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            message, payload = recv_message(self.rfile)
+            reply, reply_payload = handle_request(self.server, message, payload)
+        except Exception as e:
+            reply, reply_payload = {"error": str(e)}, b""
+        send_message(self.wfile, reply, reply_payload)
+
+
+class WorkerServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+def parse_args():
+  parser = argparse.ArgumentParser(description='Run the flows that run_design.py dispatches to this host')
+  parser.add_argument('--host', default='localhost', help='Address to listen on, e.g. 0.0.0.0 for all interfaces')
+  parser.add_argument('--port', type=int, default=WORKER_PORT, help='Port to listen on')
+  parser.add_argument('--root', default='.', help='Flow checkout the workspaces are run in')
+  parser.add_argument('--slots', type=int, default=os.cpu_count(), help='Number of runs executed at once')
+  parser.add_argument('--token-file', default=None, help='File with the shared token, instead of $' + TOKEN_ENV)
+  return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.token_file is not None:
+        token = read_token(args.token_file)
+    if not token:
+        print("No token, set " + TOKEN_ENV + " or use --token-file")
+        sys.exit(1)
+    server = WorkerServer((args.host, args.port), WorkerHandler)
+    server.root = os.path.realpath(args.root)
+    server.token = token
+    server.slots = args.slots
+    server.jobs = {}
+    server.killing = set()
+    server.log_metrics = {}
+    server.lock = threading.Lock()
+    print("worker listening on {}:{:d} with {:d} slots in {}".format(args.host, args.port, args.slots, server.root), flush=True)
+    server.serve_forever()
@@ -15,7 +15,47 @@ import os  # filesystem manipulation
 import datetime
 import uuid
 import platform
+import time
+import multiprocessing
 from collections import OrderedDict
+import results_store
+try:
+  import pyarrow  # for metrics.parquet
+except ImportError:
+  pyarrow = None
+
+# Bump when the extracted metrics change, so all_designs re-extracts every run
+EXTRACTOR_VERSION = 2
+
+# all_designs mode records the size and mtime of the files each run's metrics
+# were extracted from, and only re-extracts runs whose files have changed
+METRICS_INDEX = "metrics_index.json"
+
+# run__input__ metrics of a run: (name, knob of the run_design.py manifest,
+# label of the knob in the data folder name). Knobs of a manifest that are
+# not listed, like LAYER_ADJUST_met1, become run__input__<knob>.
+RUN_INPUTS = [
+    ("target_util", "CORE_UTILIZATION", "CORE_UTILIZATION"),
+    ("target_CP", "CLK_PERIOD", "CLOCK"),
+    ("aspect_ratio", "ASPECT_RATIO", "ASRATIO"),
+    ("global_padding", "GP_PAD", "GPPAD"),
+    ("detailed_padding", "DP_PAD", "DPPAD"),
+    ("place_density", "PLACE_DENSITY", "PLACE_DENSITY"),
+    ("layer_adjust", "LAYER_ADJUST", "LAYER_ADJUST"),
+    ("synth_flatten", "FLATTEN", "FLATTEN"),
+    ("abc_clock", "ABC_CLOCK_PERIOD", "ABC_CLOCK"),
+    ("pins_distance", "PINS_DISTANCE", "PINS_DISTANCE"),
+    ("cts_size", "CTS_CLUSTER_SIZE", "CTS_SIZE"),
+    ("cts_diameter", "CTS_CLUSTER_DIAMETER", "CTS_DIAMETER"),
+    ("allow_overflow", "GR_OVERFLOW", "ALLOW_OVERFLOW"),
+]
+
+# Last line of every step log of the flow, written by $(TIME_CMD)
+GNU_TIME = re.compile("^(\S+)elapsed (\S+)%CPU (\S+)memKB", re.M)
+
+# Values extract_metrics sets when a metric could not be extracted, they are
+# nulls in metrics.parquet
+MISSING_VALUES = ["ERR", "N/A"]
 
 
 # Parse and validate arguments
@@ -33,8 +73,20 @@ def parse_args():
                       help='Additional comments to embed')
   parser.add_argument('--output', '-o', required=False, default="metadata.json",
                       help='Output file')
+  parser.add_argument('--force', action='store_true',
+                      help='Re-extract all designs, ignoring ' + METRICS_INDEX)
+  parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count(),
+                      help='Number of runs extracted in parallel in all_designs mode')
+  parser.add_argument('--excel', action='store_true',
+                      help='Also write metrics.xlsx in all_designs mode (slow for many runs)')
+  parser.add_argument('--store', default=results_store.RESULTS_STORE,
+                      help='Results store the extracted runs are added to in all_designs mode ("" for none)')
   args = parser.parse_args()
 
+  if args.jobs < 1:
+    print("Error: jobs must be at least 1")
+    sys.exit(1)
+
   if not os.path.isdir(args.flowPath):
     print("Error: flowPath does not exist")
     print("Path: " + args.flowPath)
@@ -43,6 +95,117 @@ def parse_args():
   return args
 
 
+# Metric tags
+# ==============================================================================
+# The tags of each section, grouped by the file they are extracted from
+# (relative to the run's logs/ or reports/ folder), in output order:
+# (jsonTag, pattern[, {"count": ..., "occurrence": ..., "defaultNotFound": ...}])
+# See extractTagFromFile for the meaning of the options. With "ignorecase",
+# the pattern is written in lower case and matched against the lower-cased
+# file, which is much faster than a (?i) pattern on the large route logs.
+
+METRIC_TAGS = {
+  "synth": {
+    "reports/synth_stat.txt": [
+      ("synth__area__stdcell__count", "Number of cells: +(\S+)"),
+      ("synth__area__stdcell__area", "Chip area for module.*: +(\S+)"),
+    ],
+  },
+  "floorplan": {
+    "logs/2_1_floorplan.log": [
+      ("floorplan__timing__tns_total", "^tns (\S+)"),
+      ("floorplan__timing__wns__worst", "^wns (\S+)", {"occurrence": 0}),
+      ("floorplan__timing__ws__worst", "^worst slack (\S+)", {"occurrence": 0}),
+      ("floorplan__area__stdcell__count", "^Design area (\S+) u\^2"),
+      ("floorplan__area__instance__util", "^Design area.* (\S+)% utilization"),
+    ],
+    "logs/3_2_place_iop.log": [
+      ("floorplan__area__IO__count", "Num of I/O +(\d+)"),
+    ],
+    "logs/2_4_mplace.log": [
+      ("floorplan__area__macros__count", "Extracted # Macros: (\S+)", {"defaultNotFound": 0}),
+    ],
+  },
+  "place": {
+    "logs/3_1_place_gp.log": [
+      ("globalplace__area__density__target", "TargetDensity: (\S+)"),
+      ("globalplace__area__wirelength__estimate", "Total wirelength: (\S+)"),
+      ("globalplace__timing__tns__total", "^tns (\S+)"),
+      ("globalplace__timing__wns__worst", "^wns (\S+)"),
+    ],
+    "logs/3_3_resizer.log": [
+      ("placeopt__area__inbuffer__count", "Inserted (\d+) input buffers"),
+      ("placeopt__area__outbuffer__count", "Inserted (\d+) output buffers"),
+      ("placeopt__area__resize__count", "Resized (\d+) instances"),
+      ("placeopt__timing__tns__total", "^tns (\S+)"),
+      ("placeopt__timing__wns__worst", "^wns (\S+)"),
+      ("placeopt__timing__ws__worst", "^worst slack (\S+)"),
+      ("placeopt__area__instance__area", "^Design area (\S+) u\^2"),
+      ("placeopt__area__instance__util", "^Design area.* (\S+)% utilization"),
+      ("placeopt__area__instance__count", "^instance_count\n-*\n^(\S+)"),
+    ],
+    "logs/3_4_opendp.log": [
+      ("detailedplace__timing__tns__total", "^tns (\S+)"),
+      ("detailedplace__timing__wns__worst", "^wns (\S+)"),
+      ("detailedplace__timing__ws__worst", "^worst slack (\S+)"),
+      ("detailedplace__inst__displacement__total", "total displacement +(\d*\.?\d*)"),
+      ("detailedplace__inst__displacement__average", "average displacement +(\d*\.?\d*)"),
+      ("detailedplace__inst__displacement__max", "max displacement +(\d*\.?\d*)"),
+      ("detailedplace__wirelength__initial__estimate", "original HPWL +(\d*\.?\d*)"),
+      ("detailedplace__wirelength__final__estimate", "legalized HPWL +(\d*\.?\d*)"),
+    ],
+  },
+  "cts": {
+    "logs/4_1_cts.log": [
+      ("cts__timing__tns__total", "^tns (\S+)"),
+      ("cts__timing__wns__worst", "^wns (\S+)"),
+      ("cts__timing__ws__worst", "^worst slack (\S+)"),
+    ],
+  },
+  "route": {
+    "logs/5_1_fastroute.log": [
+      ("globalroute__timing__tns__total", "^tns (\S+)"),
+      ("globalroute__timing__wns__worst", "^wns (\S+)"),
+      ("globalroute__timing__ws__worst", "^worst slack (\S+)"),
+    ],
+    "logs/5_2_TritonRoute.log": [
+      ("detailedroute__wirelength", "total wire length = +(\S+) um"),
+      ("detailedroute__via__count", "total number of vias = +(\S+)"),
+      ("detailedroute__errors__count", "error:", {"count": True, "defaultNotFound": 0, "ignorecase": True}),
+    ],
+    "reports/5_route_drc.rpt": [
+      ("detailedroute__drc__error__count", "violation", {"count": True, "defaultNotFound": 0, "ignorecase": True}),
+    ],
+  },
+  "finish": {
+    "logs/6_report.log": [
+      ("finish__power__internal__total", "Total +(\S+) +\S+ +\S+ +\S+ +\S+"),
+      ("finish__power__switch__total", "Total +\S+ +(\S+) +\S+ +\S+ +\S+"),
+      ("finish__power__leak__total", "Total +\S+ +\S+ +(\S+) +\S+ +\S+"),
+      ("finish__power__total", "Total +\S+ +\S+ +\S+ +(\S+) +\S+"),
+      ("finish__area", "^Design area (\S+) u\^2"),
+      ("finish__util", "^Design area.* (\S+)% utilization"),
+    ],
+  },
+}
+
+
+def compile_tags(metric_tags):
+  compiled = {}
+  for section, section_files in metric_tags.items():
+    compiled[section] = {}
+    for file, tags in section_files.items():
+      compiled[section][file] = []
+      for tag in tags:
+        options = dict(tag[2]) if len(tag) > 2 else {}
+        ignorecase = options.pop("ignorecase", False)
+        compiled[section][file].append((tag[0], re.compile(tag[1], re.M), ignorecase, options))
+  return compiled
+
+
+COMPILED_TAGS = compile_tags(METRIC_TAGS)
+
+
 # Functions
 # ==============================================================================
 # Main function to do specific extraction of patterns from a file
@@ -65,54 +228,103 @@ def extractTagFromFile(jsonTag, jsonFile, pattern, file, count=False, occurrence
       content = f.read()
 
     m = re.findall(pattern, content, re.M)
-
-    if m:
-      if count:
-        # Return the count
-        jsonFile[jsonTag] = len(m)
-      else:
-        # Note: This gets the specified occurrence
-        value = m[occurrence]
-        if isinstance(value, tuple):
-          value = value[arrayPos]
-        value = value.strip()
-        try:
-          jsonFile[jsonTag] = float(value)
-        except:
-          jsonFile[jsonTag] = str(value)
-    else:
-      # Only print a warning if the defaultNotFound is not set
-      if defaultNotFound == "N/A":
-        print("[WARN] Tag", jsonTag, "not found in", searchFilePath)
-      jsonFile[jsonTag] = defaultNotFound
+    setTagValue(jsonTag, jsonFile, m, searchFilePath, count, occurrence, defaultNotFound)
   except IOError:
     print("[WARN] Failed to open file:", searchFilePath)
     jsonFile[jsonTag] = "ERR"
 
 
-def extractGnuTime(prefix, file, jsonFile):
-  extractTagFromFile(prefix + "__runtime__total", jsonFile,
-                     "^(\S+)elapsed \S+CPU \S+memKB",
-                     file)
-  extractTagFromFile(prefix + "__cpu__total", jsonFile,
-                     "^\S+elapsed (\S+)CPU \S+memKB",
-                     file)
-  extractTagFromFile(prefix + "__mem__peak", jsonFile,
-                     "^\S+elapsed \S+CPU (\S+)memKB",
-                     file)
+# Set "jsonTag" from the matches "m" of its pattern in "searchFilePath"
+def setTagValue(jsonTag, jsonFile, m, searchFilePath, count=False, occurrence=-1, defaultNotFound="N/A"):
+  if m:
+    if count:
+      # Return the count
+      jsonFile[jsonTag] = len(m)
+    else:
+      # Note: This gets the specified occurrence
+      value = m[occurrence]
+      if isinstance(value, tuple):
+        value = value[arrayPos]
+      value = value.strip()
+      try:
+        jsonFile[jsonTag] = float(value)
+      except:
+        jsonFile[jsonTag] = str(value)
+  else:
+    # Only print a warning if the defaultNotFound is not set
+    if defaultNotFound == "N/A":
+      print("[WARN] Tag", jsonTag, "not found in", searchFilePath)
+    jsonFile[jsonTag] = defaultNotFound
+
+
+# Content of "path", read once per run and kept in "files" (None if it cannot be read)
+def read_file(path, files):
+  key = os.path.normpath(path)
+  if key not in files:
+    try:
+      with open(path) as f:
+        files[key] = f.read()
+    except IOError:
+      files[key] = None
+  return files[key]
+
+
+# Extract all tags of METRIC_TAGS "section" for a run, with the same semantics
+# as extractTagFromFile. Each file is read once and all its compiled patterns
+# are applied to its content.
+def extractTags(jsonFile, section, cwd, platform, design, files):
+  for file, tags in COMPILED_TAGS[section].items():
+    folder, name = file.split("/", 1)
+    searchFilePath = os.path.join(args.flowPath, cwd, folder, platform, design, name)
+    content = read_file(searchFilePath, files)
+    lower_content = None
+    for jsonTag, pattern, ignorecase, options in tags:
+      if jsonTag in jsonFile:
+        print("[WARN] Overwriting Tag", jsonTag)
+      if content is None:
+        print("[WARN] Failed to open file:", searchFilePath)
+        jsonFile[jsonTag] = "ERR"
+      elif ignorecase:
+        if lower_content is None:
+          lower_content = content.lower()
+        setTagValue(jsonTag, jsonFile, pattern.findall(lower_content), searchFilePath, **options)
+      else:
+        setTagValue(jsonTag, jsonFile, pattern.findall(content), searchFilePath, **options)
+
+
+def extractGnuTime(prefix, file, jsonFile, files):
+  content = read_file(file, files)
+  if content is None:
+    print("[WARN] Failed to open file:", file)
+    for tag in ["__runtime__total", "__cpu__total", "__mem__peak"]:
+      jsonFile[prefix + tag] = "ERR"
+    return
+  m = GNU_TIME.findall(content)
+  setTagValue(prefix + "__runtime__total", jsonFile, [elapsed for elapsed, cpu, mem in m], file)
+  setTagValue(prefix + "__cpu__total", jsonFile, [cpu for elapsed, cpu, mem in m], file)
+  setTagValue(prefix + "__mem__peak", jsonFile, [mem for elapsed, cpu, mem in m], file)
+
+
+# Seconds of a GNU time "%E" value ([hours:]minutes:seconds), None if it is not one
+def parse_elapsed(value):
+  try:
+    seconds = 0.0
+    for field in str(value).split(":"):
+      seconds = seconds * 60 + float(field)
+    return seconds
+  except ValueError:
+    return None
 
 
 #
 # Extract Clock Latency, Skew numbers
 # Need to extract these from native json
 #
-def get_skew_latency(file_name):
-  try:
-    f = open(file_name, 'r')
-  except:
+def get_skew_latency(file_name, files):
+  content = read_file(file_name, files)
+  if content is None:
     return ('N/A', 'N/A', 'N/A')    
-  lines = f.readlines()
-  f.close()
+  lines = content.splitlines()
 
   latency_section = False
   latency_max = latency_min = skew = 0.0
@@ -167,10 +379,126 @@ def read_sdc(file_name):
   return clkList
 
 
+#
+#  Size and mtime of every file a run's metrics are extracted from
+#
+def get_run_inputs(cwd, platform, design):
+  inputs = {}
+  for folder in ["logs", "reports", "results"]:
+    path = os.path.join(cwd, folder, platform, design)
+    if not os.path.isdir(path):
+      continue
+    for entry in os.scandir(path):
+      # metrics.json is our own output
+      if entry.is_file() and entry.name != "metrics.json":
+        stat = entry.stat()
+        inputs[folder + "/" + entry.name] = [stat.st_size, stat.st_mtime_ns]
+  return inputs
+
+
+def load_index(index_file):
+  try:
+    with open(index_file, "r") as f:
+      return json.load(f)
+  except (IOError, ValueError):
+    return {}
+
+
+def save_index(index_file, index):
+  with open(index_file + ".tmp", "w") as f:
+    json.dump(index, f)
+  os.replace(index_file + ".tmp", index_file)
+
+
+#
+#  Version and commit of the openroad binary on the PATH
+#
+def get_openroad_version():
+  cmdOutput = subprocess.check_output(['openroad', '-version'])
+  cmdFields = [ x.decode('utf-8') for x in cmdOutput.split()  ]
+  version = str(cmdFields[0])
+  if (len(cmdFields) > 1):
+    commit = str(cmdFields[1])
+  else:
+    commit = "N/A"
+  return version, commit
+
+
+#
+#  run__input__ metrics of a run, from its run.json manifest or, for data
+#  folders harvested before run_design.py wrote one, from the folder name
+#
+def get_run_inputs_metrics(design_name, manifest):
+  inputs = OrderedDict()
+  if manifest is not None:
+    knobs = dict(manifest["knobs"])
+    for name, knob, label in RUN_INPUTS:
+      inputs["run__input__" + name] = knobs.pop(knob, "N/A")
+    for knob, value in knobs.items():
+      inputs["run__input__" + knob] = value
+  else:
+    # "<design>[_<platform>]_CORE_UTILIZATION_<value>_CLOCK_<value>_..."; "_CLOCK_" is
+    # found before "_ABC_CLOCK_"
+    for name, knob, label in RUN_INPUTS:
+      m = re.search("_" + label + "_([^_]+)", design_name)
+      inputs["run__input__" + name] = m.group(1) if m else "N/A"
+  return inputs
+
+
+def load_manifest(cwd):
+  try:
+    with open(os.path.join(cwd, results_store.RUN_MANIFEST), "r") as f:
+      return json.load(f)
+  except (IOError, ValueError):
+    return None
+
+
+# Column of a run in the metrics x runs tables
+def get_run_column(metrics_dict):
+    values = list(metrics_dict.values())
+    return str(values[0]) + "__" + str(values[1])
+
+
+def metrics_to_df(metrics_dict):
+    metrics_df = pd.DataFrame(list(metrics_dict.items()))
+    metrics_df.columns = ["Metrics", get_run_column(metrics_dict)]
+    return metrics_df
+
+
+# One row per run and one column per metric, built from the runs' metrics
+# dicts in one pass. Metrics missing from a run are null. Columns holding
+# numbers become numeric (with MISSING_VALUES as nulls), other columns
+# strings, so that the table can be written to a columnar file.
+def metrics_to_table(all_metrics):
+    table = pd.DataFrame(all_metrics)
+    for column in table.columns:
+      values = table[column]
+      try:
+        table[column] = pd.to_numeric(values.mask(values.isin(MISSING_VALUES)))
+      except ValueError:
+        table[column] = values.astype("string")
+      except TypeError:
+        # lists, such as the clock details
+        pass
+    return table
+
+
+# The metrics x runs table of metrics.csv, with a 'Metrics' column.
+# Metrics missing from a run are null.
+def metrics_to_wide_df(all_metrics):
+    wide_df = pd.DataFrame(all_metrics, index=[get_run_column(m) for m in all_metrics]).T
+    wide_df.index.name = 'Metrics'
+    return wide_df.reset_index()
+
+
 # Main
 # ==============================================================================
 
-def extract_metrics(cwd, platform, design, output):
+# "openroad_version" is the (version, commit) of get_openroad_version, which
+# all_designs mode resolves once for all runs. "manifest" is the run.json of
+# the run, which all_designs mode takes from the data index; it is read from
+# "cwd" if not given.
+def extract_metrics(cwd, platform, design, output, openroad_version=None, manifest=None):
     logPath = os.path.join(cwd, "logs", platform, design)
     rptPath = os.path.join(cwd, "reports", platform, design)
     resultPath = os.path.join(cwd, "results", platform, design)
@@ -179,45 +507,24 @@ def extract_metrics(cwd, platform, design, output):
     
     design_name = cwd.split("/")[-1]
     metrics_dict["run__input__name"] = design_name
-    dname = design_name.split('_')
-    metrics_dict["run__input__target_util"] = dname[3]
-    metrics_dict["run__input__target_CP"] = dname[5]
-    metrics_dict["run__input__aspect_ratio"] = dname[7]
-    metrics_dict["run__input__global_padding"] = dname[9]
-    metrics_dict["run__input__detailed_padding"] = dname[11]
-    metrics_dict["run__input__place_density"] = dname[14]
-    metrics_dict["run__input__layer_adjust"] = dname[17]
-    metrics_dict["run__input__synth_flatten"] = dname[19]
-    metrics_dict["run__input__abc_clock"] = dname[22]
-    metrics_dict["run__input__pins_distance"] = dname[25]
-    metrics_dict["run__input__cts_size"] = dname[28]
-    metrics_dict["run__input__cts_diameter"] = dname[31]
-    metrics_dict["run__input__allow_overflow"] = dname[34]
+    if manifest is None:
+      manifest = load_manifest(cwd)
+    metrics_dict.update(get_run_inputs_metrics(design_name, manifest))
     
     metrics_dict["run__flow__generate__date"] = now.strftime("%Y-%m-%d %H:%M")
-    cmdOutput = subprocess.check_output(['openroad', '-version'])
-    cmdFields = cmdOutput.split()
-    cmdFields = [ x.decode('utf-8') for x in cmdOutput.split()  ]
-    metrics_dict["run__flow__openroad__version"] = str(cmdFields[0])
-    if (len(cmdFields) > 1):
-      metrics_dict["run__flow__openroad__commit"] = str(cmdFields[1])
-    else:
-      metrics_dict["run__flow__openroad__commit"] = "N/A"
+    if openroad_version is None:
+      openroad_version = get_openroad_version()
+    metrics_dict["run__flow__openroad__version"] = openroad_version[0]
+    metrics_dict["run__flow__openroad__commit"] = openroad_version[1]
     metrics_dict["run__flow__uuid"] = str(uuid.uuid4())
     metrics_dict["run__flow__design"] = design
     metrics_dict["run__flow__platform"] = platform
     
 
-# Synthesis
-# ==============================================================================
-
-    extractTagFromFile("synth__area__stdcell__count", metrics_dict,
-                       "Number of cells: +(\S+)",
-                       rptPath+"/synth_stat.txt")
+    # each file of the run is read once
+    files = {}
 
-    extractTagFromFile("synth__area__stdcell__area", metrics_dict,
-                       "Chip area for module.*: +(\S+)",
-                       rptPath+"/synth_stat.txt")
+    extractTags(metrics_dict, "synth", cwd, platform, design, files)
 
 # Clocks
 #===============================================================================
@@ -226,244 +533,60 @@ def extract_metrics(cwd, platform, design, output):
     metrics_dict["constraints__clocks__count"] = len(clk_list)
     metrics_dict["constraints__clocks__details"] = clk_list
 
-# Floorplan
-# ==============================================================================
-
-    extractTagFromFile("floorplan__timing__tns_total", metrics_dict,
-                       "^tns (\S+)",
-                       logPath+"/2_1_floorplan.log")
-
-    extractTagFromFile("floorplan__timing__wns__worst", metrics_dict,
-                       "^wns (\S+)",
-                       logPath+"/2_1_floorplan.log", occurrence=0)
-
-    extractTagFromFile("floorplan__timing__ws__worst", metrics_dict,
-                       "^worst slack (\S+)",
-                       logPath+"/2_1_floorplan.log", occurrence=0)
-
-    extractTagFromFile("floorplan__area__stdcell__count", metrics_dict,
-                       "^Design area (\S+) u\^2",
-                       logPath+"/2_1_floorplan.log")
-
-    extractTagFromFile("floorplan__area__instance__util", metrics_dict,
-                       "^Design area.* (\S+)% utilization",
-                       logPath+"/2_1_floorplan.log")
-
-    extractTagFromFile("floorplan__area__IO__count", metrics_dict,
-                       "Num of I/O +(\d+)",
-                       logPath+"/3_2_place_iop.log")
-
-    extractTagFromFile("floorplan__area__macros__count", metrics_dict,
-                       "Extracted # Macros: (\S+)",
-                       logPath+"/2_4_mplace.log", defaultNotFound=0)
-
-# Place
-# ==============================================================================
-
-    extractTagFromFile("globalplace__area__density__target", metrics_dict,
-                       "TargetDensity: (\S+)",
-                       logPath+"/3_1_place_gp.log")
-
-    extractTagFromFile("globalplace__area__wirelength__estimate", metrics_dict,
-                       "Total wirelength: (\S+)",
-                       logPath+"/3_1_place_gp.log")
-
-    extractTagFromFile("globalplace__timing__tns__total", metrics_dict,
-                      "^tns (\S+)",
-                      logPath+"/3_1_place_gp.log")
-
-    extractTagFromFile("globalplace__timing__wns__worst", metrics_dict,
-                      "^wns (\S+)",
-                      logPath+"/3_1_place_gp.log")
-
-    extractTagFromFile("placeopt__area__inbuffer__count", metrics_dict,
-                       "Inserted (\d+) input buffers",
-                       logPath+"/3_3_resizer.log")
-
-    extractTagFromFile("placeopt__area__outbuffer__count", metrics_dict,
-                       "Inserted (\d+) output buffers",
-                       logPath+"/3_3_resizer.log")
-
-    extractTagFromFile("placeopt__area__resize__count", metrics_dict,
-                       "Resized (\d+) instances",
-                       logPath+"/3_3_resizer.log")
-
-    extractTagFromFile("placeopt__timing__tns__total", metrics_dict,
-                       "^tns (\S+)",
-                       logPath+"/3_3_resizer.log")
-
-    extractTagFromFile("placeopt__timing__wns__worst", metrics_dict,
-                       "^wns (\S+)",
-                       logPath+"/3_3_resizer.log")
-
-    extractTagFromFile("placeopt__timing__ws__worst", metrics_dict,
-                       "^worst slack (\S+)",
-                       logPath+"/3_3_resizer.log")
-
-    extractTagFromFile("placeopt__area__instance__area", metrics_dict,
-                       "^Design area (\S+) u\^2",
-                       logPath+"/3_3_resizer.log")
-
-    extractTagFromFile("placeopt__area__instance__util", metrics_dict,
-                       "^Design area.* (\S+)% utilization",
-                       logPath+"/3_3_resizer.log")
-
-    extractTagFromFile("placeopt__area__instance__count", metrics_dict,
-                       "^instance_count\n-*\n^(\S+)",
-                       logPath+"/3_3_resizer.log")
-
-    extractTagFromFile("detailedplace__timing__tns__total", metrics_dict,
-                       "^tns (\S+)",
-                       logPath+"/3_4_opendp.log")
-
-    extractTagFromFile("detailedplace__timing__wns__worst", metrics_dict,
-                       "^wns (\S+)",
-                       logPath+"/3_4_opendp.log")
-
-    extractTagFromFile("detailedplace__timing__ws__worst", metrics_dict,
-                       "^worst slack (\S+)",
-                       logPath+"/3_4_opendp.log")
-
-    extractTagFromFile("detailedplace__inst__displacement__total", metrics_dict,
-                       "total displacement +(\d*\.?\d*)",
-                       logPath+"/3_4_opendp.log")
-
-    extractTagFromFile("detailedplace__inst__displacement__average", metrics_dict,
-                       "average displacement +(\d*\.?\d*)",
-                       logPath+"/3_4_opendp.log")
-
-    extractTagFromFile("detailedplace__inst__displacement__max", metrics_dict,
-                       "max displacement +(\d*\.?\d*)",
-                       logPath+"/3_4_opendp.log")
-
-    extractTagFromFile("detailedplace__wirelength__initial__estimate", metrics_dict,
-                       "original HPWL +(\d*\.?\d*)",
-                       logPath+"/3_4_opendp.log")
-
-    extractTagFromFile("detailedplace__wirelength__final__estimate", metrics_dict,
-                       "legalized HPWL +(\d*\.?\d*)",
-                       logPath+"/3_4_opendp.log")
+    extractTags(metrics_dict, "floorplan", cwd, platform, design, files)
+    extractTags(metrics_dict, "place", cwd, platform, design, files)
 
 # CTS
 # ==============================================================================
     
-    latency_max,latency_min,skew = get_skew_latency(logPath+"/4_1_cts.log")
+    latency_max,latency_min,skew = get_skew_latency(logPath+"/4_1_cts.log", files)
     #print(f'skew = {skew}, latency_max = {latency_max}, latency_min = {latency_min}')
     metrics_dict['cts__timing__latency__min'] = latency_min
     metrics_dict['cts__timing__latency__max'] = latency_max
     metrics_dict['cts__timing__skew__worst'] = skew
 
-    extractTagFromFile("cts__timing__tns__total", metrics_dict,
-                       "^tns (\S+)",
-                       logPath+"/4_1_cts.log")
-
-    extractTagFromFile("cts__timing__wns__worst", metrics_dict,
-                       "^wns (\S+)",
-                       logPath+"/4_1_cts.log")
-
-    extractTagFromFile("cts__timing__ws__worst", metrics_dict,
-                       "^worst slack (\S+)",
-                       logPath+"/4_1_cts.log")
-
-# Route
-# ==============================================================================
-
-    extractTagFromFile("globalroute__timing__tns__total", metrics_dict,
-                      "^tns (\S+)",
-                      logPath+"/5_1_fastroute.log")
-
-    extractTagFromFile("globalroute__timing__wns__worst", metrics_dict,
-                      "^wns (\S+)",
-                      logPath+"/5_1_fastroute.log")
-
-    extractTagFromFile("globalroute__timing__ws__worst", metrics_dict,
-                      "^worst slack (\S+)",
-                      logPath+"/5_1_fastroute.log")
-
-    extractTagFromFile("detailedroute__wirelength", metrics_dict,
-                       "total wire length = +(\S+) um",
-                       logPath+"/5_2_TritonRoute.log")
-
-    extractTagFromFile("detailedroute__via__count", metrics_dict,
-                       "total number of vias = +(\S+)",
-                       logPath+"/5_2_TritonRoute.log")
-
-    extractTagFromFile("detailedroute__errors__count", metrics_dict,
-                       "(?i)error:",
-                       logPath+"/5_2_TritonRoute.log",
-                       count=True, defaultNotFound=0)
+    extractTags(metrics_dict, "cts", cwd, platform, design, files)
+    extractTags(metrics_dict, "route", cwd, platform, design, files)
+    extractTags(metrics_dict, "finish", cwd, platform, design, files)
 
-    extractTagFromFile("detailedroute__drc__error__count", metrics_dict,
-                       "(?i)violation",
-                       rptPath+"/5_route_drc.rpt",
-                       count=True, defaultNotFound=0)
-
-# Finish
+# Runtime, CPU and peak memory of every step, from the GNU time line of its
+# log (<step>__runtime__total, <step>__cpu__total in %, <step>__mem__peak in KB)
 # ==============================================================================
 
-    extractTagFromFile("finish__power__internal__total", metrics_dict,
-                       "Total +(\S+) +\S+ +\S+ +\S+ +\S+",
-                       logPath+"/6_report.log")
-
-    extractTagFromFile("finish__power__switch__total", metrics_dict,
-                       "Total +\S+ +(\S+) +\S+ +\S+ +\S+",
-                       logPath+"/6_report.log")
-
-    extractTagFromFile("finish__power__leak__total", metrics_dict,
-                       "Total +\S+ +\S+ +(\S+) +\S+ +\S+",
-                       logPath+"/6_report.log")
-
-    extractTagFromFile("finish__power__total", metrics_dict,
-                       "Total +\S+ +\S+ +\S+ +(\S+) +\S+",
-                       logPath+"/6_report.log")
-
-    extractTagFromFile("finish__area", metrics_dict,
-                      "^Design area (\S+) u\^2",
-                       logPath+"/6_report.log")
-
-    extractTagFromFile("finish__util", metrics_dict,
-                      "^Design area.* (\S+)% utilization",
-                       logPath+"/6_report.log")
+    step_logs = sorted(name for name in (os.listdir(logPath) if os.path.isdir(logPath) else [])
+                       if re.match("\d_.*\.log$", name))
+    for name in step_logs:
+      extractGnuTime(name[:-len(".log")], os.path.join(logPath, name), metrics_dict, files)
 
 # Accumulate time
 # ==============================================================================
 
-    failed = False
-    total = datetime.timedelta()
-    for key in metrics_dict:
-      if key.endswith("_time"):
-        # Big try block because Hour and microsecond is optional
-        try:
-          t = datetime.datetime.strptime(metrics_dict[key],"%H:%M:%S.%f")
-        except ValueError:
-          try:
-            t = datetime.datetime.strptime(metrics_dict[key],"%M:%S.%f")
-          except ValueError:
-            try:
-              t = datetime.datetime.strptime(metrics_dict[key],"%H:%M:%S")
-            except ValueError:
-              try:
-                t = datetime.datetime.strptime(metrics_dict[key],"%M:%S")
-              except ValueError:
-                failed = True
-                break
-
-        delta = datetime.timedelta(hours=t.hour, minutes=t.minute, seconds=t.second)
-        total += delta
-
-    if failed:
+    # steps without a GNU time line did not finish and are not counted
+    times = [parse_elapsed(metrics_dict[name[:-len(".log")] + "__runtime__total"]) for name in step_logs]
+    times = [seconds for seconds in times if seconds is not None]
+    total = sum(times)
+
+    if not times:
       metrics_dict["total_time"] = "ERR"
     else:
-      metrics_dict["total_time"] = str(total)
+      metrics_dict["total_time"] = str(datetime.timedelta(seconds=round(total, 2)))
 
     with open(output, "w") as resultSpecfile:
         json.dump(metrics_dict, resultSpecfile, indent=2)
 
-    metrics_df = pd.DataFrame(list(metrics_dict.items()))
-    col_index = metrics_df.iloc[0][1] + "__" + metrics_df.iloc[1][1]
-    metrics_df.columns = ["Metrics", col_index]
+    return metrics_dict, metrics_to_df(metrics_dict)
+
 
-    return metrics_dict, metrics_df
+# Pool worker of all_designs mode, the data frame is built by the caller.
+# A run that cannot be extracted, e.g. one that failed or was stopped before
+# floorplan and has no 2_floorplan.sdc, is skipped with None.
+def extract_run(task):
+    run_path, plt, des, output, manifest, openroad_version = task
+    try:
+        return extract_metrics(run_path, plt, des, output, openroad_version, manifest)[0]
+    except Exception as e:
+        print("[WARN] Skipping {} {} {}: {}".format(os.path.basename(run_path), plt, des, e), flush=True)
+        return None
 
 
 args = parse_args()
@@ -473,41 +596,116 @@ if args.design == "all_designs":
     print("List of designs")
     rootdir = './data'
 
-    all_metrics_df = pd.DataFrame()
     all_metrics = []
 
     cwd = os.getcwd()
 
-    for run_it in os.scandir(rootdir):
+    index = {} if args.force else load_index(METRICS_INDEX)
+    new_index = {}
+
+    # platform and design of the runs harvested by run_design.py are in
+    # their manifests, the log folders are only walked for older data folders
+    manifests = results_store.read_data_index(os.path.join(rootdir, os.path.basename(results_store.DATA_INDEX)))
+
+    # runs in a deterministic order, whatever the order of the directory
+    runs = []
+    for run_it in sorted(os.scandir(rootdir), key=lambda it: it.name):
         if run_it.is_dir():
             run = run_it.name
-            if not os.path.isdir('%s/logs'%(run_it.path)):
+            manifest = manifests.get(run)
+            if manifest is not None and manifest["design_name"] is not None:
+                run_designs = [(manifest["platform"], manifest["design_name"])]
+            elif os.path.isdir('%s/logs'%(run_it.path)):
+                run_designs = [(platform_it.name, design_it.name)
+                               for platform_it in sorted(os.scandir('%s/logs'%(run_it.path)), key=lambda it: it.name)
+                               if platform_it.is_dir()
+                               for design_it in sorted(os.scandir(platform_it.path), key=lambda it: it.name)
+                               if design_it.is_dir()]
+            else:
                 continue
-            for platform_it in os.scandir('%s/logs'%(run_it.path)):
-                if platform_it.is_dir():
-                    plt = platform_it.name
-                    for design_it in os.scandir(platform_it.path):
-                        if design_it.is_dir():
-                            des = design_it.name
-                            print(run,plt,des)
-                            design_metrics, design_metrics_df = extract_metrics(run_it.path, plt, des,
-                                                os.path.join(run_it.path, "reports", plt, des, "metrics.json"))
-                            all_metrics.append(design_metrics)
-                            if all_metrics_df.shape[0] == 0:
-                                all_metrics_df = design_metrics_df
-                            else:
-                                all_metrics_df = all_metrics_df.merge(design_metrics_df,
-                                                            on = 'Metrics', how = 'inner')
+            for plt, des in run_designs:
+                output = os.path.join(run_it.path, "reports", plt, des, "metrics.json")
+                key = "/".join([run, plt, des])
+                new_index[key] = {"version": EXTRACTOR_VERSION,
+                                  "inputs": get_run_inputs(run_it.path, plt, des)}
+                # unchanged since the last extraction?
+                unchanged = index.get(key) == new_index[key] and os.path.isfile(output)
+                runs.append((run_it.path, plt, des, output, manifest, unchanged))
+
+    # the runs to extract are spread over a pool of workers, results come
+    # back in the order of "runs"
+    tasks = [(run_path, plt, des, output, manifest) for run_path, plt, des, output, manifest, unchanged in runs if not unchanged]
+    num_extracted = len(tasks)
+    jobs = min(args.jobs, num_extracted)
+    pool = None
+    start = time.time()
+    if num_extracted > 0:
+        openroad_version = get_openroad_version()
+        tasks = [task + (openroad_version,) for task in tasks]
+        if jobs > 1:
+            pool = multiprocessing.get_context("fork").Pool(jobs)
+            extracted = pool.imap(extract_run, tasks)
+        else:
+            extracted = map(extract_run, tasks)
+
+    done = 0
+    skipped = 0
+    stored = []
+    for run_path, plt, des, output, manifest, unchanged in runs:
+        if unchanged:
+            with open(output, "r") as f:
+                design_metrics = json.load(f)
+        else:
+            design_metrics = next(extracted)
+            done += 1
+            elapsed = time.time() - start
+            print("[{:d}/{:d}] {:.1f} runs/s {} {} {}".format(done, num_extracted, done / max(elapsed, 1e-6),
+                                                             os.path.basename(run_path), plt, des), flush=True)
+        if design_metrics is None:
+            # not indexed, so it is tried again next time
+            del new_index["/".join([os.path.basename(run_path), plt, des])]
+            skipped += 1
+            continue
+        all_metrics.append(design_metrics)
+        if not unchanged:
+            stored.append({"folder": run_path, "metrics": design_metrics,
+                           "defaults": {"design": des, "platform": plt}})
+    if pool is not None:
+        pool.close()
+        pool.join()
+    if stored and args.store:
+        results_store.update_runs(results_store.open_store(args.store), stored)
+    if num_extracted > 0:
+        elapsed = time.time() - start
+        print("Extracted {:d} runs in {:.1f} s with {:d} workers ({:.1f} runs/s)".format(
+              num_extracted - skipped, elapsed, jobs, num_extracted / max(elapsed, 1e-6)))
+    print("{:d} designs, {:d} extracted, {:d} skipped, {:d} unchanged".format(
+          len(new_index) + skipped, num_extracted - skipped, skipped, len(new_index) + skipped - num_extracted))
+    outputs = ["metrics.json", "metrics.csv", "metrics.html"]
+    if pyarrow is not None:
+        outputs.append("metrics.parquet")
+    if args.excel:
+        outputs.append("metrics.xlsx")
+    if new_index == index and all(os.path.isfile(f) for f in outputs):
+        print("Metrics are up to date")
+        sys.exit(0)
 #
-# render to json and html
+# render to json, parquet, csv and html
 #
     with open("metrics.json", "w") as outFile:
         json.dump(all_metrics, outFile)
-    all_metrics_df.to_excel('./metrics.xlsx')
+    if pyarrow is not None:
+        metrics_to_table(all_metrics).to_parquet('./metrics.parquet', index=False)
+    else:
+        print("[WARN] pyarrow is not installed, metrics.parquet is not written")
+    all_metrics_df = metrics_to_wide_df(all_metrics) if all_metrics else pd.DataFrame()
+    if args.excel:
+        all_metrics_df.to_excel('./metrics.xlsx')
     all_metrics_df.to_csv('./metrics.csv', mode='w')
     metrics_html = all_metrics_df.to_html()
     metrics_html_file = open("metrics.html", "w")
     metrics_html_file.write(metrics_html)
     metrics_html_file.close()
+    save_index(METRICS_INDEX, new_index)
 else:
     metrics_dict, metrics_df = extract_metrics(args.flowPath, args.platform, args.design, args.output)
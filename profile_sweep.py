@@ -0,0 +1,262 @@
+import os
+import re
+import sys
+import json
+import glob
+import argparse
+import pandas as pd
+import results_store
+
+################################
+# Profile settings
+################################
+
+# Every step of the flow is run by $(TIME_CMD), so each step log ends with a
+# GNU time line "<elapsed>elapsed <cpu>%CPU <mem>memKB" and is last written
+# when its step ends. The profile of a run is built from these lines and the
+# mtimes of its step logs in ./data, the knobs of a run from its manifest in
+# the data index. The steps before the first_stage of its manifest (copied
+# from a prefix checkpoint another run is credited with) and those of its
+# cache_hits stages (restored from the stage cache with a fresh mtime) are
+# left out, so every step that ran is counted once.
+GNU_TIME = re.compile("^(\S+)elapsed (\d+)%CPU (\d+)memKB", re.M)
+
+# Flow stages, in the order of the first digit of their step logs
+STAGES = ["synth", "floorplan", "place", "cts", "route", "finish"]
+
+# Bytes read from the end of a step log for its GNU time line
+TAIL_SIZE = 4096
+
+# Quantiles of the stage runtimes and peaks in the summaries
+QUANTILES = [0.5, 0.9]
+
+################################
+# Step logs
+################################
+
+# Seconds of a GNU time "%E" value ([hours:]minutes:seconds)
+def parse_elapsed(value):
+    seconds = 0.0
+    for field in value.split(":"):
+        seconds = seconds * 60 + float(field)
+    return seconds
+
+
+# (elapsed seconds, CPU %, peak memory in KB) of the GNU time line at the end
+# of "log_file", None if the step did not finish
+def read_gnu_time(log_file):
+    with open(log_file, "rb") as rf:
+        rf.seek(max(0, os.fstat(rf.fileno()).st_size - TAIL_SIZE))
+        tail = rf.read().decode("utf-8", errors="replace")
+    m = None
+    for m in GNU_TIME.finditer(tail):
+        pass
+    if m is None:
+        return None
+    return parse_elapsed(m.group(1)), int(m.group(2)), int(m.group(3))
+
+
+# Stages the run of "manifest" did not execute itself
+def get_skipped_stages(manifest):
+    if manifest is None:
+        return set()
+    skipped = set(STAGES[:STAGES.index(manifest.get("first_stage", STAGES[0]))])
+    return skipped.union(manifest.get("cache_hits", []))
+
+
+# One row per finished step of the run in "folder", without the steps of the
+# "skipped" stages
+def get_run_steps(folder, skipped=()):
+    steps = []
+    for log_file in sorted(glob.glob(os.path.join(folder, "logs", "*", "*", "[1-6]_*.log"))):
+        if STAGES[int(os.path.basename(log_file)[0]) - 1] in skipped:
+            continue
+        try:
+            gnu_time = read_gnu_time(log_file)
+            end = os.path.getmtime(log_file)
+        except (IOError, ValueError):
+            continue
+        if gnu_time is None:
+            continue
+        elapsed, cpu, mem = gnu_time
+        step = os.path.basename(log_file)[:-len(".log")]
+        steps.append({"stage": STAGES[int(step[0]) - 1], "step": step, "start": end - elapsed, "end": end,
+                      "wall": elapsed, "cpu": cpu, "mem": mem / 1024})
+    return steps
+
+
+# Runs of "data_dir" as (folder, manifest or None), the manifests come from
+# the data index, folders without one are listed too
+def get_runs(data_dir, index_file):
+    manifests = results_store.read_data_index(index_file)
+    runs = []
+    for run_it in sorted(os.scandir(data_dir), key=lambda it: it.name):
+        if run_it.is_dir() and os.path.isdir(os.path.join(run_it.path, "logs")):
+            runs.append((run_it.path, manifests.get(run_it.name)))
+    return runs
+
+################################
+# Tables
+################################
+
+# One row per run and step: run, sweep, idx, state, stage, step, start, end,
+# wall (s), cpu (%), mem (MiB peak) and the knobs of the run
+def get_step_table(runs):
+    rows = []
+    for folder, manifest in runs:
+        run = {"run": os.path.basename(folder)}
+        if manifest is not None:
+            run.update(sweep=manifest["sweep"], idx=manifest["idx"], state=manifest["state"])
+            run.update(manifest["knobs"])
+        for step in get_run_steps(folder, get_skipped_stages(manifest)):
+            rows.append(dict(run, **step))
+    return pd.DataFrame(rows)
+
+
+# One row per run and stage: wall time summed over its steps, CPU % weighted
+# by the step wall times, and the peak memory of its steps
+def get_stage_table(steps, knobs):
+    steps = steps.assign(cpu_time=steps["wall"] * steps["cpu"])
+    keys = ["run"] + [column for column in ["sweep", "idx", "state"] if column in steps.columns] + ["stage"]
+    stages = steps.groupby(keys, sort=False, dropna=False).agg(
+        start=("start", "min"), end=("end", "max"), wall=("wall", "sum"), cpu_time=("cpu_time", "sum"),
+        mem=("mem", "max")).reset_index()
+    stages["cpu"] = stages["cpu_time"] / stages["wall"].where(stages["wall"] > 0)
+    stages = stages.drop(columns="cpu_time")
+    if knobs:
+        stages = stages.merge(steps[["run"] + knobs].drop_duplicates("run"), on="run", how="left")
+    return stages
+
+
+def describe(groups):
+    summary = groups.agg(runs=("wall", "size"), wall_mean=("wall", "mean"),
+                         **{"wall_p{:.0f}".format(100 * q): ("wall", lambda x, q=q: x.quantile(q)) for q in QUANTILES},
+                         wall_max=("wall", "max"), cpu_mean=("cpu", "mean"),
+                         **{"mem_p{:.0f}".format(100 * q): ("mem", lambda x, q=q: x.quantile(q)) for q in QUANTILES},
+                         mem_max=("mem", "max"))
+    return summary.reset_index()
+
+
+# Distribution of the stage wall times, CPU and peaks over all runs
+def get_stage_summary(stages):
+    summary = describe(stages.groupby("stage", sort=False))
+    order = {stage: i for i, stage in enumerate(STAGES)}
+    return summary.sort_values("stage", key=lambda column: column.map(order)).reset_index(drop=True)
+
+
+# Distribution of the stage wall times and peaks per bucket of every knob:
+# "buckets" quantile ranges, or the values themselves for knobs with fewer
+# distinct values
+def get_knob_summary(stages, knobs, buckets):
+    summaries = []
+    for knob in knobs:
+        values = stages[knob]
+        if values.nunique() <= buckets:
+            bucket = values.astype(str)
+        else:
+            bucket = pd.qcut(values, buckets, duplicates="drop").astype(str)
+        summary = describe(stages.assign(bucket=bucket).groupby(["stage", "bucket"], sort=True))
+        summary.insert(0, "knob", knob)
+        summaries.append(summary)
+    if not summaries:
+        return pd.DataFrame()
+    return pd.concat(summaries, ignore_index=True)
+
+
+# Per stage, the knob whose buckets differ most in median wall time, as
+# (stage, knob, slowest bucket, its median, fastest median)
+def get_knob_effects(knob_summary):
+    effects = []
+    for stage, summary in knob_summary.groupby("stage", sort=False):
+        best = None
+        for knob, buckets in summary.groupby("knob", sort=False):
+            buckets = buckets[buckets["runs"] > 0]
+            if len(buckets) < 2:
+                continue
+            slowest = buckets.loc[buckets["wall_p50"].idxmax()]
+            ratio = slowest["wall_p50"] / max(buckets["wall_p50"].min(), 1e-9)
+            if best is None or ratio > best[0]:
+                best = (ratio, knob, slowest["bucket"], slowest["wall_p50"], buckets["wall_p50"].min())
+        if best is not None and best[0] > 1:
+            effects.append((stage,) + best[1:])
+    order = {stage: i for i, stage in enumerate(STAGES)}
+    return sorted(effects, key=lambda effect: order.get(effect[0], len(STAGES)))
+
+################################
+# Trace
+################################
+
+# Trace event JSON (chrome://tracing, Perfetto): a process per sweep, a
+# thread (lane) per run, and per stage a span with its steps nested in it.
+# Times are in microseconds from the start of the first step.
+def get_trace(steps, stages):
+    origin = steps["start"].min()
+    events = []
+    pids = {}
+    tids = {}
+    runs = steps.drop_duplicates("run")
+    sweeps = runs["sweep"] if "sweep" in runs.columns else [None] * len(runs)
+    for run, sweep in zip(runs["run"], sweeps):
+        # data folders without a manifest
+        sweep = sweep if isinstance(sweep, str) else "unknown sweep"
+        if sweep not in pids:
+            pids[sweep] = len(pids) + 1
+            events.append({"name": "process_name", "ph": "M", "pid": pids[sweep], "tid": 0, "args": {"name": sweep}})
+        tids[run] = (pids[sweep], len(tids) + 1)
+        events.append({"name": "thread_name", "ph": "M", "pid": pids[sweep], "tid": tids[run][1], "args": {"name": run}})
+    for row in stages.itertuples(index=False):
+        pid, tid = tids[row.run]
+        events.append({"name": row.stage, "cat": "stage", "ph": "X", "pid": pid, "tid": tid,
+                       "ts": round((row.start - origin) * 1e6), "dur": round((row.end - row.start) * 1e6),
+                       "args": {"wall_s": round(row.wall, 2), "cpu_pct": None if pd.isna(row.cpu) else round(row.cpu),
+                                "mem_mib": round(row.mem, 1)}})
+    for row in steps.itertuples(index=False):
+        pid, tid = tids[row.run]
+        events.append({"name": row.step, "cat": row.stage, "ph": "X", "pid": pid, "tid": tid,
+                       "ts": round((row.start - origin) * 1e6), "dur": round(row.wall * 1e6),
+                       "args": {"cpu_pct": row.cpu, "mem_mib": round(row.mem, 1)}})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+################################
+# Command line
+################################
+
+def parse_args():
+  parser = argparse.ArgumentParser(description='Per-stage runtime, CPU and peak memory of the runs in ./data, from the GNU time lines of their step logs')
+  parser.add_argument('--data', default='./data', help='Folder of the run data folders')
+  parser.add_argument('--index', default=results_store.DATA_INDEX, help='Index of the run manifests written by run_design.py')
+  parser.add_argument('--sweep', action='append', default=[], help='Only the runs of this sweep, repeatable')
+  parser.add_argument('--buckets', type=int, default=4, help='Buckets of each knob in the knob summary')
+  parser.add_argument('--output', '-o', default='./doe_profile', help='Output folder')
+  return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    runs = get_runs(args.data, args.index)
+    if args.sweep:
+        runs = [(folder, manifest) for folder, manifest in runs if manifest is not None and manifest["sweep"] in args.sweep]
+    steps = get_step_table(runs)
+    if steps.empty:
+        print("No finished steps found in " + args.data)
+        sys.exit(1)
+    knobs = [column for column in steps.columns
+             if column not in ["run", "sweep", "idx", "state", "stage", "step", "start", "end", "wall", "cpu", "mem"]]
+    stages = get_stage_table(steps, knobs)
+    stage_summary = get_stage_summary(stages)
+    knob_summary = get_knob_summary(stages, knobs, args.buckets)
+
+    os.makedirs(args.output, exist_ok=True)
+    steps.to_csv(os.path.join(args.output, "steps.csv"), index=False)
+    stages.to_csv(os.path.join(args.output, "stages.csv"), index=False)
+    stage_summary.to_csv(os.path.join(args.output, "stage_summary.csv"), index=False)
+    knob_summary.to_csv(os.path.join(args.output, "knob_summary.csv"), index=False)
+    with open(os.path.join(args.output, "trace.json"), "w") as wf:
+        json.dump(get_trace(steps, stages), wf)
+
+    print("{:d} runs, {:d} steps, {:.1f} h of stage wall time".format(stages["run"].nunique(), len(steps), stages["wall"].sum() / 3600))
+    print(stage_summary.to_string(index=False, float_format="{:.1f}".format))
+    for stage, knob, bucket, slowest, fastest in get_knob_effects(knob_summary):
+        print("{}: {} {} has a median of {:.1f}s, {:.1f}x the fastest bucket ({:.1f}s)".format(
+              stage, knob, bucket, slowest, slowest / max(fastest, 1e-9), fastest))
+    print("Profile written to " + args.output + " (steps.csv, stages.csv, stage_summary.csv, knob_summary.csv, trace.json)")
@@ -0,0 +1,367 @@
+import os
+import re
+import csv
+import sys
+import json
+import glob
+import time
+import sqlite3
+import argparse
+
+################################
+# Store settings
+################################
+
+# One SQLite table holds a row per run of all sweeps, keyed by its data folder
+# (e.g. "data/ibex_sky130hs_CORE_UTILIZATION_..."): sweep, design, platform, ledger
+# state and one column per input knob and per extracted metric. Columns are
+# added as new knobs and metrics show up; knob columns are indexed. run_design.py
+# updates it on every harvest and genMetrics_bigDoE.py on every extraction, and
+# `python3 results_store.py import` fills it from existing sweeps and reports.
+RESULTS_STORE = "./doe_results.db"
+
+# run_design.py writes a RUN_MANIFEST (knob vector, sweep, sample index,
+# design, platform, hashes of the rendered flow files, start/end time and
+# state) into every data folder it harvests and appends it as one JSON line
+# to DATA_INDEX, which lists all runs in ./data in a single file
+RUN_MANIFEST = "run.json"
+DATA_INDEX = "./data/index.jsonl"
+
+# Columns of every run, the others are knobs and metrics
+RUN_COLUMNS = ["folder", "sweep", "design", "platform", "idx", "state", "exit_code", "start", "end", "updated"]
+
+# Values extractors set when a metric could not be extracted, stored as NULL
+MISSING_VALUES = ["ERR", "N/A"]
+
+OPERATORS = ["<=", ">=", "!=", "=", "<", ">"]
+AGGREGATES = ["count", "min", "max", "avg", "sum"]
+
+################################
+# Store
+################################
+
+def open_store(path=RESULTS_STORE):
+    db = sqlite3.connect(path, timeout=60)
+    with db:
+        db.execute("CREATE TABLE IF NOT EXISTS runs (folder TEXT PRIMARY KEY, sweep TEXT, design TEXT, platform TEXT, "
+                   "idx INTEGER, state TEXT, exit_code INTEGER, start REAL, end REAL, updated REAL)")
+        db.execute("CREATE TABLE IF NOT EXISTS columns (name TEXT PRIMARY KEY, kind TEXT)")
+        db.execute("CREATE INDEX IF NOT EXISTS runs_sweep ON runs (sweep)")
+        db.execute("CREATE INDEX IF NOT EXISTS runs_design ON runs (design, platform)")
+        db.execute("CREATE INDEX IF NOT EXISTS runs_state ON runs (state)")
+    return db
+
+
+def quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+# {column: kind} of the knob and metric columns
+def get_columns(db):
+    return dict(db.execute("SELECT name, kind FROM columns"))
+
+
+# Add the columns of "names" that do not exist yet, as "kind" ("knob" or "metric")
+def add_columns(db, names, kind):
+    columns = get_columns(db)
+    for name in names:
+        if name in columns or name in RUN_COLUMNS:
+            continue
+        db.execute("ALTER TABLE runs ADD COLUMN " + quote(name))
+        db.execute("INSERT INTO columns VALUES (?, ?)", (name, kind))
+        if kind == "knob":
+            db.execute("CREATE INDEX " + quote("runs_knob_" + name) + " ON runs (" + quote(name) + ")")
+        columns[name] = kind
+
+
+# Numbers are stored as REAL, missing values as NULL and lists as JSON
+def to_value(value):
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    value = str(value)
+    if value in MISSING_VALUES:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+# Insert or update runs, each a dict with "folder", any of RUN_COLUMNS and
+# optionally "knobs" and "metrics" dicts, in one transaction. RUN_COLUMNS in
+# a "defaults" dict are only set where they are still NULL, e.g. the design
+# of a run that is only known from its metrics.
+def update_runs(db, runs):
+    with db:
+        for run in runs:
+            run = dict(run)
+            knobs = run.pop("knobs", None) or {}
+            metrics = run.pop("metrics", None) or {}
+            defaults = run.pop("defaults", None) or {}
+            add_columns(db, knobs, "knob")
+            add_columns(db, metrics, "metric")
+            values = {key: value for key, value in run.items() if key != "folder"}
+            values.update((name, to_value(value)) for name, value in knobs.items())
+            values.update((name, to_value(value)) for name, value in metrics.items())
+            values["updated"] = time.time()
+            assignments = [quote(key) + " = ?" for key in values]
+            assignments += [quote(key) + " = COALESCE(" + quote(key) + ", ?)" for key in defaults]
+            folder = os.path.normpath(run["folder"])
+            db.execute("INSERT OR IGNORE INTO runs (folder) VALUES (?)", (folder,))
+            db.execute("UPDATE runs SET " + ", ".join(assignments) + " WHERE folder = ?",
+                       [*values.values(), *defaults.values(), folder])
+
+
+def update_run(db, folder, **fields):
+    update_runs(db, [dict(fields, folder=folder)])
+
+################################
+# Queries
+################################
+
+# (column, operator, value) of a filter such as "CLK_PERIOD < 6"; "= null"
+# and "!= null" test for missing values
+def parse_filter(text):
+    m = re.match("\s*([^<>=!\s]+)\s*(" + "|".join(re.escape(op) for op in OPERATORS) + ")\s*(.*?)\s*$", text)
+    if not m:
+        raise ValueError("cannot parse filter " + repr(text))
+    column, op, value = m.groups()
+    if value.lower() == "null":
+        value = None
+    else:
+        value = to_value(value.strip("'\""))
+    return column, op, value
+
+
+def check_column(db, column):
+    if column not in RUN_COLUMNS and column not in get_columns(db):
+        raise ValueError("unknown column " + repr(column))
+    return quote(column)
+
+
+# Runs matching all "filters" (strings or (column, operator, value) tuples).
+# Without "group_by" and "aggregates", returns their "columns" (all by
+# default); otherwise one row per group of "group_by" with the group columns
+# and the "aggregates" ((function, column) pairs, e.g. ("max",
+# "cts__timing__wns__worst")). Returns (header, rows).
+def query(db, filters=(), columns=None, group_by=(), aggregates=(), order_by=None, descending=False, limit=None):
+    where = []
+    params = []
+    for f in filters:
+        column, op, value = parse_filter(f) if isinstance(f, str) else f
+        if op not in OPERATORS:
+            raise ValueError("unknown operator " + repr(op))
+        if value is None and op in ["=", "!="]:
+            where.append(check_column(db, column) + (" IS NULL" if op == "=" else " IS NOT NULL"))
+        else:
+            where.append(check_column(db, column) + " " + op + " ?")
+            params.append(value)
+
+    if group_by or aggregates:
+        header = list(group_by)
+        select = [check_column(db, column) for column in group_by]
+        for function, column in aggregates:
+            if function not in AGGREGATES:
+                raise ValueError("unknown aggregate " + repr(function))
+            select.append(function + "(" + ("*" if column == "*" else check_column(db, column)) + ")")
+            header.append(function + "(" + column + ")")
+    else:
+        header = columns or [column[1] for column in db.execute("PRAGMA table_info(runs)")]
+        select = [check_column(db, column) for column in header]
+
+    sql = "SELECT " + ", ".join(select) + " FROM runs"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    if group_by:
+        sql += " GROUP BY " + ", ".join(select[:len(group_by)])
+    if order_by:
+        if (group_by or aggregates) and order_by in header:
+            sql += " ORDER BY " + str(header.index(order_by) + 1)
+        else:
+            sql += " ORDER BY " + check_column(db, order_by)
+        sql += " DESC" if descending else ""
+    if limit is not None:
+        sql += " LIMIT " + str(int(limit))
+    return header, db.execute(sql, params).fetchall()
+
+################################
+# Import
+################################
+
+# Runs recorded in the ledgers of the sweeps in "sweeps_dir"
+def import_ledgers(db, sweeps_dir):
+    num_runs = 0
+    for ledger_file in sorted(glob.glob(os.path.join(sweeps_dir, "*", "doe.db"))):
+        ledger = sqlite3.connect(ledger_file)
+        try:
+            sweep = dict(ledger.execute("SELECT key, value FROM sweep"))
+            attrs_names = json.loads(sweep["attrs_names"])
+            rows = ledger.execute("SELECT idx, knobs, state, exit_code, start, end, target_folder FROM runs "
+                                  "WHERE target_folder IS NOT NULL").fetchall()
+        except (sqlite3.Error, KeyError):
+            continue
+        finally:
+            ledger.close()
+        update_runs(db, [{"folder": target_folder, "sweep": os.path.basename(os.path.dirname(ledger_file)),
+                          "design": sweep["design"], "platform": sweep["platform"], "idx": idx, "state": state,
+                          "exit_code": exit_code, "start": start, "end": end,
+                          "knobs": dict(zip(attrs_names, json.loads(knobs)))}
+                         for idx, knobs, state, exit_code, start, end, target_folder in rows])
+        num_runs += len(rows)
+    return num_runs
+
+
+# Manifests of DATA_INDEX by data folder name; a folder harvested again
+# keeps its latest manifest
+def read_data_index(index_file=DATA_INDEX):
+    manifests = {}
+    try:
+        with open(index_file, "r") as rf:
+            for line in rf:
+                try:
+                    manifest = json.loads(line)
+                except ValueError:
+                    # line cut by an interrupted sweep
+                    continue
+                manifests[os.path.basename(manifest["folder"])] = manifest
+    except IOError:
+        pass
+    return manifests
+
+
+# Runs listed in DATA_INDEX, which also covers data folders whose sweep
+# ledger is gone
+def import_index(db, index_file):
+    manifests = read_data_index(index_file).values()
+    update_runs(db, [{"folder": manifest["folder"], "sweep": manifest["sweep"], "design": manifest["design"],
+                      "platform": manifest["platform"], "idx": manifest["idx"], "state": manifest["state"],
+                      "exit_code": manifest["exit_code"], "start": manifest["start"], "end": manifest["end"],
+                      "knobs": manifest["knobs"]}
+                     for manifest in manifests])
+    return len(manifests)
+
+
+# genMetrics_bigDoE.py metrics.json of the runs in "data_dir"
+def import_metrics(db, data_dir):
+    runs = []
+    for metrics_file in sorted(glob.glob(os.path.join(data_dir, "*", "reports", "*", "*", "metrics.json"))):
+        folder, _, platform, design, _ = metrics_file[len(data_dir):].strip(os.sep).rsplit(os.sep, 4)
+        try:
+            with open(metrics_file, "r") as rf:
+                metrics = json.load(rf)
+        except (IOError, ValueError):
+            continue
+        runs.append({"folder": os.path.join(data_dir, folder), "metrics": metrics,
+                     "defaults": {"design": design, "platform": platform}})
+    update_runs(db, runs)
+    return len(runs)
+
+
+# collect_data.py doe_reports/data_stream.json, as "<step>__<field>" metrics
+# of the ctest/<design> folders it was collected from
+def import_doe_reports(db, reports_dir):
+    try:
+        with open(os.path.join(reports_dir, "data_stream.json"), "r") as rf:
+            all_results = json.load(rf)
+    except (IOError, ValueError):
+        return 0
+    runs = []
+    for design_name, steps in all_results.items():
+        metrics = {}
+        for step, results in steps.items():
+            metrics.update((step + "__" + field, value) for field, value in results.items() if field != "name")
+        runs.append({"folder": os.path.join("ctest", design_name), "metrics": metrics})
+    update_runs(db, runs)
+    return len(runs)
+
+
+# Legacy dumps like gcd_all_results: a folder line followed by "key: value"
+# lines of its 6_report.log, with the knobs only in the folder name
+# (<design>_<KNOB>_<value>_...)
+def import_legacy(db, legacy_file):
+    renamed = {"internal_poewr": "internal_power", "instance count": "instance_count"}
+    runs = []
+    with open(legacy_file, "r") as rf:
+        for line in rf:
+            line = line.strip()
+            if not line:
+                continue
+            if ":" not in line:
+                tokens = os.path.basename(line).split("_")
+                knobs = {}
+                name = []
+                for token in tokens[1:]:
+                    try:
+                        knobs["_".join(name)] = float(token)
+                        name = []
+                    except ValueError:
+                        name.append(token)
+                runs.append({"folder": line, "knobs": knobs, "metrics": {}, "defaults": {"design": tokens[0]}})
+            elif runs:
+                key, value = line.split(":", 1)
+                runs[-1]["metrics"]["6_report__" + renamed.get(key, key)] = value.strip()
+    update_runs(db, runs)
+    return len(runs)
+
+################################
+# Command line
+################################
+
+def parse_args():
+  parser = argparse.ArgumentParser(description='Results of all DoE sweeps in an SQLite store')
+  parser.add_argument('--store', default=RESULTS_STORE, help='Store file')
+  subparsers = parser.add_subparsers(dest='command', required=True)
+
+  import_parser = subparsers.add_parser('import', help='Add the runs of existing sweeps and reports')
+  import_parser.add_argument('--sweeps', default='./doe_sweeps', help='Folder of the sweep ledgers')
+  import_parser.add_argument('--data', default='./data', help='Folder of the run data folders')
+  import_parser.add_argument('--index', default=DATA_INDEX, help='Index of the run manifests written by run_design.py')
+  import_parser.add_argument('--doe-reports', default='./doe_reports', help='Output folder of collect_data.py')
+  import_parser.add_argument('--legacy', nargs='*', default=[], help='Legacy text dumps such as gcd_all_results')
+
+  query_parser = subparsers.add_parser('query', help='Print the matching runs as CSV')
+  query_parser.add_argument('--where', '-w', action='append', default=[],
+                            help='Filter such as "CLK_PERIOD < 6" or "finish__power__total != null", repeatable')
+  query_parser.add_argument('--columns', '-c', help='Comma separated columns, all by default')
+  query_parser.add_argument('--group-by', '-g', help='Comma separated columns to group by')
+  query_parser.add_argument('--agg', '-a', action='append', default=[],
+                            help='Aggregate of the groups such as "max:cts__timing__wns__worst" or "count:*", repeatable')
+  query_parser.add_argument('--order-by', '-o', help='Column to sort by')
+  query_parser.add_argument('--desc', action='store_true', help='Sort in descending order')
+  query_parser.add_argument('--limit', '-n', type=int, help='Maximum number of rows')
+
+  subparsers.add_parser('columns', help='List the knob and metric columns')
+  return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    db = open_store(args.store)
+
+    if args.command == "import":
+        print("{:d} runs from the data index".format(import_index(db, args.index)))
+        print("{:d} runs from ledgers".format(import_ledgers(db, args.sweeps)))
+        print("{:d} runs with metrics.json".format(import_metrics(db, args.data)))
+        print("{:d} runs from collect_data.py reports".format(import_doe_reports(db, args.doe_reports)))
+        for legacy_file in args.legacy:
+            print("{:d} runs from {}".format(import_legacy(db, legacy_file), legacy_file))
+
+    elif args.command == "query":
+        try:
+            header, rows = query(db, args.where,
+                                 columns=args.columns.split(",") if args.columns else None,
+                                 group_by=args.group_by.split(",") if args.group_by else (),
+                                 aggregates=[tuple(agg.split(":", 1)) for agg in args.agg],
+                                 order_by=args.order_by, descending=args.desc, limit=args.limit)
+        except (ValueError, sqlite3.Error) as e:
+            print("Error: " + str(e))
+            sys.exit(1)
+        writer = csv.writer(sys.stdout)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+    elif args.command == "columns":
+        for name, kind in sorted(get_columns(db).items(), key=lambda item: (item[1], item[0])):
+            print(kind + " " + name)
@@ -1,5 +1,6 @@
 import glob
 import re
+import fnmatch
 import os
 import numpy as np
 import shutil
@@ -8,9 +9,20 @@ import multiprocessing
 import sys
 import math
 import time
-from itertools import product
-from pyDOE import *
+import signal
+import threading
+import queue
+import resource
+import hashlib
+import secrets
+import json
+import sqlite3
+import argparse
+import doe_worker
+import results_store
 from scipy.stats.distributions import norm, uniform, truncnorm
+from scipy.linalg import cho_factor, cho_solve, solve_triangular
+from scipy.optimize import minimize
 
 ################################
 # Sweeping attributes
@@ -57,6 +69,9 @@ LHS_ATTRS = {
 }
 LHS_SAMPLES = 5000
 
+# The knob vectors are generated as one array; the ledger and doe.log are
+# written PLAN_CHUNK rows at a time
+PLAN_CHUNK = 10000
 
 
 SWEEPING_ATTRS = LHS_ATTRS.keys()
@@ -76,6 +91,25 @@ VALUE_TYPE = {
     "GR_OVERFLOW": "int"
 }
 
+# Decimals each knob is rendered with into the flow files and the data folder
+# name, "*" matches a name prefix. Knob vectors that agree at these precisions
+# run the same flow, so they are merged into one run of the plan.
+KNOB_DECIMALS = {
+    "CLK_PERIOD": 4,
+    "CORE_UTILIZATION": 0,
+    "ASPECT_RATIO": 2,
+    "GP_PAD": 0,
+    "DP_PAD": 0,
+    "LAYER_ADJUST*": 1,
+    "PLACE_DENSITY": 2,
+    "FLATTEN": 0,
+    "ABC_CLOCK_PERIOD": 1,
+    "PINS_DISTANCE": 0,
+    "CTS_CLUSTER_SIZE": 0,
+    "CTS_CLUSTER_DIAMETER": 0,
+    "GR_OVERFLOW": 0,
+}
+
 ################################
 # Design platform
 ################################
@@ -85,9 +119,251 @@ PLATFORM = "sky130hs"
 PLATFORM_CONFIG = "config.mk"
 PLATFORM_DIR = "./platforms/" + PLATFORM
 
+# Everything a sweep writes outside ./data stays in SWEEP_DIR: doe.log, the
+# ledger, the script and platform variants (flow/) and one workspace per
+# running job (runs/), so sweeps with different names can share a machine.
+SWEEP_NAME = DESIGN + "_" + PLATFORM
+SWEEP_DIR = "./doe_sweeps/" + SWEEP_NAME
+FLOW_DIR = SWEEP_DIR + "/flow"
+RUNS_DIR = SWEEP_DIR + "/runs"
+DOE_LOG = SWEEP_DIR + "/doe.log"
+
+# Runs whose knob vector already has a finished folder in ./data (one that
+# contains RESULT_OUTPUT for PLATFORM), e.g. from an earlier sweep, are not run again
+REUSE_RESULTS = True
+RESULT_OUTPUT = "reports/" + PLATFORM + "/*/6_final_report.rpt"
+
+# Knobs, state and metrics of every harvested run are added to this store,
+# which is shared by all sweeps (see results_store.py, None = off)
+RESULTS_STORE = results_store.RESULTS_STORE
+
+# Every harvested data folder gets a RUN_MANIFEST with its knob vector,
+# sweep, sample index, design, platform, hashes of its rendered flow files,
+# start/end time and state, the first stage it is credited with (see
+# get_run_stages) and the stages it took from the stage cache, and the manifest is appended as one line to
+# DATA_INDEX, so that tools can list the runs in ./data without walking it
+RUN_MANIFEST = results_store.RUN_MANIFEST
+DATA_INDEX = results_store.DATA_INDEX
+
 NUM_PROCESS = 96
 
-TIME_OUT = 2*60*60 # in seconds
+TIME_OUT = 2*60*60 # in seconds, per run
+
+# Optional wall-clock limit per flow stage, in seconds (None = no limit).
+# A stage starts when its first log (1_* synth, 2_* floorplan, ...) appears.
+STAGE_TIME_OUT = {
+    "synth":     None,
+    "floorplan": None,
+    "place":     None,
+    "cts":       None,
+    "route":     None,
+    "finish":    None,
+}
+KILL_GRACE = 30 # in seconds between SIGTERM and SIGKILL of a timed out run
+
+# Kill runs whose stage metrics cross a threshold and record them as "pruned".
+# A step log is checked as soon as its step has finished (GNU time has written
+# its line); the last match of each PRUNE_PATTERNS regex is the value.
+EARLY_TERMINATION = False
+PRUNE_PATTERNS = {
+    "tns":         "^tns (\S+)",
+    "wns":         "^wns (\S+)",
+    "worst slack": "^worst slack (\S+)",
+    "overflow":    "(?i)total overflow\D*(\d+)",
+}
+# Prune when a metric of a step log is below ("<") or above (">") the limit
+PRUNE_THRESHOLDS = {
+    "3_3_resizer.log":   {"wns": ("<", -3.0), "tns": ("<", -5000)},
+    "4_1_cts.log":       {"wns": ("<", -3.0), "tns": ("<", -5000)},
+    "5_1_fastroute.log": {"overflow": (">", 0)},
+}
+
+################################
+# Prefix tree execution
+################################
+
+# Knob vectors that agree on every knob consumed up to a stage share that
+# stage: it runs once and the differing runs start from a copy of its results.
+# The workspace of a finished prefix job is kept as the checkpoint.
+PREFIX_TREE = False
+
+# Stage in which each knob enters the flow, "*" matches a name prefix.
+# Knobs that are not listed are treated as synthesis knobs.
+STAGE_KNOBS = {
+    "synth":     ["CLK_PERIOD", "FLATTEN", "ABC_CLOCK_PERIOD"],
+    "floorplan": ["CORE_UTILIZATION", "ASPECT_RATIO"],
+    "place":     ["GP_PAD", "DP_PAD", "PLACE_DENSITY", "PINS_DISTANCE"],
+    "cts":       ["CTS_CLUSTER_SIZE", "CTS_CLUSTER_DIAMETER"],
+    "route":     ["LAYER_ADJUST*", "GR_OVERFLOW"],
+}
+
+################################
+# Multi-fidelity sweep
+################################
+
+# Successive halving: every run first goes up to the make target of the first
+# rung and stops there. Once all runs of a round have stopped, they are ranked
+# on the FIDELITY_OBJECTIVE of that target and only the given fraction is
+# promoted to the next rung, the last rung's promotions run to "finish". A
+# promoted run continues in the results of its stopped run, the others are
+# harvested into ./data as "stopped". Empty list: every run is a full flow.
+FIDELITY_RUNGS = []  # e.g. [("place", 0.5), ("cts", 0.25)]
+# Weighted sum of the PRUNE_PATTERNS metrics of the step logs each rung target
+# ranks on, higher is better. Runs without a value are never promoted.
+FIDELITY_OBJECTIVE = {
+    "place": {"3_3_resizer.log": {"wns": 1.0, "tns": 0.001}},
+    "cts":   {"4_1_cts.log": {"wns": 1.0, "tns": 0.001}},
+}
+# Hyperband-style rounds: the runs of a sweep (or of each adaptive batch) are
+# split into this many rounds that are halved separately, so full-flow results
+# of the first round arrive while later rounds still run their cheap stages.
+FIDELITY_ROUNDS = 1
+
+################################
+# Stage cache
+################################
+
+# Synthesis outputs are cached by a hash of the stage inputs (synth script,
+# design/platform config, constraint.sdc, ABC clock and yosys version) and
+# restored into the workspace before make starts, so make skips yosys.
+STAGE_CACHE = True
+STAGE_CACHE_DIR = "./doe_cache"
+STAGE_CACHE_MAX_SIZE = 20 * 1024**3 # in bytes, least recently used entries are evicted
+
+# Workspace files that make up a cached stage, listed in make dependency order
+STAGE_CACHE_FILES = {
+    "synth": ["objects/*/*/lib/*", "objects/*/*/*_mod.lib",
+              "results/*/*/1_1_yosys.v", "results/*/*/1_synth.v", "results/*/*/1_synth.sdc",
+              "logs/*/*/1_*.log", "reports/*/*/synth_*"],
+}
+# Only runs that got this far are stored
+STAGE_CACHE_OUTPUT = {
+    "synth": "results/*/*/1_synth.v",
+}
+
+################################
+# Harvest policy
+################################
+
+# What is kept of each file of a harvested run, by the first pattern that
+# matches its path in the data folder (files that match none are kept):
+#   "keep"  - kept as is
+#   "zstd"  - compressed to <file>.zst with the zstd command line tool
+#   "drop"  - deleted once genMetrics_bigDoE.py has written the metrics.json
+#             of the run, so do not drop the logs/reports/results it reads
+#   "pareto"- kept until the end of the sweep, then only for the runs on the
+#             pareto front of ADAPTIVE_OBJECTIVES
+# The policy is applied after the stage cache has taken its files from the run.
+# It is opt-in: it runs on every harvest in the scheduler loop, which holds up
+# polling the other runs while genMetrics_bigDoE.py extracts the metrics for
+# a "drop" or zstd compresses large DEF/GDS files.
+HARVEST_POLICY = [
+    # ("objects/*",         "drop"),
+    # ("results/*/*/*.odb", "pareto"),
+    # ("results/*/*/*.def", "zstd"),
+    # ("results/*/*/*.v",   "zstd"),
+    # ("results/*/*/*.gds", "zstd"),
+]
+HARVEST_ZSTD_LEVEL = 3
+
+# Kept and compressed files with the same content are hardlinked to one copy
+# in HARVEST_DEDUP_DIR, named by their sha256, across runs and sweeps. Every
+# such file is read once for its hash, in the scheduler loop like the policy.
+HARVEST_DEDUP = False
+HARVEST_DEDUP_DIR = "./data/.blobs"
+# Rewritten in place by the extractors, so never shared
+HARVEST_NO_DEDUP = [RUN_MANIFEST, "reports/*/*/metrics.json"]
+
+# "queue": start the next knob vector as soon as any slot frees up
+# "wave": start NUM_PROCESS runs and wait for all of them before the next wave
+SCHEDULE_MODE = "queue"
+POLL_INTERVAL = 1 # in seconds
+
+# Sample plan and run states, used by --resume
+LEDGER_FILE = SWEEP_DIR + "/doe.db"
+
+################################
+# Admission control
+################################
+
+# A job is only started when the projected peak memory of the running jobs
+# plus its own fits into the available RAM, and their projected CPU use into
+# CPU_LIMIT cores. Stage peaks are learned from the GNU time lines
+# ("...elapsed ...%CPU ...memKB") of the step logs of completed runs, so with
+# ADMISSION_CONTROL NUM_PROCESS is only an upper bound of parallel jobs.
+ADMISSION_CONTROL = True
+MEM_RESERVE = 4 * 1024**3 # in bytes, kept free for the OS and other users
+CPU_LIMIT = os.cpu_count() # in cores
+PROFILE_PERCENTILE = 90 # of the stage peaks seen so far, used as projection
+DEFAULT_STAGE_PROFILE = {"mem": 2 * 1024**3, "cpu": 1.0} # until a stage has been seen
+
+# Memory ceiling of each run in bytes (None = no limit). "cgroup" puts the run
+# into a systemd scope with MemoryMax, "rlimit" sets RLIMIT_AS on each of its processes.
+RUN_MEM_LIMIT = None
+RUN_MEM_LIMIT_MODE = "cgroup"
+
+################################
+# Execution backend
+################################
+
+# "local": make runs on this host in NUM_PROCESS slots
+# "remote": the rendered workspaces are sent to the doe_worker.py daemons in
+#           WORKERS ("host:port"), each with its own flow checkout and --slots
+# "local_workers": starts LOCAL_WORKERS doe_worker.py daemons on this host
+#           (or reuses the ones still running) and uses them like "remote"
+BACKEND = "local"
+WORKERS = []
+LOCAL_WORKERS = 2
+LOCAL_WORKER_SLOTS = NUM_PROCESS // LOCAL_WORKERS
+LOCAL_WORKER_PORT = 7700
+WORKER_TIME_OUT = 60 # in seconds without an answer before the jobs of a worker are re-queued
+WORKER_RETRY_INTERVAL = 30 # in seconds between queries of a lost worker
+TRANSFER_TIME_OUT = 600 # in seconds, for sending or fetching a workspace
+# Workers only accept requests with their shared token: "remote" takes it from
+# $DOE_WORKER_TOKEN (see doe_worker.py), "local_workers" generate one in
+# WORKER_TOKEN_FILE that the daemons started by this sweep read
+WORKER_TOKEN_FILE = SWEEP_DIR + "/workers/token"
+
+################################
+# Scratch staging
+################################
+
+# With BACKEND = "local", the workspaces of the jobs (Makefile, design/ and
+# the results/logs/objects/reports make writes) are put on this local path,
+# e.g. a tmpfs such as "/dev/shm/doe" or a local NVMe, instead of RUNS_DIR
+# (None = RUNS_DIR). A finished workspace is queued to a background mover that
+# copies it next to ./data, where it is harvested, while its slot already runs
+# the next job. A run is recorded as finished once it is harvested.
+SCRATCH_DIR = None
+# Finished workspaces waiting for the mover; no job is started while the
+# queue is full or the scratch has less than SCRATCH_RESERVE bytes free
+SCRATCH_QUEUE_SIZE = 8
+SCRATCH_RESERVE = 16 * 1024**3
+# workers keep the workspaces in their own roots
+SCRATCH_RUNS_DIR = SCRATCH_DIR + "/" + SWEEP_NAME + "/runs" if SCRATCH_DIR is not None and BACKEND == "local" else None
+
+################################
+# Adaptive sampling
+################################
+
+# "lhs": run the LHS_SAMPLES knob vectors of one LHS
+# "adaptive": run ADAPTIVE_SEED_SAMPLES LHS knob vectors, then propose batches
+# of ADAPTIVE_BATCH new ones until ADAPTIVE_SAMPLES have been run. Each point of
+# a batch maximizes the expected improvement of a Gaussian process fitted to a
+# randomly weighted scalarization of ADAPTIVE_OBJECTIVES (ParEGO), within the
+# LHS_ATTRS distributions and VALUE_TYPE rounding.
+SAMPLING = "lhs"
+ADAPTIVE_SEED_SAMPLES = 100
+ADAPTIVE_SAMPLES = 1000
+ADAPTIVE_BATCH = NUM_PROCESS
+ADAPTIVE_CANDIDATES = 2000 # random LHS points the expected improvement is evaluated on
+
+# genMetrics_bigDoE.py metrics to optimize, "min" or "max"
+ADAPTIVE_OBJECTIVES = {
+    "cts__timing__wns__worst": "max",
+    "finish__power__total":    "min",
+}
+GEN_METRICS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "genMetrics_bigDoE.py")
 
 ################################
 # Clock period
@@ -182,32 +458,27 @@ LAYER_ADJUST_END = 1.0
 LAYER_ADJUST_STEP = 0.1
 
 ################################
-# Folder check
+# Sample preparation
 ################################
 
-try:
-    os.mkdir("./data")
-except:
-    print("Cannot create the data folder, please delete the current data folder")
-    sys.exit(1)
-
-try:
-    os.mkdir("./designs/" + PLATFORM + "/" + DESIGN + "_parallel/")
-except:
-    print("Cannot create the design parallel folder")
-    sys.exit(1)
+def log(msg):
+    with open(DOE_LOG, "a") as lf:
+        print(msg, file=lf)
 
 
-################################
-# Sample preparation
-################################
+# Build the knob vectors of the sweep from the LHS and non-LHS settings above
+# Classic LHS as generated by pyDOE's lhs(): one random point in each of the
+# "samples" intervals of every column, randomly paired across columns
+def sample_lhs(n, samples):
+    lhd = (np.arange(samples)[:, None] + np.random.rand(samples, n)) / samples
+    for j in range(n):
+        lhd[:, j] = lhd[np.random.permutation(samples), j]
+    return lhd
 
-print("Running " + DESIGN + " deisgn in " + PLATFORM,  file=open("doe.log", "w"))
 
-# Create LHS samples
-lhs_knobs = []
-if _use_lhs:
-    lhd = lhs(len(LHS_ATTRS), samples=LHS_SAMPLES)
+# Map points of the unit hypercube to LHS_ATTRS knob values, through the
+# distribution of each attribute and its VALUE_TYPE rounding
+def lhs_to_knobs(lhd):
     lhs_knobs = np.copy(lhd)
     for idx, lhs_attr in enumerate(LHS_ATTRS.keys()):
         if LHS_ATTRS[lhs_attr][0] == 'uniform':
@@ -219,7 +490,7 @@ if _use_lhs:
           lhs_knobs[:, idx] = truncnorm.ppf(lhd[:, idx], a=left_shift, b=right_shift, loc=LHS_ATTRS[lhs_attr][3], scale=LHS_ATTRS[lhs_attr][4])
         elif LHS_ATTRS[lhs_attr][0] == 'norm':
           lhs_knobs[:, idx] = norm(loc=LHS_ATTRS[lhs_attr][1], scale=LHS_ATTRS[lhs_attr][2]).ppf(lhd[:, idx])
-       
+
         try: 
           value_type = VALUE_TYPE[lhs_attr].split()
           precision = 0
@@ -230,299 +501,1898 @@ if _use_lhs:
         except:
           precision = 1
         lhs_knobs[:, idx] = np.around(lhs_knobs[:, idx], decimals = precision)
-            
-# Create non-LHS samples
-std_knobs = []
-std_attrs_names = []
-
-for idx, attr in enumerate(SWEEPING_ATTRS):
-    if _use_lhs and attr in LHS_ATTRS:
-        continue
-    else:
-        std_attrs_names.append(attr)
-        if attr+"_USE_VALUES" in globals() and vars()[attr+"_USE_VALUES"]:
-            if attr+"_VALUES" not in globals():
-                print (attr + "_VALUES variable is not defined but is required")
-                sys.exit(0)
-            std_knobs.append(np.array(vars()[attr+"_VALUES"]))
-
-            print(attr + " values are defined in " + attr + "_VALUES", file=open("doe.log", "a"))
-        elif attr+"_START" in globals() and attr+"_END" in globals() and attr+"_STEP" in globals():
-            start       = vars()[attr+"_START"]
-            end         = vars()[attr+"_END"]
-            step        = vars()[attr+"_STEP"]
-            vars()[attr.lower()] = np.arange(start, end + 0.1*step, step), 
-            
-            value_type = VALUE_TYPE[attr].split()
-            precision = 0
-            if value_type[0] == "int":
-                precision = 0
-            elif value_type[0] == "float":
-                precision = int(value_type[1])
-            std_knobs.append(*np.around(vars()[attr.lower()], decimals = precision))
-
-            print(attr + " values are generated using np.arange", file=open("doe.log", "a"))
-        elif attr in globals():
-            std_knobs.append(np.array(vars()[attr])) 
-            print(attr + " values are defined in " + attr, file=open("doe.log", "a"))
+    return lhs_knobs
+
+
+# Inverse of lhs_to_knobs up to the rounding, for the LHS_ATTRS columns of "knobs_list"
+def knobs_to_lhs(knobs_list):
+    knobs = np.array(knobs_list, dtype=float)[:, :len(LHS_ATTRS)]
+    lhd = np.full(knobs.shape, 0.5)
+    for idx, lhs_attr in enumerate(LHS_ATTRS.keys()):
+        dist = LHS_ATTRS[lhs_attr]
+        if dist[0] == 'uniform':
+            if dist[2] != dist[1]:
+                lhd[:, idx] = (knobs[:, idx] - dist[1]) / (dist[2] - dist[1])
+        elif dist[0] == 'truncnorm':
+            lhd[:, idx] = truncnorm.cdf(knobs[:, idx], a=(dist[1] - dist[3]) / dist[4], b=(dist[2] - dist[3]) / dist[4], loc=dist[3], scale=dist[4])
+        elif dist[0] == 'norm':
+            lhd[:, idx] = norm(loc=dist[1], scale=dist[2]).cdf(knobs[:, idx])
+    return np.clip(lhd, 0, 1)
+
+
+# Knob vectors for the LHS points "lhd" (a new LHS by default), combined with
+# the non-LHS attributes
+def prepare_samples(lhd=None):
+    # Create LHS samples
+    lhs_knobs = []
+    if _use_lhs:
+        if lhd is None:
+            lhd = sample_lhs(len(LHS_ATTRS), LHS_SAMPLES if SAMPLING == "lhs" else ADAPTIVE_SEED_SAMPLES)
+        lhs_knobs = lhs_to_knobs(lhd)
+
+    # Create non-LHS samples
+    std_knobs = []
+    std_attrs_names = []
+
+    for idx, attr in enumerate(SWEEPING_ATTRS):
+        if _use_lhs and attr in LHS_ATTRS:
+            continue
         else:
-            print(attr + " variable is not well defined")
-            sys.exit(0)
-
-
-# Create design samples
-if _use_lhs and len(LHS_ATTRS) > 0:
-    knobs_list_temp = list(product(lhs_knobs, *std_knobs))
-    knobs_list_temp = [[*knob[0], *knob[1:]] for knob in knobs_list_temp]
-else:
-    knobs_list_temp = list(product(*std_knobs))
-
-
-if _use_lhs:
-    attrs_names = [*LHS_ATTRS, *std_attrs_names]
-else:
-    attrs_names = std_attrs_names
-
-if "PLACE_DENSITY" not in LHS_ATTRS.keys() or not _use_lhs:
-    PLACE_DENSITY_VALUES = []
-    knobs_list = []
-    for knobs in knobs_list_temp:
-        core_utilization = knobs[attrs_names.index("CORE_UTILIZATION")]
-        gp_pad = knobs[attrs_names.index("GP_PAD")]
-    
+            std_attrs_names.append(attr)
+            if attr+"_USE_VALUES" in globals() and globals()[attr+"_USE_VALUES"]:
+                if attr+"_VALUES" not in globals():
+                    print (attr + "_VALUES variable is not defined but is required")
+                    sys.exit(0)
+                std_knobs.append(np.array(globals()[attr+"_VALUES"]))
+
+                log(attr + " values are defined in " + attr + "_VALUES")
+            elif attr+"_START" in globals() and attr+"_END" in globals() and attr+"_STEP" in globals():
+                start       = globals()[attr+"_START"]
+                end         = globals()[attr+"_END"]
+                step        = globals()[attr+"_STEP"]
+                values = np.arange(start, end + 0.1*step, step)
+
+                value_type = VALUE_TYPE[attr].split()
+                precision = 0
+                if value_type[0] == "int":
+                    precision = 0
+                elif value_type[0] == "float":
+                    precision = int(value_type[1])
+                std_knobs.append(np.around(values, decimals = precision))
+
+                log(attr + " values are generated using np.arange")
+            elif attr in globals():
+                std_knobs.append(np.array(globals()[attr])) 
+                log(attr + " values are defined in " + attr)
+            else:
+                print(attr + " variable is not well defined")
+                sys.exit(0)
+
+
+    # Create design samples: the cartesian product of the LHS rows and the
+    # non-LHS values, one knob vector per row, in itertools.product order
+    if _use_lhs and len(LHS_ATTRS) > 0:
+        knobs_list = np.asarray(lhs_knobs, dtype=float)
+    else:
+        knobs_list = np.empty((1, 0))
+    for values in std_knobs:
+        values = np.asarray(values, dtype=float).reshape(-1, 1)
+        knobs_list = np.hstack([np.repeat(knobs_list, len(values), axis=0),
+                                np.tile(values, (len(knobs_list), 1))])
+
+
+    if _use_lhs:
+        attrs_names = [*LHS_ATTRS, *std_attrs_names]
+    else:
+        attrs_names = std_attrs_names
+
+    if "PLACE_DENSITY" not in LHS_ATTRS.keys() or not _use_lhs:
+        core_utilization = knobs_list[:, attrs_names.index("CORE_UTILIZATION")] / 100
+        gp_pad = knobs_list[:, attrs_names.index("GP_PAD")]
+
         if DESIGN == "ibex":
-            LB = (core_utilization/100) + (gp_pad * (0.4*(core_utilization/100)-0.01))+0.01
+            LB = core_utilization + (gp_pad * (0.4*core_utilization-0.01))+0.01
         elif DESIGN == "aes":
-            LB = (core_utilization/100) + (gp_pad * (0.5*(core_utilization/100)-0.005))+0.01
+            LB = core_utilization + (gp_pad * (0.5*core_utilization-0.005))+0.01
+        else:
+            LB = core_utilization + (gp_pad * (0.4*core_utilization-0.01))+0.01
+
+        # three PLACE_DENSITY values per knob vector, starting at its lower bound
+        place_density_values = np.around(LB[:, None] + np.array([0, 0.1, 0.2]), decimals=2)
+        knobs_list = np.hstack([np.repeat(knobs_list, 3, axis=0), place_density_values.reshape(-1, 1)])
+
+        attrs_names.append("PLACE_DENSITY")
+
+    return attrs_names, knobs_list
+
+
+def get_knob_decimals(attr):
+    for knob, decimals in KNOB_DECIMALS.items():
+        if attr == knob or (knob.endswith("*") and attr.startswith(knob[:-1])):
+            return decimals
+    return None
+
+
+# Round "knobs_list" to KNOB_DECIMALS and merge equal knob vectors into the
+# first one, also dropping the ones already in "planned". Returns the unique
+# knob vectors and how many times each of them was drawn.
+def dedupe_knobs(knobs_list, planned=None):
+    knobs_list = np.array(knobs_list, dtype=float)
+    for idx, attr in enumerate(attrs_names):
+        decimals = get_knob_decimals(attr)
+        if decimals is not None:
+            # + 0.0 turns -0.0 into 0.0
+            knobs_list[:, idx] = np.around(knobs_list[:, idx], decimals=decimals) + 0.0
+    num_planned = 0
+    if planned is not None and len(planned) > 0:
+        num_planned = len(planned)
+        knobs_list = np.vstack([planned, knobs_list])
+    _, first, counts = np.unique(knobs_list, axis=0, return_index=True, return_counts=True)
+    new = first >= num_planned
+    order = np.argsort(first[new])
+    return knobs_list[first[new][order]], counts[new][order]
+
+
+# Write knob vectors to doe.log, PLAN_CHUNK rows at a time
+def log_knobs(knobs_list):
+    knobs_list = np.asarray(knobs_list, dtype=float)
+    with open(DOE_LOG, "a") as lf:
+        for first in range(0, len(knobs_list), PLAN_CHUNK):
+            lf.write("".join(str(knobs) + "\n" for knobs in knobs_list[first:first + PLAN_CHUNK].tolist()))
+
+
+################################
+# Adaptive sampling
+################################
+
+# genMetrics_bigDoE.py metrics of harvested runs, by data folder
+run_metrics = {}
+
+def get_run_metrics(target_folder):
+    if target_folder in run_metrics:
+        return run_metrics[target_folder]
+    metrics_files = glob.glob(target_folder + "/reports/*/*/metrics.json")
+    if not metrics_files:
+        for design_folder in glob.glob(target_folder + "/logs/*/*"):
+            plt, des = design_folder.split(os.sep)[-2:]
+            os.makedirs(os.path.join(target_folder, "reports", plt, des), exist_ok=True)
+            sp.run([sys.executable, GEN_METRICS, "-f", os.path.abspath(target_folder), "-p", plt, "-d", des,
+                    "-o", os.path.join(target_folder, "reports", plt, des, "metrics.json")],
+                   stdout=sp.DEVNULL, stderr=sp.DEVNULL)
+        metrics_files = glob.glob(target_folder + "/reports/*/*/metrics.json")
+    metrics = None
+    if metrics_files:
+        with open(metrics_files[0], "r") as rf:
+            metrics = json.load(rf)
+        if store is not None:
+            results_store.update_run(store, target_folder, metrics=metrics)
+    run_metrics[target_folder] = metrics
+    return metrics
+
+
+# ADAPTIVE_OBJECTIVES of each run in "observations" (idx -> metrics or None),
+# as minimization objectives scaled to [0, 1]. Failed runs and missing
+# metrics get the worst value.
+def get_objectives(observations):
+    Y = np.full((len(observations), len(ADAPTIVE_OBJECTIVES)), np.nan)
+    for i, metrics in enumerate(observations.values()):
+        for j, (name, goal) in enumerate(ADAPTIVE_OBJECTIVES.items()):
+            try:
+                Y[i, j] = float(metrics[name]) * (-1 if goal == "max" else 1)
+            except (TypeError, KeyError, ValueError):
+                pass
+    Y = Y[:, ~np.all(np.isnan(Y), axis=0)]
+    span = np.nanmax(Y, axis=0) - np.nanmin(Y, axis=0) if Y.size else []
+    Y = (Y - np.nanmin(Y, axis=0)) / np.where(span > 0, span, 1) if Y.size else Y
+    return np.nan_to_num(Y, nan=1.0)
+
+
+# Runs that no other run beats in every objective
+def get_pareto_front(Y):
+    return [i for i in range(len(Y)) if not np.any(np.all(Y <= Y[i], axis=1) & np.any(Y < Y[i], axis=1))]
+
+
+def rbf_kernel(A, B, length_scales):
+    d = (A[:, None, :] - B[None, :, :]) / length_scales
+    return np.exp(-0.5 * np.sum(d * d, axis=2))
+
+
+# Length scales and noise of a Gaussian process on standardized "y", by
+# maximum marginal likelihood
+def fit_gp(X, y):
+    def neg_log_likelihood(params):
+        K = rbf_kernel(X, X, np.exp(params[:-1])) + (np.exp(params[-1]) + 1e-8) * np.eye(len(X))
+        try:
+            L = cho_factor(K, lower=True)
+        except np.linalg.LinAlgError:
+            return 1e10
+        return 0.5 * y.dot(cho_solve(L, y)) + np.sum(np.log(np.diag(L[0])))
+
+    x0 = np.append(np.full(X.shape[1], np.log(0.3)), np.log(1e-2))
+    bounds = [(np.log(1e-2), np.log(10))] * X.shape[1] + [(np.log(1e-6), 0)]
+    params = minimize(neg_log_likelihood, x0, method="L-BFGS-B", bounds=bounds).x
+    length_scales = np.exp(params[:-1])
+    L = cho_factor(rbf_kernel(X, X, length_scales) + (np.exp(params[-1]) + 1e-8) * np.eye(len(X)), lower=True)
+    return length_scales, L
+
+
+# "batch" new knob vectors for the runs in "observations", see SAMPLING
+def propose_samples(knobs_list, observations, batch):
+    knobs = [knobs_list[idx] for idx in observations]
+    Y = get_objectives(observations)
+    candidates = sample_lhs(len(LHS_ATTRS), ADAPTIVE_CANDIDATES)
+    if len(knobs) < 2 or Y.shape[1] == 0:
+        return prepare_samples(candidates[:batch])[1]
+
+    # the kernel is fitted once on the equally weighted objectives; the
+    # predictive variance does not depend on the weights
+    X = knobs_to_lhs(knobs)
+    scalarize = lambda w: np.max(Y * w, axis=1) + 0.05 * Y.dot(w)
+    y = scalarize(np.full(Y.shape[1], 1.0 / Y.shape[1]))
+    length_scales, L = fit_gp(X, (y - y.mean()) / (y.std() + 1e-12))
+    Ks = rbf_kernel(candidates, X, length_scales)
+    v = solve_triangular(L[0], Ks.T, lower=True)
+    sd = np.sqrt(np.maximum(1 - np.sum(v * v, axis=0), 1e-12))
+
+    seen = set(tuple(k[:len(LHS_ATTRS)]) for k in knobs_list)
+    candidate_knobs = [tuple(k) for k in lhs_to_knobs(candidates)]
+    chosen = []
+    for w in np.random.dirichlet(np.ones(Y.shape[1]), size=batch):
+        y = scalarize(w)
+        y = (y - y.mean()) / (y.std() + 1e-12)
+        mean = Ks.dot(cho_solve(L, y))
+        improvement = y.min() - mean
+        ei = improvement * norm.cdf(improvement / sd) + sd * norm.pdf(improvement / sd)
+        for i in np.argsort(-ei):
+            if candidate_knobs[i] not in seen:
+                seen.add(candidate_knobs[i])
+                chosen.append(i)
+                break
+    if not chosen:
+        return []
+    return prepare_samples(candidates[chosen])[1]
+
+################################
+# Flow file templates
+################################
+
+# Every source file is read once and turned into a template: a list of
+# literal text alternating with named slots, where each slot replaces what
+# the per-run regex substitutions used to rewrite.
+SLOT = "\x00"
+
+def slot(name):
+    return SLOT + name + SLOT
+
+
+def make_template(path, subs):
+    with open(path, "r") as rf:
+        filedata = rf.read()
+    for pattern, repl in subs:
+        filedata = re.sub(pattern, repl, filedata)
+    return filedata.split(SLOT)
+
+
+def render(template, values):
+    parts = list(template)
+    parts[1::2] = [values[name] for name in template[1::2]]
+    return "".join(parts)
+
+
+def load_templates():
+    templates = {}
+    if os.path.isfile("./platforms/" + PLATFORM + "/fastroute.tcl"):
+        templates["fastroute"] = make_template("./platforms/" + PLATFORM + "/fastroute.tcl", [
+            ("(set_global_routing_layer_adjustment .* )[0-9\.]+", "\g<1>" + slot("layer_adjust")),
+            ("set_global_routing_layer_adjustment.*\n", "\g<0>" + slot("sep_la_cmds")),
+            ("(global_route.*(\n\s+.*)*)", "\g<1>" + slot("allow_overflow"))])
+
+    templates["platform_config"] = make_template("./platforms/" + PLATFORM + "/" + PLATFORM_CONFIG, [
+        ("\n(export CELL_PAD_IN_SITES_GLOBAL_PLACEMENT ?= ).*", "\n\g<1>" + slot("gp_pad")),
+        ("\n(export CELL_PAD_IN_SITES_DETAIL_PLACEMENT ?= ).*", "\n\g<1>" + slot("dp_pad")),
+        ("\n(export FASTROUTE_TCL\s+=).*", "\n\g<1> " + slot("fastroute_tcl"))])
+
+    if PLATFORM_CONFIG != "config.mk":
+        templates["platform_include"] = make_template(PLATFORM_DIR + "/config.mk", [
+            ("include\s+(.*)\.mk", "include " + slot("platform_config"))])
+
+    templates["constraint"] = make_template("./designs/" + PLATFORM + "/" + DESIGN + "/constraint.sdc", [
+        ("-period [0-9\.]+", "-period " + slot("clock")),
+        ("-waveform [{}\s0-9\.]+\n", "\n")])
+
+    templates["design_config"] = make_template("./designs/" + PLATFORM + "/" + DESIGN + "/config.mk", [
+        ("\S*\/constraint\.sdc", slot("workspace") + "/design/constraint.sdc"),
+        ("\n(export FASTROUTE_TCL .*?=).*", "\n\g<1> " + slot("fastroute_tcl")),
+        ("\n(export DIE_AREA\s+= .*)", "\n#\g<1>"),
+        ("\n(export CORE_AREA\s+= .*)", "\n#\g<1>"),
+        ("\Z", slot("exports"))])
+
+    templates["synth"] = make_template("./scripts/synth.tcl", [
+        (" -flatten", slot("flatten"))])
+    templates["io_placement"] = make_template("./scripts/io_placement.tcl", [
+        ("(place_pins.*\n(\s+).*\n)", "\g<1>\g<2>-min_distance " + slot("pins_distance") + "\n")])
+    templates["cts"] = make_template("./scripts/cts.tcl", [
+        ("(set cluster_size)\s+\d+", "\g<1> " + slot("cts_cluster_size")),
+        ("(set cluster_diameter)\s+\d+", "\g<1> " + slot("cts_cluster_diameter"))])
+
+    templates["makefile"] = make_template("Makefile", [
+        ("\./(results|logs|objects|reports)(?![\w.])", slot("workspace") + "/\g<1>"),
+        ("include \$\(PLATFORM_DIR\)\/config.*", "include " + slot("platform_config")),
+        ("\ndefault: finish", "\nDESIGN_CONFIG = " + slot("workspace") + "/design/config.mk\ndefault: finish"),
+        ("\S*synth\.tcl", slot("synth")),
+        ("\S*io_placement\.tcl", slot("io_placement")),
+        ("\S*cts\.tcl", slot("cts"))])
+    return templates
+
+
+# Files shared by several runs of the sweep (script and platform variants in
+# FLOW_DIR) are only written when their content differs from what is on disk
+written_files = {}
+
+def write_flow_file(path, filedata):
+    digest = hashlib.sha256(filedata.encode("utf-8")).hexdigest()
+    if written_files.get(path) == digest:
+        return
+    if path not in written_files and os.path.isfile(path):
+        with open(path, "r") as rf:
+            written_files[path] = hashlib.sha256(rf.read().encode("utf-8")).hexdigest()
+        if written_files[path] == digest:
+            return
+    with open(path, "w") as wf:
+        wf.write(filedata)
+    written_files[path] = digest
+
+
+################################
+# Run setup and harvest
+################################
+
+# Render the flow files for knob vector "knobs" into "workspace"; returns the
+# stage cache keys and the files in FLOW_DIR the workspace uses
+def setup_run(workspace, knobs):
+    clock = knobs[attrs_names.index("CLK_PERIOD")]
+    core_utilization = knobs[attrs_names.index("CORE_UTILIZATION")]
+    core_aspect_ratio = knobs[attrs_names.index("ASPECT_RATIO")]
+    cell_pad_in_sites_global_placement = knobs[attrs_names.index("GP_PAD")]
+    cell_pad_in_sites_detail_placement = knobs[attrs_names.index("DP_PAD")]
+    place_density = knobs[attrs_names.index("PLACE_DENSITY")]
+    flatten = knobs[attrs_names.index("FLATTEN")]
+    abc_clock_period_in_ps = knobs[attrs_names.index("ABC_CLOCK_PERIOD")]
+    pins_distance = knobs[attrs_names.index("PINS_DISTANCE")]
+    cts_cluster_size = knobs[attrs_names.index("CTS_CLUSTER_SIZE")]
+    cts_cluster_diameter = knobs[attrs_names.index("CTS_CLUSTER_DIAMETER")]
+    gr_overflow = knobs[attrs_names.index("GR_OVERFLOW")]
+
+    layer_adjustment = knobs[attrs_names.index("LAYER_ADJUST")]
+    sep_layer_adjustments = {}
+    for key in attrs_names:
+      layer_adjustment_re = re.search("LAYER_ADJUST_\w+", key)
+      if layer_adjustment_re:
+        sep_layer_adjustments[layer_adjustment_re.group(0)] = knobs[attrs_names.index(layer_adjustment_re.group(0))]
+
+    core_margin = CORE_DIE_MARGIN
+
+    # Create parallel fastroute scripts
+    sep_la_combs = ""
+    gr_target_file = ""
+    if "fastroute" in templates:
+      gr_target_file = FLOW_DIR + "/fastroute_{:.1f}".format(layer_adjustment)
+      sep_la_cmds = ""
+      for sep_la, sep_la_value in sep_layer_adjustments.items():
+        layer_name = sep_la.split("_")[-1]
+        sep_la_cmds += "set_global_routing_layer_adjustment " + layer_name + " {:.1f}\n".format(sep_la_value)
+        sep_la_combs += "_%s_%.1f" % (layer_name, sep_la_value)
+      gr_target_file = gr_target_file + sep_la_combs
+      allow_overflow = ""
+      if int(gr_overflow) == 1:
+          allow_overflow = " \\\n             -allow_overflow"
+          gr_target_file = gr_target_file + "_allow_overflow_{:.0f}".format(gr_overflow)
+      gr_target_file = gr_target_file + ".tcl"
+      write_flow_file(gr_target_file, render(templates["fastroute"], {
+          "layer_adjust": "{:.1f}".format(layer_adjustment),
+          "sep_la_cmds": sep_la_cmds,
+          "allow_overflow": allow_overflow}))
+
+    # Config.mk in platforms
+    platform_config_suffix = "_gppad_{:.0f}_dppad_{:.0f}_FR_{:.1f}{}_ALLOW_OVERFLOW_{:.0f}.mk".format(cell_pad_in_sites_global_placement, cell_pad_in_sites_detail_placement, layer_adjustment, sep_la_combs, gr_overflow)
+    platform_config = FLOW_DIR + "/" + PLATFORM_CONFIG[0:-3] + platform_config_suffix
+    write_flow_file(platform_config, render(templates["platform_config"], {
+        "gp_pad": "{:.0f}".format(cell_pad_in_sites_global_placement),
+        "dp_pad": "{:.0f}".format(cell_pad_in_sites_detail_placement),
+        "fastroute_tcl": gr_target_file}))
+
+    # design folder
+    design_folder = workspace + "/design"
+    os.makedirs(design_folder)
+    if os.path.isfile("./designs/" + PLATFORM + "/" + DESIGN + "/rules.json"):
+        shutil.copyfile("./designs/" + PLATFORM + "/" + DESIGN + "/rules.json", design_folder + "/rules.json")
+
+    sdc_data = render(templates["constraint"], {"clock": str(clock)})
+    with open(design_folder + "/constraint.sdc", "w") as wf:
+        wf.write(sdc_data)
+
+    exports = "\nexport CORE_UTILIZATION = {:.0f}".format(core_utilization)
+    exports = exports + "\nexport CORE_ASPECT_RATIO = {:.2f}".format(core_aspect_ratio)
+    exports = exports + "\nexport CORE_MARGIN = {:.0f}".format(core_margin)
+    exports = exports + "\nexport PLACE_DENSITY = {:.2f}".format(place_density)
+    exports = exports + "\nexport ABC_CLOCK_PERIOD_IN_PS = {:.1f}".format(abc_clock_period_in_ps)
+    with open(design_folder + "/config.mk", "w") as wf:
+        wf.write(render(templates["design_config"], {
+            "workspace": workspace,
+            "fastroute_tcl": gr_target_file,
+            "exports": exports}))
+
+    # scripts files:
+    synth_script = FLOW_DIR + "/synth_{:.0f}.tcl".format(flatten)
+    synth_data = render(templates["synth"], {"flatten": " -flatten" if int(flatten) != 0 else ""})
+    write_flow_file(synth_script, synth_data)
+
+    io_placement_script = FLOW_DIR + "/io_placement_{:.0f}.tcl".format(pins_distance)
+    write_flow_file(io_placement_script, render(templates["io_placement"], {
+        "pins_distance": "{:.0f}".format(pins_distance)}))
+
+    cts_script = FLOW_DIR + "/cts_size_{:.0f}_diameter_{:.0f}.tcl".format(cts_cluster_size, cts_cluster_diameter)
+    write_flow_file(cts_script, render(templates["cts"], {
+        "cts_cluster_size": "{:.0f}".format(cts_cluster_size),
+        "cts_cluster_diameter": "{:.0f}".format(cts_cluster_diameter)}))
+
+    # the Makefile includes the config.mk variant, which includes PLATFORM_CONFIG
+    platform_include = FLOW_DIR + "/config" + platform_config_suffix
+    if "platform_include" in templates:
+      write_flow_file(platform_include, render(templates["platform_include"], {
+          "platform_config": platform_config}))
+
+    # create the workspace Makefile
+    with open(workspace + "/Makefile", "w") as wf:
+        wf.write(render(templates["makefile"], {
+            "workspace": workspace,
+            "platform_config": platform_include,
+            "synth": synth_script,
+            "io_placement": io_placement_script,
+            "cts": cts_script}))
+
+    cache_keys = {}
+    if STAGE_CACHE:
+        cache_keys["synth"] = get_stage_key("synth", [synth_data, sdc_data,
+                                            "ABC_CLOCK_PERIOD_IN_PS = {:.1f}".format(abc_clock_period_in_ps)])
+    flow_files = [platform_config, platform_include, synth_script, io_placement_script, cts_script]
+    if gr_target_file:
+        flow_files.append(gr_target_file)
+    return cache_keys, sorted(set(flow_files))
+
+
+# Folder name in ./data for knob vector "knobs", unique per design and
+# platform as sweeps of several platforms share ./data
+def get_target_folder(knobs):
+    clock = knobs[attrs_names.index("CLK_PERIOD")]
+    core_utilization = knobs[attrs_names.index("CORE_UTILIZATION")]
+    core_aspect_ratio = knobs[attrs_names.index("ASPECT_RATIO")]
+    cell_pad_in_sites_global_placement = knobs[attrs_names.index("GP_PAD")]
+    cell_pad_in_sites_detail_placement = knobs[attrs_names.index("DP_PAD")]
+    place_density = knobs[attrs_names.index("PLACE_DENSITY")]
+    layer_adjustment = knobs[attrs_names.index("LAYER_ADJUST")]
+    flatten = knobs[attrs_names.index("FLATTEN")]
+    abc_clock_period_in_ps = knobs[attrs_names.index("ABC_CLOCK_PERIOD")]
+    pins_distance = knobs[attrs_names.index("PINS_DISTANCE")]
+    cts_cluster_size = knobs[attrs_names.index("CTS_CLUSTER_SIZE")]
+    cts_cluster_diameter = knobs[attrs_names.index("CTS_CLUSTER_DIAMETER")]
+    gr_overflow = knobs[attrs_names.index("GR_OVERFLOW")]
+
+    sep_la_names = ""
+    for key in attrs_names:
+      layer_adjustment_re = re.search("LAYER_ADJUST_(\w+)", key)
+      if layer_adjustment_re:
+        sep_la_names += "_{}_{:.1f}".format(layer_adjustment_re.group(1), knobs[attrs_names.index(layer_adjustment_re.group(0))])
+
+    return "data/" + DESIGN + "_" + PLATFORM + "_CORE_UTILIZATION_{:.2f}_CLOCK_{:.4f}_ASRATIO_{:.2f}_GPPAD_{:.0f}_DPPAD_{:.0f}_PLACE_DENSITY_{:.2f}_LAYER_ADJUST_{:.1f}{}_FLATTEN_{:.0f}_ABC_CLOCK_{:.1f}_PINS_DISTANCE_{:.0f}_CTS_SIZE_{:.0f}_CTS_DIAMETER_{:.0f}_ALLOW_OVERFLOW_{:.0f}".format(core_utilization, clock, core_aspect_ratio, cell_pad_in_sites_global_placement, cell_pad_in_sites_detail_placement, place_density, layer_adjustment, sep_la_names, flatten, abc_clock_period_in_ps, pins_distance, cts_cluster_size, cts_cluster_diameter, gr_overflow)
+
+
+# Move the outputs in "workspace" into the data folder of run "idx" and
+# remove the workspace
+def harvest_run(workspace, idx, flow_files):
+    target_folder = get_target_folder(knobs_list[idx])
+    if os.path.exists(target_folder):
+        # same knob vector already harvested by another sweep, or by an
+        # earlier one that did not finish it
+        base_folder = target_folder + "_" + SWEEP_NAME
+        target_folder = base_folder
+        count = 1
+        while os.path.exists(target_folder):
+            count += 1
+            target_folder = base_folder + "_" + str(count)
+
+    os.mkdir(target_folder)
+    # the folder is ours from here on, --resume clears it if the harvest is interrupted
+    with ledger:
+        ledger.execute("UPDATE runs SET target_folder = ? WHERE idx = ?", (target_folder, idx))
+
+    for data_folder in ["results", "logs", "reports", "objects"]:
+        try:
+            shutil.move(workspace + "/" + data_folder, target_folder + "/" + data_folder)
+        except:
+            print("no " + data_folder + " is found in " + workspace + " for current run")
+
+    shutil.move(workspace + "/design", target_folder + "/design")
+    shutil.move(workspace + "/Makefile", target_folder + "/Makefile")
+
+    for mk_file in glob.glob(PLATFORM_DIR + "/*.mk") + [f for f in flow_files if f.endswith(".mk")]:
+      shutil.copy2(mk_file, target_folder)
+
+    shutil.rmtree(workspace)
+    return target_folder
+
+
+################################
+# Harvest policy
+################################
+
+# Bytes of the harvested files, bytes they take in ./data after the policy,
+# and the bytes each action saved
+harvest_stats = {"runs": 0, "files": 0, "size": 0, "stored": 0, "zstd": 0, "drop": 0, "pareto": 0, "dedup": 0}
+zstd_tool = shutil.which("zstd")
+
+def get_harvest_action(path):
+    for pattern, action in HARVEST_POLICY:
+        if fnmatch.fnmatchcase(path, pattern):
+            return action
+    return "keep"
+
+
+def get_harvested_files(target_folder):
+    files = []
+    for root, dirs, names in os.walk(target_folder):
+        for name in names:
+            path = os.path.join(root, name)
+            if not os.path.islink(path):
+                files.append((os.path.relpath(path, target_folder), path))
+    return files
+
+
+def get_file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as rf:
+        for block in iter(lambda: rf.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Replace "path" by a hardlink to the copy of its content in
+# HARVEST_DEDUP_DIR, or make it that copy. Returns the bytes saved.
+def dedup_file(path, size):
+    digest = get_file_digest(path)
+    blob = os.path.join(HARVEST_DEDUP_DIR, digest[:2], digest)
+    os.makedirs(os.path.dirname(blob), exist_ok=True)
+    try:
+        os.link(path, blob)
+        return 0
+    except FileExistsError:
+        pass
+    except OSError:
+        # other filesystem or link limit, keep the copy
+        return 0
+    tmp_path = path + ".dedup" + str(os.getpid())
+    try:
+        os.link(blob, tmp_path)
+    except OSError:
+        return 0
+    os.replace(tmp_path, path)
+    return size
+
+
+# Apply HARVEST_POLICY and HARVEST_DEDUP to a harvested data folder
+def apply_harvest_policy(target_folder):
+    files = {"keep": [], "zstd": [], "drop": [], "pareto": []}
+    for rel_path, path in get_harvested_files(target_folder):
+        files[get_harvest_action(rel_path)].append((rel_path, path, os.path.getsize(path)))
+    size = sum(f[2] for action_files in files.values() for f in action_files)
+    harvest_stats["runs"] += 1
+    harvest_stats["files"] += sum(len(action_files) for action_files in files.values())
+    harvest_stats["size"] += size
+
+    if files["drop"]:
+        if get_run_metrics(target_folder) is not None:
+            for rel_path, path, file_size in files["drop"]:
+                os.remove(path)
+                harvest_stats["drop"] += file_size
         else:
-            LB = (core_utilization/100) + (gp_pad * (0.4*(core_utilization/100)-0.01))+0.01
-    
-        PLACE_DENSITY_VALUES = [LB, LB + 0.1, LB + 0.2]
-        for pdv in PLACE_DENSITY_VALUES:
-            knobs_list.append([*knobs, round(pdv, 2)])
-    
-    attrs_names.append("PLACE_DENSITY")
-else:
-    knobs_list = knobs_list_temp
-
-print("{:d} runs will be executed".format(len(knobs_list)), file=open("doe.log", "a"))
-
-# print("knobs num: clk-{:d}, core_utilization-{:d}, aspect_ratio-{:d}, cell_pad_in_sites_global_placement-{:d}, cell_pad_in_sites_detail_placement-{:d}, place_density-{:d}, layer_adjustment-{:d}".format(len(CLK_VALUES), len(core_utilization), len(aspect_ratio), len(cell_pad_in_sites_global_placement), len(cell_pad_in_sites_detail_placement), len(PLACE_DENSITY_VALUES), len(layer_adjust)))
-
-print(attrs_names, file=open("doe.log", "a"))
-for knob in knobs_list:
-    print(knob, file=open("doe.log", "a"))
-# with open("./scripts/cts.tcl", "r") as rf:
-#     filedata = rf.read()
-# filedata = re.sub("\n(.*repair_timing -hold.*)", "\n\g<0>\nrepair_timing -setup -max_utilization [expr $::env(PLACE_DENSITY_MAX_POST_HOLD) * 100]", filedata)
-# with open("./scripts/cts_doe.tcl", "w") as wf:
-#     wf.write(filedata)
+            log("no metrics extracted from {}, its files are not dropped".format(target_folder))
+            files["keep"] += files["drop"]
+
+    # pareto files are not shared, so that deleting them frees their space
+    harvest_stats["stored"] += sum(f[2] for f in files["pareto"])
+    kept = files["keep"]
+    if files["zstd"] and zstd_tool is None:
+        kept += files["zstd"]
+    elif files["zstd"]:
+        # one call per run, zstd removes the inputs it has compressed
+        sp.run([zstd_tool, "-q", "-f", "--rm", "-" + str(HARVEST_ZSTD_LEVEL), "--"] + [f[1] for f in files["zstd"]],
+               stdout=sp.DEVNULL, stderr=sp.DEVNULL)
+        for rel_path, path, file_size in files["zstd"]:
+            if os.path.isfile(path):
+                kept.append((rel_path, path, file_size))
+            else:
+                compressed_size = os.path.getsize(path + ".zst")
+                harvest_stats["zstd"] += file_size - compressed_size
+                kept.append((rel_path + ".zst", path + ".zst", compressed_size))
+
+    for rel_path, path, file_size in kept:
+        if HARVEST_DEDUP and file_size > 0 and not any(fnmatch.fnmatchcase(rel_path, pattern) for pattern in HARVEST_NO_DEDUP):
+            saved = dedup_file(path, file_size)
+            harvest_stats["dedup"] += saved
+            file_size -= saved
+        harvest_stats["stored"] += file_size
+
+
+# Delete the "pareto" files of the harvested runs of the sweep that are not
+# on the pareto front of ADAPTIVE_OBJECTIVES
+def apply_pareto_policy(db):
+    if not any(action == "pareto" for pattern, action in HARVEST_POLICY):
+        return
+    rows = db.execute("SELECT idx, target_folder FROM runs WHERE target_folder IS NOT NULL AND state != 'reused' "
+                      "ORDER BY idx").fetchall()
+    if not rows:
+        return
+    observations = {idx: get_run_metrics(target_folder) for idx, target_folder in rows}
+    front = set(get_pareto_front(get_objectives(observations)))
+    for i, (idx, target_folder) in enumerate(rows):
+        if i in front:
+            continue
+        for rel_path, path in get_harvested_files(target_folder):
+            if get_harvest_action(rel_path) == "pareto":
+                file_size = os.path.getsize(path)
+                os.remove(path)
+                harvest_stats["pareto"] += file_size
+                harvest_stats["stored"] -= file_size
+    log("harvest policy: pareto files kept for runs {}".format(", ".join(str(rows[i][0]) for i in sorted(front))))
+
+
+################################
+# Stage cache
+################################
+
+cache_stats = {"hit": 0, "miss": 0, "store": 0, "evict": 0}
+
+def get_tool_version(cmd):
+    try:
+        return sp.check_output(cmd, stderr=sp.STDOUT).decode("utf-8").strip()
+    except (OSError, sp.CalledProcessError):
+        return "unknown"
+
+
+# Hash of everything a stage reads besides the knob-independent flow scripts
+def get_stage_key(stage, inputs):
+    h = hashlib.sha256()
+    for data in [stage, DESIGN, PLATFORM, tool_versions[stage], *stage_sources[stage], *inputs]:
+        h.update(data.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+# Copy a cached stage into "workspace"; returns False on a cache miss
+def restore_stage(stage, key, workspace):
+    entry = os.path.join(STAGE_CACHE_DIR, stage, key)
+    if not os.path.isdir(entry):
+        cache_stats["miss"] += 1
+        return False
+    for pattern in STAGE_CACHE_FILES[stage]:
+        for cached_file in sorted(glob.glob(os.path.join(entry, pattern))):
+            run_file = os.path.join(workspace, os.path.relpath(cached_file, entry))
+            os.makedirs(os.path.dirname(run_file), exist_ok=True)
+            # plain copy: restored files must be newer than the freshly written inputs
+            shutil.copy(cached_file, run_file)
+    os.utime(entry)
+    cache_stats["hit"] += 1
+    return True
+
+
+# Copy the stage outputs of a harvested run into the cache
+def store_stage(stage, key, target_folder):
+    entry = os.path.join(STAGE_CACHE_DIR, stage, key)
+    if os.path.isdir(entry) or not glob.glob(os.path.join(target_folder, STAGE_CACHE_OUTPUT[stage])):
+        return
+    tmp_entry = entry + ".tmp" + str(os.getpid())
+    for pattern in STAGE_CACHE_FILES[stage]:
+        for run_file in glob.glob(os.path.join(target_folder, pattern)):
+            cached_file = os.path.join(tmp_entry, os.path.relpath(run_file, target_folder))
+            os.makedirs(os.path.dirname(cached_file), exist_ok=True)
+            shutil.copy2(run_file, cached_file)
+    try:
+        os.rename(tmp_entry, entry)
+        cache_stats["store"] += 1
+    except OSError:
+        # another sweep stored the same entry first
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+    evict_stage_cache()
+
+
+def get_dir_size(path):
+    size = 0
+    for root, dirs, files in os.walk(path):
+        for f in files:
+            size += os.path.getsize(os.path.join(root, f))
+    return size
+
+
+def evict_stage_cache():
+    entries = []
+    for entry in glob.glob(os.path.join(STAGE_CACHE_DIR, "*", "*")):
+        if ".tmp" not in os.path.basename(entry):
+            entries.append((os.path.getmtime(entry), get_dir_size(entry), entry))
+    total_size = sum(e[1] for e in entries)
+    for mtime, size, entry in sorted(entries):
+        if total_size <= STAGE_CACHE_MAX_SIZE:
+            break
+        shutil.rmtree(entry, ignore_errors=True)
+        total_size -= size
+        cache_stats["evict"] += 1
+
+
+################################
+# Prefix tree execution
+################################
+
+# Stages a prefix tree can branch after, "finish" always runs with the leaves
+TREE_STAGES = list(STAGE_KNOBS)
+
+def get_knob_stage(attr):
+    for stage, stage_knobs in STAGE_KNOBS.items():
+        for knob in stage_knobs:
+            if attr == knob or (knob.endswith("*") and attr.startswith(knob[:-1])):
+                return stage
+    return TREE_STAGES[0]
+
+
+# Job list for the sweep. A job runs knob vector "idx" from the results of its
+# "parent" job (or from scratch) up to the make "target"; "finish" jobs are the
+# actual runs that are harvested into ./data.
+def new_job(jobs, idx, target, parent, first_stage):
+    job = {"id": len(jobs), "idx": idx, "target": target, "parent": parent,
+           "children": [], "first_stage": first_stage}
+    jobs.append(job)
+    if parent is not None:
+        parent["children"].append(job)
+    return job
+
+
+def build_jobs(knobs_list, indices):
+    jobs = []
+    if FIDELITY_RUNGS:
+        round_size = max(math.ceil(len(indices) / FIDELITY_ROUNDS), 1)
+        for first in range(0, len(indices), round_size):
+            rung = new_rung(0, len(indices[first:first + round_size]))
+            for idx in indices[first:first + round_size]:
+                job = new_job(jobs, idx, FIDELITY_RUNGS[0][0], None, 0)
+                job["rung"] = rung
+        return jobs
+
+    if not PREFIX_TREE:
+        for idx in indices:
+            new_job(jobs, idx, "finish", None, 0)
+        return jobs
+
+    # knob positions consumed up to and including each tree stage
+    stage_knob_idx = []
+    consumed = []
+    for stage in TREE_STAGES:
+        consumed += [i for i, attr in enumerate(attrs_names) if get_knob_stage(attr) == stage]
+        stage_knob_idx.append(list(consumed))
+
+    def prefix_key(idx, stage_idx):
+        return tuple(knobs_list[idx][i] for i in stage_knob_idx[stage_idx])
+
+    def add_jobs(indices, stage_idx, parent):
+        groups = {}
+        for idx in indices:
+            groups.setdefault(prefix_key(idx, stage_idx), []).append(idx)
+        for group in groups.values():
+            last = stage_idx
+            while len(group) > 1 and last + 1 < len(TREE_STAGES) and \
+                  len(set(prefix_key(idx, last + 1) for idx in group)) == 1:
+                last += 1
+            if len(group) == 1 or last == len(TREE_STAGES) - 1:
+                for idx in group:
+                    new_job(jobs, idx, "finish", parent, stage_idx)
+            else:
+                job = new_job(jobs, group[0], TREE_STAGES[last], parent, stage_idx)
+                add_jobs(group, last + 1, job)
+
+    add_jobs(indices, 0, None)
+    return jobs
+
+
+# Number of flow stages a job runs itself
+def get_job_stages(job):
+    return STAGES.index(job["target"]) - job["first_stage"] + 1
+
+
+# Workspace a job renders its flow files into and runs make in; a prefix
+# job's workspace stays around as the checkpoint of its children
+def get_job_workspace(job):
+    runs_dir = SCRATCH_RUNS_DIR if SCRATCH_RUNS_DIR is not None else RUNS_DIR
+    if job["target"] == "finish":
+        return runs_dir + "/run" + str(job["idx"])
+    return runs_dir + "/prefix" + str(job["id"])
+
+
+# Copy the parent checkpoint of "job" into "workspace" so make continues
+# after the parent's target. The last child takes the checkpoint's folders over.
+def fork_checkpoint(workspace, job):
+    checkpoint = job["parent"]["checkpoint"]
+    last = job["parent"]["forks"] + 1 == len(job["parent"]["children"])
+    oldest = time.time()
+    for data_folder in ["results", "logs", "reports", "objects"]:
+        if os.path.isdir(checkpoint + "/" + data_folder):
+            if last:
+                os.rename(checkpoint + "/" + data_folder, workspace + "/" + data_folder)
+            else:
+                shutil.copytree(checkpoint + "/" + data_folder, workspace + "/" + data_folder)
+            for root, dirs, files in os.walk(workspace + "/" + data_folder):
+                for f in files:
+                    oldest = min(oldest, os.path.getmtime(os.path.join(root, f)))
+    # the re-rendered constraint.sdc must not look newer than 1_synth.sdc
+    sdc_file = workspace + "/design/constraint.sdc"
+    os.utime(sdc_file, (oldest, oldest))
+
+    job["parent"]["forks"] += 1
+    if job["parent"]["forks"] == len(job["parent"]["children"]):
+        shutil.rmtree(checkpoint)
+
+
+# All finish jobs below "job"; a rung job that is not promoted (yet) is its own leaf
+def get_job_leaves(job):
+    if job["target"] == "finish" or ("rung" in job and not job["children"]):
+        return [job]
+    return [leaf for child in job["children"] for leaf in get_job_leaves(child)]
+
+################################
+# Multi-fidelity sweep
+################################
+
+# The runs of one round at rung "rung" of FIDELITY_RUNGS; "left" counts the
+# jobs that have not finished their rung yet
+def new_rung(rung, size):
+    return {"rung": rung, "size": size, "left": size, "stopped": []}
+
+
+# FIDELITY_OBJECTIVE of the stopped "job" from the step logs in its checkpoint,
+# None if a metric is missing
+def get_fidelity_score(job):
+    objective = FIDELITY_OBJECTIVE[job["target"]]
+    patterns = {log_name: {metric: PRUNE_PATTERNS[metric] for metric in weights}
+                for log_name, weights in objective.items()}
+    job["metrics"] = {}
+    doe_worker.get_log_metrics(job["checkpoint"], patterns, job["metrics"])
+    score = 0.0
+    for log_name, weights in objective.items():
+        for metric, weight in weights.items():
+            value = job["metrics"].get(log_name, {}).get(metric)
+            if value is None:
+                return None
+            score += weight * value
+    return score
+
+
+# Count "job" as finished in its rung. After the last job of the rung, the best
+# stopped runs get a child job up to the next rung target (or "finish").
+# Returns the promoted jobs and the stopped jobs that are not promoted.
+def finish_rung_job(jobs, job):
+    rung = job["rung"]
+    rung["left"] -= 1
+    if rung["left"] > 0:
+        return [], []
+    target, fraction = FIDELITY_RUNGS[rung["rung"]]
+    ranked = sorted([stopped for stopped in rung["stopped"] if stopped["score"] is not None],
+                    key=lambda stopped: stopped["score"], reverse=True)
+    promoted = ranked[:max(1, round(fraction * rung["size"]))]
+    if rung["rung"] + 1 < len(FIDELITY_RUNGS):
+        next_target = FIDELITY_RUNGS[rung["rung"] + 1][0]
+        next_rung = new_rung(rung["rung"] + 1, len(promoted))
+    else:
+        next_target = "finish"
+    children = []
+    for parent in promoted:
+        child = new_job(jobs, parent["idx"], next_target, parent, STAGES.index(target) + 1)
+        if next_target != "finish":
+            child["rung"] = next_rung
+        children.append(child)
+    return children, [stopped for stopped in rung["stopped"] if stopped not in promoted]
 
 
 # process function
-def run_make_design(target):
-    p = sp.call(["make", "-f", target], shell=False)
+# make runs in its own session so the whole make/yosys/openroad tree can be
+# killed through its process group
+def run_make_design(target, make_target="finish"):
+    cmd = ["make", "-f", target, make_target]
+    preexec_fn = None
+    if RUN_MEM_LIMIT is not None:
+        if RUN_MEM_LIMIT_MODE == "cgroup":
+            cmd = ["systemd-run", "--user", "--scope", "--quiet", "-p", "MemoryMax={:d}".format(RUN_MEM_LIMIT)] + cmd
+        else:
+            preexec_fn = lambda: resource.setrlimit(resource.RLIMIT_AS, (RUN_MEM_LIMIT, RUN_MEM_LIMIT))
+    return sp.Popen(cmd, shell=False, start_new_session=True, preexec_fn=preexec_fn)
+
+
+# Start killing run "p" with a SIGTERM to its process group; returns when
+# finish_kill sends SIGKILL to what is left of it. Remote runs are killed the
+# same way by their worker.
+def start_kill(p):
+    if isinstance(p, RemoteRun):
+        try:
+            doe_worker.request(p.address, {"op": "kill", "job": p.workspace})
+        except (OSError, RuntimeError) as e:
+            log("cannot kill {} on worker {}: {}".format(p.workspace, p.address, e))
+    else:
+        try:
+            os.killpg(p.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    return time.time() + KILL_GRACE
+
+
+# Exit code of the killed run "p" once its whole process group is gone, None
+# before. Members that ignore SIGTERM or outlive make, like openroad or
+# yosys, get SIGKILL at "deadline".
+def finish_kill(p, deadline):
+    if isinstance(p, RemoteRun):
+        return p.poll()
+    # make is reaped first, as a zombie it still counts as a group member
+    p.poll()
+    if doe_worker.is_group_alive(p.pid):
+        if time.time() < deadline:
+            return None
+        try:
+            os.killpg(p.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    return p.wait()
+
+
+# Flow stages in Makefile order, indexed by the step number of their logs
+STAGES = ["synth", "floorplan", "place", "cts", "route", "finish"]
+
+# Regexes of the PRUNE_THRESHOLDS metrics, by step log
+def get_prune_patterns():
+    return {log_name: {metric: PRUNE_PATTERNS[metric] for metric in limits}
+            for log_name, limits in PRUNE_THRESHOLDS.items()}
+
+
+# Parse the step logs of "run" that finished since the last call and return
+# why it should be pruned, or None
+def check_prune(run):
+    if isinstance(run["proc"], RemoteRun):
+        run["metrics"] = run["proc"].metrics()
+    else:
+        doe_worker.get_log_metrics(run["workspace"], get_prune_patterns(), run["metrics"])
+    for log_name, limits in PRUNE_THRESHOLDS.items():
+        for metric, (op, limit) in limits.items():
+            value = run["metrics"].get(log_name, {}).get(metric)
+            if value is not None and (value < limit if op == "<" else value > limit):
+                return "{} {} {:g} {} {:g}".format(log_name, metric, value, op, limit)
+    return None
+
+
+# Current stage of the run in "workspace", based on the newest step log written
+def get_run_stage(workspace):
+    step = 0
+    for log_file in glob.glob(workspace + "/logs/*/*/[1-6]_*.log"):
+        step = max(step, int(os.path.basename(log_file)[0]))
+    if step == 0:
+        return None
+    return STAGES[step - 1]
+
+################################
+# Admission control
+################################
+
+# Peak memory (bytes) and CPU use (cores) of every stage run seen so far
+stage_profiles = {stage: {"mem": [], "cpu": []} for stage in STAGES}
+
+# Add the stages "job" ran itself in "folder" to the stage profiles
+def learn_profiles(folder, job):
+    peaks = {}
+    for log_file in glob.glob(folder + "/logs/*/*/[1-6]_*.log"):
+        stage = STAGES[int(os.path.basename(log_file)[0]) - 1]
+        if STAGES.index(stage) < job["first_stage"]:
+            # copied from the parent checkpoint
+            continue
+        with open(log_file, "r", errors="replace") as rf:
+            for m in re.finditer("^\S+elapsed (\d+)%CPU (\d+)memKB", rf.read(), re.M):
+                peak = peaks.setdefault(stage, {"mem": 0, "cpu": 0.0})
+                peak["mem"] = max(peak["mem"], int(m.group(2)) * 1024)
+                peak["cpu"] = max(peak["cpu"], int(m.group(1)) / 100)
+    for stage, peak in peaks.items():
+        stage_profiles[stage]["mem"].append(peak["mem"])
+        stage_profiles[stage]["cpu"].append(peak["cpu"])
+
+
+def get_stage_profile(stage):
+    if not stage_profiles[stage]["mem"]:
+        return DEFAULT_STAGE_PROFILE
+    return {"mem": np.percentile(stage_profiles[stage]["mem"], PROFILE_PERCENTILE),
+            "cpu": np.percentile(stage_profiles[stage]["cpu"], PROFILE_PERCENTILE)}
+
+
+# Projected peak memory and CPU use of "job" from stage index "first" on
+def get_job_demand(job, first):
+    profiles = [get_stage_profile(stage) for stage in STAGES[first:STAGES.index(job["target"]) + 1]]
+    mem = max(profile["mem"] for profile in profiles)
+    if RUN_MEM_LIMIT is not None:
+        mem = min(mem, RUN_MEM_LIMIT)
+    return {"mem": mem, "cpu": max(profile["cpu"] for profile in profiles)}
+
+
+def get_mem_available():
+    with open("/proc/meminfo", "r") as rf:
+        for line in rf:
+            if line.startswith("MemAvailable:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+# Resident memory of every process group, in bytes
+def get_group_rss():
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    group_rss = {}
+    for stat_file in glob.glob("/proc/[0-9]*/stat"):
+        try:
+            with open(stat_file, "r") as rf:
+                fields = rf.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        pgrp = int(fields[2])
+        group_rss[pgrp] = group_rss.get(pgrp, 0) + int(fields[21]) * page_size
+    return group_rss
+
+
+# Can "job" start next to the "running" runs without exceeding memory or CPU?
+# A run that already holds part of its projected peak only counts the rest,
+# since that part is no longer in MemAvailable.
+def admit_job(job, running, group_rss):
+    if SCRATCH_RUNS_DIR is not None and (running or mover_stats["queued"]):
+        full = move_queue.full() or len(move_backlog) > 0 or shutil.disk_usage(SCRATCH_RUNS_DIR).free < SCRATCH_RESERVE
+        if full != mover_stats["held"]:
+            mover_stats["held"] = full
+            log("scratch staging: " + ("mover queue or scratch full, holding jobs back" if full else "starting jobs again"))
+        if full:
+            return False
+    if BACKEND != "local":
+        # workers only take jobs when they have a free slot
+        return get_free_worker() is not None
+    if not ADMISSION_CONTROL or not running:
+        return True
+    demand = get_job_demand(job, job["first_stage"])
+    mem_free = get_mem_available() - MEM_RESERVE
+    cpu_used = 0.0
+    for run in running.values():
+        first = run["job"]["first_stage"]
+        if run["stage"] is not None:
+            first = max(first, STAGES.index(run["stage"]))
+        run_demand = get_job_demand(run["job"], first)
+        mem_free -= max(0, run_demand["mem"] - group_rss.get(run["proc"].pid, 0))
+        cpu_used += run_demand["cpu"]
+    return demand["mem"] <= mem_free and cpu_used + demand["cpu"] <= CPU_LIMIT
+
+################################
+# Scratch mover
+################################
+
+# Finished scratch workspaces with the harvest to run on their copy, the ones
+# waiting for room in the queue, and the copies the mover is done with
+move_queue = queue.Queue(SCRATCH_QUEUE_SIZE)
+move_backlog = []
+moved_queue = queue.Queue()
+mover_stats = {"queued": 0, "moved": 0, "size": 0, "time": 0.0, "max_queue": 0, "held": False}
+
+# Mover thread: copies each queued workspace into RUNS_DIR, on the
+# filesystem of ./data, and deletes it from the scratch
+def move_workspaces():
+    while True:
+        item = move_queue.get()
+        if item is None:
+            return
+        workspace, harvest, args = item
+        staged = RUNS_DIR + "/" + os.path.basename(workspace)
+        start = time.time()
+        size = 0
+        error = None
+        try:
+            shutil.copytree(workspace, staged, symlinks=True)
+            size = get_dir_size(staged)
+            shutil.rmtree(workspace)
+        except (OSError, shutil.Error) as e:
+            error = e
+        moved_queue.put((workspace, staged, error, size, time.time() - start, harvest, args))
+
+
+# Hand a finished scratch workspace to the mover, "harvest(workspace, *args)"
+# is run on its copy by finish_moves. While the queue is full it waits in
+# move_backlog, so the scheduler loop never blocks on the mover.
+def queue_move(workspace, harvest, *args):
+    mover_stats["queued"] += 1
+    mover_stats["max_queue"] = max(mover_stats["max_queue"], move_queue.qsize() + len(move_backlog) + 1)
+    move_backlog.append((workspace, harvest, args))
+    feed_mover()
+
+
+# Move what fits of move_backlog into the queue of the mover
+def feed_mover():
+    while move_backlog:
+        try:
+            move_queue.put_nowait(move_backlog[0])
+        except queue.Full:
+            return
+        del move_backlog[0]
+
+
+# Harvest the workspaces the mover has copied, and queue the backlog
+def finish_moves():
+    feed_mover()
+    while True:
+        try:
+            workspace, staged, error, size, elapsed, harvest, args = moved_queue.get_nowait()
+        except queue.Empty:
+            return
+        mover_stats["queued"] -= 1
+        if error is not None:
+            log("cannot move {} from the scratch, harvesting it from there: {}".format(workspace, error))
+            shutil.rmtree(staged, ignore_errors=True)
+            staged = workspace
+        else:
+            mover_stats["moved"] += 1
+            mover_stats["size"] += size
+            mover_stats["time"] += elapsed
+        harvest(staged, *args)
+
+################################
+# Remote workers
+################################
+
+# State of every worker as of its last "info" reply
+workers = {}
+
+# Popen stand-in for a workspace running on a worker
+class RemoteRun:
+    pid = None
+
+    def __init__(self, address, workspace):
+        self.address = address
+        self.workspace = workspace
+
+    def status(self):
+        return workers[self.address]["jobs"].get(self.workspace)
+
+    def poll(self):
+        status = self.status()
+        if status is None or status["state"] == "running":
+            return None
+        return status["exit_code"]
+
+    def stage(self):
+        status = self.status()
+        return status["stage"] if status is not None else None
+
+    def metrics(self):
+        status = self.status()
+        return status.get("metrics", {}) if status is not None else {}
+
+    # the worker is gone or no longer knows the job
+    def lost(self):
+        return not workers[self.address]["alive"] or self.status() is None
+
+
+# Start the local worker daemons, each in a root that links to this flow
+# checkout, unless they are still running from before a restart
+def start_local_workers():
+    if not os.path.isfile(WORKER_TOKEN_FILE):
+        os.makedirs(os.path.dirname(WORKER_TOKEN_FILE), exist_ok=True)
+        with os.fdopen(os.open(WORKER_TOKEN_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "w") as wf:
+            wf.write(secrets.token_hex(32))
+    doe_worker.token = doe_worker.read_token(WORKER_TOKEN_FILE)
+    addresses = []
+    for n in range(LOCAL_WORKERS):
+        address = "localhost:" + str(LOCAL_WORKER_PORT + n)
+        addresses.append(address)
+        try:
+            doe_worker.request(address, {"op": "info"})
+            continue
+        except OSError:
+            pass
+        root = SWEEP_DIR + "/workers/worker" + str(n)
+        if not os.path.isdir(root):
+            os.makedirs(root)
+            for entry in os.listdir("."):
+                if entry != "data" and not entry.startswith("doe_") and not entry.startswith("."):
+                    os.symlink(os.path.abspath(entry), os.path.join(root, entry))
+        sp.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "doe_worker.py"),
+                  "--host", "localhost", "--port", str(LOCAL_WORKER_PORT + n),
+                  "--root", root, "--slots", str(LOCAL_WORKER_SLOTS), "--token-file", WORKER_TOKEN_FILE],
+                 stdout=open(root + ".log", "a"), stderr=sp.STDOUT, start_new_session=True)
+    deadline = time.time() + WORKER_TIME_OUT
+    for address in addresses:
+        while True:
+            try:
+                doe_worker.request(address, {"op": "info"})
+                break
+            except OSError:
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.2)
+    return addresses
+
+
+# "changes" counts the submits and fetches, "asked" is the start of the query
+# in flight
+def connect_workers(addresses):
+    for address in addresses:
+        workers[address] = {"slots": 0, "jobs": {}, "alive": True, "last_seen": time.time(),
+                            "changes": 0, "asked": None, "last_asked": 0.0}
+    refresh_workers(wait=True)
+
+
+# Replies of the worker queries as (address, changes when asked, reply or None)
+info_replies = queue.Queue()
+
+def query_worker(address, changes, message):
+    try:
+        reply, _ = doe_worker.request(address, message)
+    except (OSError, RuntimeError, ValueError):
+        reply = None
+    info_replies.put((address, changes, reply))
+
+
+# Query every worker in a thread of its own, and take the replies that have
+# arrived (all of them with "wait"), so a worker that does not answer does not
+# hold up the scheduler loop. One that has not answered for WORKER_TIME_OUT is
+# lost and only queried every WORKER_RETRY_INTERVAL. A lost worker that comes
+# back drops the jobs of this sweep it still has, they have been re-queued
+# elsewhere. A reply to a query from before a submit or fetch only tells that
+# the worker is alive, its job list is outdated.
+def refresh_workers(wait=False):
+    now = time.time()
+    message = {"op": "info", "logs": get_prune_patterns() if EARLY_TERMINATION else {}}
+    for address, worker in workers.items():
+        if worker["asked"] is not None or (not worker["alive"] and now - worker["last_asked"] < WORKER_RETRY_INTERVAL):
+            continue
+        worker.update(asked=now, last_asked=now)
+        threading.Thread(target=query_worker, args=(address, worker["changes"], message), daemon=True).start()
+
+    while True:
+        try:
+            if wait and any(worker["asked"] is not None for worker in workers.values()):
+                address, changes, reply = info_replies.get()
+            else:
+                address, changes, reply = info_replies.get_nowait()
+        except queue.Empty:
+            return
+        worker = workers[address]
+        asked = worker["asked"]
+        worker["asked"] = None
+        if reply is None:
+            if worker["alive"] and time.time() - worker["last_seen"] > WORKER_TIME_OUT:
+                worker["alive"] = False
+                log("worker " + address + " lost")
+            continue
+        if not worker["alive"]:
+            log("worker " + address + " is back")
+            for name in list(reply["jobs"]):
+                if name.startswith(RUNS_DIR + "/"):
+                    drop_remote(address, name)
+                    del reply["jobs"][name]
+        if changes != worker["changes"]:
+            worker.update(alive=True, last_seen=asked)
+            continue
+        worker.update(slots=reply["slots"], jobs=reply["jobs"], alive=True, last_seen=asked)
+
+
+def get_free_worker():
+    free = [(worker["slots"] - len(worker["jobs"]), address) for address, worker in workers.items() if worker["alive"]]
+    free = [entry for entry in free if entry[0] > 0]
+    if not free:
+        return None
+    return max(free)[1]
+
+
+def submit_remote(workspace, target, flow_files):
+    address = get_free_worker()
+    payload = doe_worker.pack_paths(".", [workspace] + flow_files)
+    doe_worker.request(address, {"op": "submit", "job": workspace, "target": target, "shared": flow_files},
+                       payload, timeout=TRANSFER_TIME_OUT)
+    workers[address]["jobs"][workspace] = {"state": "running", "exit_code": None, "stage": None}
+    workers[address]["changes"] += 1
+    return RemoteRun(address, workspace)
+
+
+# Replace the local workspace with the finished one from the worker
+def fetch_remote(p):
+    reply, payload = doe_worker.request(p.address, {"op": "fetch", "job": p.workspace}, timeout=TRANSFER_TIME_OUT)
+    del workers[p.address]["jobs"][p.workspace]
+    workers[p.address]["changes"] += 1
+    shutil.rmtree(p.workspace, ignore_errors=True)
+    doe_worker.unpack_paths(".", payload)
+    return reply["exit_code"]
+
+
+def drop_remote(address, name):
+    try:
+        doe_worker.request(address, {"op": "drop", "job": name}, timeout=TRANSFER_TIME_OUT)
+    except (OSError, RuntimeError):
+        pass
+
+
+# Finish runs of this sweep that are still on a worker after a restart are
+# taken over instead of being started again; every other job of this sweep
+# on the workers is dropped. Returns {idx: address} of the taken over runs.
+def adopt_remote_runs(indices):
+    adopted = {}
+    for address, worker in workers.items():
+        for name in list(worker["jobs"]):
+            if not name.startswith(RUNS_DIR + "/"):
+                continue
+            m = re.fullmatch("run(\d+)", os.path.basename(name))
+            if m and int(m.group(1)) in indices and int(m.group(1)) not in adopted:
+                adopted[int(m.group(1))] = address
+            else:
+                drop_remote(address, name)
+                del worker["jobs"][name]
+    return adopted
+
+
+# Put the job of "run" back in front of "pending" after its worker was lost;
+# its workspace is still as it was sent and is sent again as is
+def requeue_run(run, pending):
+    run["job"]["requeued"] = (run["cache_keys"], run["flow_files"])
+    pending.insert(0, run["job"])
+    for leaf in get_job_leaves(run["job"]):
+        set_run_state(ledger, leaf["idx"], "pending")
+
+################################
+# Run ledger
+################################
+
+# The sample plan and the state of every run are kept in an SQLite ledger so
+# an interrupted sweep can be continued with --resume.
+# Run states: pending, running, done, failed, timeout, pruned, stopped, reused
+def open_ledger(path):
+    db = sqlite3.connect(path)
+    with db:
+        db.execute("CREATE TABLE IF NOT EXISTS sweep (key TEXT PRIMARY KEY, value TEXT)")
+        db.execute("CREATE TABLE IF NOT EXISTS runs (idx INTEGER PRIMARY KEY, knobs TEXT, state TEXT, "
+                   "pid INTEGER, start REAL, end REAL, exit_code INTEGER, target_folder TEXT, metrics TEXT, "
+                   "multiplicity INTEGER DEFAULT 1)")
+        # ledgers of older sweeps
+        columns = [column[1] for column in db.execute("PRAGMA table_info(runs)")]
+        if "metrics" not in columns:
+            db.execute("ALTER TABLE runs ADD COLUMN metrics TEXT")
+        if "multiplicity" not in columns:
+            db.execute("ALTER TABLE runs ADD COLUMN multiplicity INTEGER DEFAULT 1")
+    return db
+
+
+def save_plan(db, attrs_names, knobs_list, multiplicity):
+    with db:
+        db.execute("DELETE FROM sweep")
+        db.execute("DELETE FROM runs")
+        db.executemany("INSERT INTO sweep VALUES (?, ?)",
+                       [("design", DESIGN), ("platform", PLATFORM), ("attrs_names", json.dumps(attrs_names))])
+    extend_plan(db, knobs_list, 0, multiplicity)
+
+
+# Add the knob vectors of an adaptive batch, starting at run "first_idx"
+def extend_plan(db, knobs_list, first_idx, multiplicity):
+    knobs_list = np.asarray(knobs_list, dtype=float)
+    with db:
+        for first in range(0, len(knobs_list), PLAN_CHUNK):
+            rows = knobs_list[first:first + PLAN_CHUNK].tolist()
+            counts = multiplicity[first:first + PLAN_CHUNK].tolist()
+            # str() of a list of finite floats is the same JSON as json.dumps, only faster
+            db.executemany("INSERT INTO runs (idx, knobs, state, multiplicity) VALUES (?, ?, 'pending', ?)",
+                           ((first_idx + first + i, str(knobs), count) for i, (knobs, count) in enumerate(zip(rows, counts))))
+
+
+# Metrics of the harvested runs, for adaptive sampling
+def get_observations(db):
+    rows = db.execute("SELECT idx, target_folder FROM runs WHERE state NOT IN ('pending', 'running') ORDER BY idx")
+    return {idx: get_run_metrics(target_folder) if target_folder else None for idx, target_folder in rows}
+
+
+def load_plan(db):
+    sweep = dict(db.execute("SELECT key, value FROM sweep"))
+    attrs_names = json.loads(sweep["attrs_names"])
+    knobs_list = np.array([json.loads(knobs) for (knobs,) in db.execute("SELECT knobs FROM runs ORDER BY idx")], dtype=float)
+    return attrs_names, knobs_list
+
+
+# Record the runs among "indices" whose knob vector has a finished folder in
+# ./data as "reused". Returns the runs still to be executed.
+def reuse_results(db, knobs_list, indices):
+    if not REUSE_RESULTS or not os.listdir("./data"):
+        return list(indices)
+    data_folders = set(os.listdir("./data"))
+    left = []
+    reused = []
+    for idx in indices:
+        target_folder = get_target_folder(knobs_list[idx])
+        if os.path.basename(target_folder) in data_folders and glob.glob(os.path.join(target_folder, RESULT_OUTPUT)):
+            reused.append((target_folder, idx))
+        else:
+            left.append(idx)
+    with db:
+        db.executemany("UPDATE runs SET state = 'reused', target_folder = ? WHERE idx = ?", reused)
+    if reused:
+        log("{:d} runs reused from ./data".format(len(reused)))
+    return left
+
+
+# Runs covered by a started job are in flight until their own run is harvested
+def start_runs(db, indices, pid):
+    with db:
+        db.executemany("UPDATE runs SET state = 'running', pid = ?, start = COALESCE(start, ?) WHERE idx = ?",
+                       [(pid, time.time(), idx) for idx in indices])
+
+
+def set_run_state(db, idx, state, **fields):
+    fields["state"] = state
+    with db:
+        db.execute("UPDATE runs SET " + ", ".join(key + " = ?" for key in fields) + " WHERE idx = ?",
+                   [*fields.values(), idx])
+
+
+def get_file_hash(path):
+    if path in written_files:
+        return written_files[path]
+    with open(path, "rb") as rf:
+        return hashlib.sha256(rf.read()).hexdigest()
+
+
+# First stage whose steps the data folder of "job" is credited with, and the
+# stages of it restored from the stage cache. The stages of a prefix job are
+# credited to its first leaf only, the earlier rungs of a promoted run to it.
+def get_run_stages(job):
+    leaf = get_job_leaves(job)[0]
+    cache_hits = list(job.get("cache_hits", []))
+    while job["parent"] is not None and get_job_leaves(job["parent"])[0] is leaf:
+        job = job["parent"]
+        cache_hits += job.get("cache_hits", [])
+    return STAGES[job["first_stage"]], cache_hits
+
+
+# Write the RUN_MANIFEST of a harvested run, append it to DATA_INDEX and add
+# the run with the metrics.json of its reports, if genMetrics_bigDoE.py
+# already wrote one, to the results store. "job" is the job that ran it, if
+# any, for the stages the run did not execute itself.
+def record_run(db, idx, target_folder, flow_files, job=None):
+    state, exit_code, start, end, multiplicity = db.execute(
+        "SELECT state, exit_code, start, end, multiplicity FROM runs WHERE idx = ?", (idx,)).fetchone()
+    knobs = dict(zip(attrs_names, knobs_list[idx].tolist()))
+    first_stage, cache_hits = get_run_stages(job) if job is not None else (STAGES[0], [])
+    # DESIGN_NICKNAME of the log folder, if the run got that far
+    design_folders = glob.glob(target_folder + "/logs/" + PLATFORM + "/*")
+    # files of the data folder relative to it, shared flow files relative to the flow
+    rendered_files = {os.path.relpath(path, target_folder): path
+                      for path in [target_folder + "/Makefile", *sorted(glob.glob(target_folder + "/design/*"))]}
+    rendered_files.update((os.path.normpath(path), path) for path in flow_files)
+    manifest = {"folder": target_folder, "sweep": SWEEP_NAME, "idx": idx, "design": DESIGN, "platform": PLATFORM,
+                "design_name": os.path.basename(design_folders[0]) if design_folders else None,
+                "knobs": knobs, "multiplicity": multiplicity, "state": state, "exit_code": exit_code,
+                "start": start, "end": end,
+                "first_stage": first_stage, "cache_hits": cache_hits,
+                "files": {name: get_file_hash(path) for name, path in rendered_files.items() if os.path.isfile(path)}}
+    with open(os.path.join(target_folder, RUN_MANIFEST), "w") as wf:
+        json.dump(manifest, wf, indent=2)
+    # one write per line, so that sweeps sharing ./data do not interleave
+    with open(DATA_INDEX, "a") as af:
+        af.write(json.dumps(manifest) + "\n")
+
+    if store is None:
+        return
+    metrics = None
+    for metrics_file in glob.glob(target_folder + "/reports/*/*/metrics.json"):
+        with open(metrics_file, "r") as rf:
+            metrics = json.load(rf)
+    results_store.update_run(store, target_folder, sweep=SWEEP_NAME, design=DESIGN, platform=PLATFORM, idx=idx,
+                             state=state, exit_code=exit_code, start=start, end=end, knobs=knobs, metrics=metrics)
+
+
+# Harvest the finished, failed, timed out or pruned job of "run" from
+# "workspace" and record its runs. A failed prefix job is harvested as its
+# first run, the other runs below it are lost.
+def harvest_job(workspace, run, status, exit_code, elapsed, process):
+    job = run["job"]
+    leaves = get_job_leaves(job)
+    target_folder = harvest_run(workspace, run["idx"], run["flow_files"])
+    learn_profiles(target_folder, job)
+    for stage, key in run["cache_keys"].items():
+        store_stage(stage, key, target_folder)
+    run_status[status] = run_status.get(status, 0) + len(leaves)
+    log("run {:d} {} in process{:d} after {:.1f}s with exit code {:d}: {}".format(run["idx"], status, process, elapsed, exit_code, target_folder))
+    set_run_state(ledger, run["idx"], status, end=time.time(), exit_code=exit_code, target_folder=target_folder,
+                  metrics=json.dumps(run["metrics"]) if run["metrics"] else None)
+    record_run(ledger, run["idx"], target_folder, run["flow_files"], job)
+    apply_harvest_policy(target_folder)
+    for leaf in leaves[1:]:
+        log("run {:d} {}: prefix job {:d} did not reach {}".format(leaf["idx"], status, job["id"], job["target"]))
+        set_run_state(ledger, leaf["idx"], status, end=time.time(), exit_code=exit_code,
+                      metrics=json.dumps(run["metrics"]) if run["metrics"] else None)
+
+
+# Harvest a rung job that was not promoted from its checkpoint "workspace"
+def harvest_stopped_job(workspace, stopped_job):
+    target_folder = harvest_run(workspace, stopped_job["idx"], stopped_job["flow_files"])
+    run_status["stopped"] = run_status.get("stopped", 0) + 1
+    set_run_state(ledger, stopped_job["idx"], "stopped", end=time.time(), exit_code=0, target_folder=target_folder,
+                  metrics=json.dumps(stopped_job["metrics"]))
+    record_run(ledger, stopped_job["idx"], target_folder, stopped_job["flow_files"], stopped_job)
+    apply_harvest_policy(target_folder)
+
+
+# Whether data folder "target_folder" was harvested for run "idx" of this
+# sweep: its manifest says so, or it has none yet
+def is_run_folder(target_folder, idx):
+    try:
+        with open(os.path.join(target_folder, RUN_MANIFEST), "r") as rf:
+            manifest = json.load(rf)
+    except FileNotFoundError:
+        return True
+    except (IOError, ValueError):
+        return False
+    return manifest.get("sweep") == SWEEP_NAME and manifest.get("idx") == idx
+
+
+# Kill makes left over from the interrupted sweep, clear the slot folders and
+# re-queue the runs that were in flight. Returns the runs still to be executed.
+def resume_ledger(db, knobs_list):
+    for (pid,) in db.execute("SELECT DISTINCT pid FROM runs WHERE state = 'running' AND pid IS NOT NULL").fetchall():
+        try:
+            with open("/proc/" + str(pid) + "/cmdline", "rb") as rf:
+                if b"make" in rf.read():
+                    os.killpg(pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+    # workspaces of unfinished jobs, including prefix checkpoints
+    shutil.rmtree(RUNS_DIR, ignore_errors=True)
+    os.makedirs(RUNS_DIR)
+    if SCRATCH_RUNS_DIR is not None:
+        shutil.rmtree(SCRATCH_RUNS_DIR, ignore_errors=True)
+        os.makedirs(SCRATCH_RUNS_DIR)
+
+    with db:
+        db.execute("UPDATE runs SET state = 'pending', pid = NULL, start = NULL WHERE state = 'running'")
+    rows = db.execute("SELECT idx, target_folder FROM runs WHERE state = 'pending' ORDER BY idx").fetchall()
+    for idx, target_folder in rows:
+        # partially harvested runs, in the folder harvest_run created for them
+        if target_folder and os.path.isdir(target_folder) and is_run_folder(target_folder, idx):
+            shutil.rmtree(target_folder)
+    with db:
+        db.execute("UPDATE runs SET target_folder = NULL WHERE state = 'pending'")
+    return [idx for idx, target_folder in rows]
+
+
+def parse_args():
+  parser = argparse.ArgumentParser(
+      description='Runs a design of experiments sweep of the OpenROAD flow')
+  parser.add_argument('--resume', action='store_true',
+                      help='Continue the sweep recorded in ' + LEDGER_FILE)
+  return parser.parse_args()
+
 
 ################################
 # Sweep designs
 ################################
-# start = time.perf_counter()
 
-knob_iter = 0
-while knob_iter < len(knobs_list):
-    processes = []
-    current_process_num = 0
+if __name__ == "__main__":
+    args = parse_args()
 
-    for process in range(NUM_PROCESS):
-       
-        if knob_iter + process >= len(knobs_list):
-            break
+    ################################
+    # Folder check
+    ################################
 
-        knobs = knobs_list[knob_iter + process]
-        clock = knobs[attrs_names.index("CLK_PERIOD")]
-        core_utilization = knobs[attrs_names.index("CORE_UTILIZATION")]
-        core_aspect_ratio = knobs[attrs_names.index("ASPECT_RATIO")]
-        cell_pad_in_sites_global_placement = knobs[attrs_names.index("GP_PAD")]
-        cell_pad_in_sites_detail_placement = knobs[attrs_names.index("DP_PAD")]
-        place_density = knobs[attrs_names.index("PLACE_DENSITY")]
-        flatten = knobs[attrs_names.index("FLATTEN")]
-        abc_clock_period_in_ps = knobs[attrs_names.index("ABC_CLOCK_PERIOD")]
-        pins_distance = knobs[attrs_names.index("PINS_DISTANCE")]
-        cts_cluster_size = knobs[attrs_names.index("CTS_CLUSTER_SIZE")]
-        cts_cluster_diameter = knobs[attrs_names.index("CTS_CLUSTER_DIAMETER")]
-        gr_overflow = knobs[attrs_names.index("GR_OVERFLOW")]
-        
-        layer_adjustment = knobs[attrs_names.index("LAYER_ADJUST")]
-        sep_layer_adjustments = []
-        for key in attrs_names:
-          layer_adjustment_re = re.search("LAYER_ADJUST_\w+", key)
-          if layer_adjustment_re:
-            vars()[layer_adjustment_re.group(0)] = knobs[attrs_names.index(layer_adjustment_re.group(0))]
-            sep_layer_adjustments.append(layer_adjustment_re.group(0))
-        
-        core_margin = CORE_DIE_MARGIN
-
-        # Create parallel fastroute scripts
-        _platform_fastroute = False
-        if os.path.isfile("./platforms/" + PLATFORM + "/fastroute.tcl"):
-          _platform_fastroute = True
-          with open("./platforms/" + PLATFORM + "/fastroute.tcl", "r") as rf:
-            filedata = rf.read()
-          gr_target_file = "./platforms/" + PLATFORM + "/fastroute_{:.1f}".format(layer_adjustment)
-          filedata = re.sub("(set_global_routing_layer_adjustment .* )[0-9\.]+", "\g<1>{:.1f}".format(layer_adjustment), filedata)
-          sep_la_cmds = ""
-          sep_la_combs = ""
-          for sep_la in sep_layer_adjustments:
-            layer_name = sep_la.split("_")[-1]
-            sep_la_cmds += "set_global_routing_layer_adjustment " + layer_name + " {:.1f}\n".format(vars()[sep_la])
-            sep_la_combs += "_%s_%.1f" % (layer_name, vars()[sep_la])  
-          gr_target_file = gr_target_file + sep_la_combs
-          filedata = re.sub("set_global_routing_layer_adjustment.*\n", "\g<0>"+sep_la_cmds, filedata)
-          if int(gr_overflow) == 1:
-              filedata = re.sub("(global_route.*(\n\s+.*)*)", "\g<1> \\\n             -allow_overflow", filedata)
-              gr_target_file = gr_target_file + "_allow_overflow_{:.0f}".format(gr_overflow)
-          gr_target_file = gr_target_file + ".tcl"
-          with open(gr_target_file, "w") as wf:
-            wf.write(filedata)
-
-        # Config.mk in platforms
-        with open("./platforms/" + PLATFORM + "/" + PLATFORM_CONFIG, "r") as rf:
-            filedata = rf.read()
-        filedata = re.sub("\n(export CELL_PAD_IN_SITES_GLOBAL_PLACEMENT ?= ).*", "\n\g<1>{:.0f}".format(cell_pad_in_sites_global_placement), filedata)
-        filedata = re.sub("\n(export CELL_PAD_IN_SITES_DETAIL_PLACEMENT ?= ).*", "\n\g<1>{:.0f}".format(cell_pad_in_sites_detail_placement), filedata)
-        filedata = re.sub("\n(export FASTROUTE_TCL\s+=).*", "\n\g<1> " + gr_target_file, filedata)
-        with open("./platforms/" + PLATFORM + "/" + PLATFORM_CONFIG[0:-3] + "_gppad_{:.0f}_dppad_{:.0f}_FR_{:.1f}{}_ALLOW_OVERFLOW_{:.0f}.mk".format(cell_pad_in_sites_global_placement, cell_pad_in_sites_detail_placement, layer_adjustment, sep_la_combs, gr_overflow), "w") as wf:
-            wf.write(filedata)
-
-        # design folder 
-        os.mkdir("./designs/" + PLATFORM + "/" + DESIGN + "_parallel/process" + str(process))
-        if os.path.isfile("./designs/" + PLATFORM + "/" + DESIGN + "/rules.json"): 
-            shutil.copyfile("./designs/" + PLATFORM + "/" + DESIGN + "/rules.json", "./designs/" + PLATFORM + "/" + DESIGN + "_parallel/process" + str(process) + "/rules.json")
-        
-        with open("./designs/" + PLATFORM + "/" + DESIGN + "/constraint.sdc", "r") as rf:
-            filedata = rf.read()
-        filedata = re.sub("-period [0-9\.]+", "-period " + str(clock), filedata)
-        filedata = re.sub("-waveform [{}\s0-9\.]+\n", "\n", filedata)
-        with open("./designs/" + PLATFORM + "/" + DESIGN + "_parallel/process" + str(process) + "/constraint.sdc", "w") as wf:
-            wf.write(filedata)
-   
-        with open("./designs/" + PLATFORM + "/" + DESIGN + "/config.mk", "r") as rf:
-            filedata = rf.read()
-        filedata = re.sub("\/constraint\.sdc", "_parallel/process" + str(process) + "/constraint.sdc", filedata)
-        filedata = re.sub("\n(export FASTROUTE_TCL .*fastroute).*", "\n\g<1>_{:.1f}_allow_overflow_{:.0f}.tcl".format(layer_adjustment, gr_overflow), filedata)
-        filedata = re.sub("\n(export DIE_AREA\s+= .*)", "\n#\g<1>", filedata)
-        filedata = re.sub("\n(export CORE_AREA\s+= .*)", "\n#\g<1>", filedata)
-        filedata = filedata + "\nexport CORE_UTILIZATION = {:.0f}".format(core_utilization)
-        filedata = filedata + "\nexport CORE_ASPECT_RATIO = {:.2f}".format(core_aspect_ratio)
-        filedata = filedata + "\nexport CORE_MARGIN = {:.0f}".format(core_margin)
-        filedata = filedata + "\nexport PLACE_DENSITY = {:.2f}".format(place_density)
-        filedata = filedata + "\nexport ABC_CLOCK_PERIOD_IN_PS = {:.1f}".format(abc_clock_period_in_ps)
-        with open("./designs/" + PLATFORM + "/" + DESIGN + "_parallel/process" + str(process) + "/config.mk", "w") as wf:
-            wf.write(filedata)
-
-        # scripts files:
-        with open("./scripts/synth.tcl", "r") as rf:
-            filedata = rf.read()
-        if int(flatten) == 0:
-            filedata = re.sub(" -flatten", "", filedata)
-        with open("./scripts/synth_{:.0f}.tcl".format(flatten), "w") as wf:
-            wf.write(filedata)
-
-        with open("./scripts/io_placement.tcl", "r") as rf:
-            filedata = rf.read()
-        filedata = re.sub("(place_pins.*\n(\s+).*\n)", "\g<1>\g<2>-min_distance {:.0f}\n".format(pins_distance), filedata)
-        with open("./scripts/io_placement_{:.0f}.tcl".format(pins_distance), "w") as wf:
-            wf.write(filedata)
-        
-        with open("./scripts/cts.tcl", "r") as rf:
-            filedata = rf.read()
-        filedata = re.sub("(set cluster_size)\s+\d+", "\g<1> {:.0f}".format(cts_cluster_size), filedata)
-        filedata = re.sub("(set cluster_diameter)\s+\d+", "\g<1> {:.0f}".format(cts_cluster_diameter), filedata)
-        with open("./scripts/cts_size_{:.0f}_diameter_{:.0f}.tcl".format(cts_cluster_size, cts_cluster_diameter), "w") as wf:
-            wf.write(filedata)
-
-        if PLATFORM_CONFIG != "config.mk":
-          with open(PLATFORM_DIR + "/config.mk", "r") as rf:
-              filedata = rf.read()
-          filedata = re.sub("include\s+(.*)\.mk", "include \g<1>_gppad_{:.0f}_dppad_{:.0f}_FR_{:.1f}.mk".format(cell_pad_in_sites_global_placement, cell_pad_in_sites_detail_placement, layer_adjustment), filedata)
-          with open(PLATFORM_DIR + "/config_gppad_{:.0f}_dppad_{:.0f}_FR_{:.1f}.mk".format(cell_pad_in_sites_global_placement, cell_pad_in_sites_detail_placement, layer_adjustment), "w") as wf:
-              wf.write(filedata)
-
-        # create parallel Makefiles
-        with open("Makefile", "r") as rf:
-            filedata = rf.read()
-        filedata = re.sub("results", "results/process" + str(process), filedata)
-        filedata = re.sub("logs", "logs/process" + str(process), filedata)
-        filedata = re.sub("objects", "objects/process" + str(process), filedata)
-        filedata = re.sub("reports", "reports/process" + str(process), filedata)
-        filedata = re.sub("include \$\(PLATFORM_DIR\)\/config.*", "include $(PLATFORM_DIR)/config_gppad_{:.0f}_dppad_{:.0f}_FR_{:.1f}{}_ALLOW_OVERFLOW_{:.0f}.mk".format(cell_pad_in_sites_global_placement, cell_pad_in_sites_detail_placement, layer_adjustment, sep_la_combs, gr_overflow), filedata)
-        filedata = re.sub("\ndefault: finish", "\nDESIGN_CONFIG = ./designs/" + PLATFORM + "/" + DESIGN + "_parallel/process" + str(process) + "/config.mk\ndefault: finish", filedata)
-        filedata = re.sub("synth\.tcl", "synth_{:.0f}.tcl".format(flatten), filedata)
-        filedata = re.sub("io_placement\.tcl", "io_placement_{:.0f}.tcl".format(pins_distance), filedata)
-        filedata = re.sub("cts\.tcl", "cts_size_{:.0f}_diameter_{:.0f}.tcl".format(cts_cluster_size, cts_cluster_diameter), filedata)
-        with open("Makefile_process" + str(process), "w") as wf:
-            wf.write(filedata)
-
-        p = multiprocessing.Process(target=run_make_design, args=["Makefile_process" + str(process)])
-        p.start()
-        processes.append(p)
-        current_process_num += 1
-   
-    start = time.time()
-    timeout_flag = True
-    while time.time() - start <= TIME_OUT:
-        if not any(p.is_alive() for p in processes):
-            timeout_flag = False
-            break
-        time.sleep(.1)
-    
-    if timeout_flag:
-        print("time out, killing all unended processes", file=open("doe.log", "a"))
-        for p in processes:
-            p.terminate()
-            p.join()
+    if PREFIX_TREE and FIDELITY_RUNGS:
+        print("PREFIX_TREE and FIDELITY_RUNGS cannot be combined")
+        sys.exit(1)
+
+    if not args.resume:
+        try:
+            os.makedirs(SWEEP_DIR)
+        except:
+            print("Sweep " + SWEEP_NAME + " already exists in " + SWEEP_DIR + ", please delete it or use --resume")
+            sys.exit(1)
+        os.mkdir(FLOW_DIR)
+        os.mkdir(RUNS_DIR)
+        if SCRATCH_RUNS_DIR is not None:
+            # left over from an earlier sweep of the same name
+            shutil.rmtree(SCRATCH_RUNS_DIR, ignore_errors=True)
+            os.makedirs(SCRATCH_RUNS_DIR)
+        # ./data is shared by all sweeps
+        os.makedirs("./data", exist_ok=True)
+    elif not os.path.isfile(LEDGER_FILE):
+        print("Cannot resume, " + LEDGER_FILE + " is not found")
+        sys.exit(1)
+
+    ledger = open_ledger(LEDGER_FILE)
+    store = results_store.open_store(RESULTS_STORE) if RESULTS_STORE else None
+
+    if args.resume:
+        attrs_names, knobs_list = load_plan(ledger)
+        indices = resume_ledger(ledger, knobs_list)
+        log("Resuming " + DESIGN + " deisgn in " + PLATFORM + ", {:d} of {:d} runs left".format(len(indices), len(knobs_list)))
+    else:
+        print("Running " + DESIGN + " deisgn in " + PLATFORM,  file=open(DOE_LOG, "w"))
+        plan_start = time.perf_counter()
+        attrs_names, knobs_list = prepare_samples()
+        num_samples = len(knobs_list)
+        knobs_list, multiplicity = dedupe_knobs(knobs_list)
+        plan_time = time.perf_counter() - plan_start
+        save_plan(ledger, attrs_names, knobs_list, multiplicity)
+
+        log("{:d} runs will be executed".format(len(knobs_list)))
+        log("{:d} knob vectors sampled, {:d} duplicates merged".format(num_samples, num_samples - len(knobs_list)))
+        log("sample plan: {:.2f}s to generate, {:.2f}s to generate and save, {:.1f} MiB of knobs, peak RSS {:.1f} MiB".format(plan_time, time.perf_counter() - plan_start, knobs_list.nbytes / 1024**2, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+        log(attrs_names)
+        log_knobs(knobs_list)
+        indices = reuse_results(ledger, knobs_list, range(len(knobs_list)))
+
+    templates = load_templates()
+    tool_versions = {"synth": get_tool_version(["yosys", "-V"])}
+    stage_sources = {"synth": []}
+    for source_file in ["./designs/" + PLATFORM + "/" + DESIGN + "/config.mk", PLATFORM_DIR + "/config.mk"]:
+        with open(source_file, "r") as rf:
+            stage_sources["synth"].append(rf.read())
+
+    adopted = {}
+    if BACKEND == "remote" and not doe_worker.token:
+        print("Set " + doe_worker.TOKEN_ENV + " to the token of the workers")
+        sys.exit(1)
+    if BACKEND != "local":
+        connect_workers(WORKERS if BACKEND == "remote" else start_local_workers())
+        log("{:d} workers with {:d} slots: {}".format(len(workers), sum(worker["slots"] for worker in workers.values()), ", ".join(workers)))
+        if args.resume:
+            adopted = adopt_remote_runs(indices)
+            indices = [idx for idx in indices if idx not in adopted]
+
+    jobs = build_jobs(knobs_list, indices)
+    pending = [job for job in jobs if job["parent"] is None]
+    if FIDELITY_RUNGS:
+        log("successive halving: {:d} runs in {:d} rounds, rungs {}".format(len(indices), FIDELITY_ROUNDS, ", ".join("{} (top {:g})".format(target, fraction) for target, fraction in FIDELITY_RUNGS)))
+    if PREFIX_TREE:
+        log("prefix tree: {:d} jobs for {:d} runs, {:d} stage runs instead of {:d}".format(len(jobs), len(indices), sum(get_job_stages(job) for job in jobs), len(STAGES) * len(indices)))
+
+    # Each slot is a "process" number running one job in its own workspace
+    # (see get_job_workspace). In "queue" mode a slot is refilled with
+    # the next knob vector as soon as its run is harvested; in "wave" mode no run
+    # is started until every slot of the previous wave is free again. Either way
+    # admit_job can hold back the next job while memory or CPU are short.
+    # With workers, there is one slot per worker slot.
+    if BACKEND == "local":
+        num_slots = NUM_PROCESS
     else:
-        for p in processes:
-          p.join()
-    
-    for process in range(current_process_num):
-        knobs = knobs_list[knob_iter + process]
-        clock = knobs[attrs_names.index("CLK_PERIOD")]
-        core_utilization = knobs[attrs_names.index("CORE_UTILIZATION")]
-        core_aspect_ratio = knobs[attrs_names.index("ASPECT_RATIO")]
-        cell_pad_in_sites_global_placement = knobs[attrs_names.index("GP_PAD")]
-        cell_pad_in_sites_detail_placement = knobs[attrs_names.index("DP_PAD")]
-        place_density = knobs[attrs_names.index("PLACE_DENSITY")]
-        layer_adjustment = knobs[attrs_names.index("LAYER_ADJUST")]
-        flatten = knobs[attrs_names.index("FLATTEN")]
-        abc_clock_period_in_ps = knobs[attrs_names.index("ABC_CLOCK_PERIOD")]
-        pins_distance = knobs[attrs_names.index("PINS_DISTANCE")]
-        cts_cluster_size = knobs[attrs_names.index("CTS_CLUSTER_SIZE")]
-        cts_cluster_diameter = knobs[attrs_names.index("CTS_CLUSTER_DIAMETER")]
-        gr_overflow = knobs[attrs_names.index("GR_OVERFLOW")]
-        
-        sep_layer_adjustments = []
-        sep_la_names = ""
-        for key in attrs_names:
-          layer_adjustment_re = re.search("LAYER_ADJUST_(\w+)", key)
-          if layer_adjustment_re:
-            vars()[layer_adjustment_re.group(0)] = knobs[attrs_names.index(layer_adjustment_re.group(0))]
-            sep_la_names += "_{}_{:.1f}".format(layer_adjustment_re.group(1), vars()[layer_adjustment_re.group(0)])
-        
-        target_folder = "data/" + DESIGN + "_CORE_UTILIZATION_{:.2f}_CLOCK_{:.4f}_ASRATIO_{:.2f}_GPPAD_{:.0f}_DPPAD_{:.0f}_PLACE_DENSITY_{:.2f}_LAYER_ADJUST_{:.1f}{}_FLATTEN_{:.0f}_ABC_CLOCK_{:.1f}_PINS_DISTANCE_{:.0f}_CTS_SIZE_{:.0f}_CTS_DIAMETER_{:.0f}_ALLOW_OVERFLOW_{:.0f}".format(core_utilization, clock, core_aspect_ratio, cell_pad_in_sites_global_placement, cell_pad_in_sites_detail_placement, place_density, layer_adjustment, sep_la_names, flatten, abc_clock_period_in_ps, pins_distance, cts_cluster_size, cts_cluster_diameter, gr_overflow)
-
-        os.mkdir(target_folder)
-        
-        for data_folder in ["results", "logs", "reports", "objects"]:
+        num_slots = sum(worker["slots"] for worker in workers.values() if worker["alive"])
+        if num_slots == 0:
+            print("No worker is available")
+            sys.exit(1)
+    free_slots = list(range(num_slots))
+    running = {}
+    for idx, address in sorted(adopted.items()):
+        job = new_job(jobs, idx, "finish", None, 0)
+        workspace = get_job_workspace(job)
+        cache_keys, flow_files = setup_run(workspace, knobs_list[idx])
+        process = free_slots.pop(0)
+        running[process] = {"job": job, "idx": idx, "proc": RemoteRun(address, workspace), "start": time.time(),
+                            "stage": None, "stage_start": time.time(), "metrics": {},
+                            "workspace": workspace, "flow_files": flow_files, "cache_keys": {}}
+        start_runs(ledger, [idx], None)
+        log("run {:d} taken over from worker {} in process{:d}".format(idx, address, process))
+    busy_time = 0.0
+    setup_time = 0.0
+    setup_count = 0
+    run_status = {}
+    fidelity_stats = {}
+    max_running = 0
+    sweep_start = time.time()
+
+    if SCRATCH_RUNS_DIR is not None:
+        mover = threading.Thread(target=move_workspaces, daemon=True)
+        mover.start()
+        log("scratch staging: workspaces in {}, up to {:d} queued for the mover".format(SCRATCH_RUNS_DIR, SCRATCH_QUEUE_SIZE))
+
+    while True:
+        if not pending and not running and not mover_stats["queued"]:
+            if SAMPLING != "adaptive" or len(knobs_list) >= ADAPTIVE_SAMPLES:
+                break
+            observations = get_observations(ledger)
+            Y = get_objectives(observations)
+            log("adaptive sampling: {:d} runs observed, {:d} on the pareto front".format(len(observations), len(get_pareto_front(Y))))
+            new_knobs = propose_samples(knobs_list, observations, min(ADAPTIVE_BATCH, ADAPTIVE_SAMPLES - len(knobs_list)))
+            new_knobs, multiplicity = dedupe_knobs(new_knobs, knobs_list)
+            if len(new_knobs) == 0:
+                break
+            indices = list(range(len(knobs_list), len(knobs_list) + len(new_knobs)))
+            knobs_list = np.vstack([knobs_list, new_knobs])
+            extend_plan(ledger, new_knobs, indices[0], multiplicity)
+            log("adaptive sampling: runs {:d} to {:d} proposed".format(indices[0], indices[-1]))
+            log_knobs(new_knobs)
+            indices = reuse_results(ledger, knobs_list, indices)
+            jobs = build_jobs(knobs_list, indices)
+            pending = [job for job in jobs if job["parent"] is None]
+
+        if SCHEDULE_MODE == "queue" or not running:
+            group_rss = get_group_rss() if BACKEND == "local" and ADMISSION_CONTROL and running else {}
+            while free_slots and pending and admit_job(pending[0], running, group_rss):
+                process = free_slots.pop(0)
+                job = pending.pop(0)
+                setup_start = time.perf_counter()
+                workspace = get_job_workspace(job)
+                if "requeued" in job:
+                    cache_keys, flow_files = job.pop("requeued")
+                else:
+                    cache_keys, flow_files = setup_run(workspace, knobs_list[job["idx"]])
+                    if job["parent"] is not None:
+                        fork_checkpoint(workspace, job)
+                        cache_keys = {}
+                    job["cache_hits"] = []
+                    for stage in list(cache_keys):
+                        if restore_stage(stage, cache_keys[stage], workspace):
+                            del cache_keys[stage]
+                            job["cache_hits"].append(stage)
+                setup_time += time.perf_counter() - setup_start
+                setup_count += 1
+                if BACKEND == "local":
+                    p = run_make_design(workspace + "/Makefile", job["target"])
+                else:
+                    try:
+                        p = submit_remote(workspace, job["target"], flow_files)
+                    except (OSError, RuntimeError) as e:
+                        log("cannot submit run {:d}: {}".format(job["idx"], e))
+                        job["requeued"] = (cache_keys, flow_files)
+                        pending.insert(0, job)
+                        free_slots.insert(0, process)
+                        break
+                start_runs(ledger, [leaf["idx"] for leaf in get_job_leaves(job)], p.pid)
+                running[process] = {"job": job, "idx": job["idx"], "proc": p, "start": time.time(),
+                                    "stage": None, "stage_start": time.time(), "metrics": {},
+                                    "workspace": workspace, "flow_files": flow_files,
+                                    "cache_keys": cache_keys}
+            max_running = max(max_running, len(running))
+
+        time.sleep(POLL_INTERVAL)
+        if BACKEND != "local":
+            refresh_workers()
+        if SCRATCH_RUNS_DIR is not None:
+            finish_moves()
+
+        for process in list(running):
+            run = running[process]
+            job = run["job"]
+            if BACKEND != "local" and run["proc"].lost():
+                log("run {:d} in process{:d} lost with worker {}, re-queued".format(run["idx"], process, run["proc"].address))
+                requeue_run(run, pending)
+                del running[process]
+                free_slots.append(process)
+                free_slots.sort()
+                continue
+            now = time.time()
+            if "kill" in run:
+                # killed run, harvested once its process group is gone
+                exit_code = finish_kill(run["proc"], run["kill"]["deadline"])
+                if exit_code is None:
+                    continue
+                status = run["kill"]["status"]
+            else:
+                exit_code = run["proc"].poll()
+                status = "done" if exit_code == 0 else "failed"
+            elapsed = now - run["start"]
+            if exit_code is None:
+                stage = get_run_stage(run["workspace"]) if BACKEND == "local" else run["proc"].stage()
+                if stage != run["stage"]:
+                    run["stage"] = stage
+                    run["stage_start"] = now
+                stage_limit = STAGE_TIME_OUT.get(stage)
+                prune_reason = check_prune(run) if EARLY_TERMINATION else None
+                if elapsed > TIME_OUT:
+                    log("time out, killing run {:d} in process{:d} after {:.1f}s".format(run["idx"], process, elapsed))
+                    status = "timeout"
+                elif stage_limit is not None and now - run["stage_start"] > stage_limit:
+                    log("{} stage time out, killing run {:d} in process{:d}".format(stage, run["idx"], process))
+                    status = "timeout"
+                elif prune_reason is not None:
+                    log("pruning run {:d} in process{:d} after {:.1f}s: {}".format(run["idx"], process, elapsed, prune_reason))
+                    status = "pruned"
+                else:
+                    continue
+                # the slot stays busy until the run is gone, the other runs are polled meanwhile
+                run["kill"] = {"status": status, "deadline": start_kill(run["proc"])}
+                continue
+
+            if BACKEND != "local":
+                try:
+                    fetch_remote(run["proc"])
+                except (OSError, RuntimeError) as e:
+                    log("cannot fetch run {:d} in process{:d} from worker {}, re-queued: {}".format(run["idx"], process, run["proc"].address, e))
+                    requeue_run(run, pending)
+                    del running[process]
+                    free_slots.append(process)
+                    free_slots.sort()
+                    continue
+
+            busy_time += elapsed
+            if job["target"] != "finish" and status == "done":
+                # prefix job: its children continue from the saved results
+                job["checkpoint"] = run["workspace"]
+                job["forks"] = 0
+                learn_profiles(job["checkpoint"], job)
+                for stage, key in run["cache_keys"].items():
+                    store_stage(stage, key, job["checkpoint"])
+                if "rung" in job:
+                    # rung job: waits for the rest of its rung to be ranked
+                    job["score"] = get_fidelity_score(job)
+                    job["flow_files"] = run["flow_files"]
+                    job["rung"]["stopped"].append(job)
+                    log("run {:d} stopped at {} in process{:d} after {:.1f}s, score {}".format(run["idx"], job["target"], process, elapsed, "missing" if job["score"] is None else "{:g}".format(job["score"])))
+                else:
+                    pending[0:0] = job["children"]
+                    log("prefix job {:d} (run {:d}) done up to {} in process{:d} after {:.1f}s, forking {:d} jobs".format(job["id"], run["idx"], job["target"], process, elapsed, len(job["children"])))
+            elif SCRATCH_RUNS_DIR is not None:
+                queue_move(run["workspace"], harvest_job, run, status, exit_code, elapsed, process)
+            else:
+                harvest_job(run["workspace"], run, status, exit_code, elapsed, process)
+
+            if "rung" in job:
+                promoted, stopped = finish_rung_job(jobs, job)
+                if promoted or stopped:
+                    log("rung {} done: {:d} runs stopped, promoting {}".format(job["target"], len(stopped), ", ".join(str(child["idx"]) for child in promoted) or "none"))
+                    stats = fidelity_stats.setdefault(job["target"], [0, 0])
+                    stats[0] += len(stopped)
+                    stats[1] += len(promoted)
+                for stopped_job in stopped:
+                    if SCRATCH_RUNS_DIR is not None:
+                        queue_move(stopped_job["checkpoint"], harvest_stopped_job, stopped_job)
+                    else:
+                        harvest_stopped_job(stopped_job["checkpoint"], stopped_job)
+                pending[0:0] = promoted
+
+            del running[process]
+            free_slots.append(process)
+            free_slots.sort()
+
+    makespan = time.time() - sweep_start
+    log("{} schedule: {:d} runs, makespan {:.1f}s, slot utilization {:.1f}%".format(SCHEDULE_MODE, len(knobs_list), makespan, 100 * busy_time / max(num_slots * makespan, 1e-9)))
+    log("run setup: {:.2f}s in total, {:.1f}ms per job, {:d} shared flow files".format(setup_time, 1000 * setup_time / max(setup_count, 1), len(written_files)))
+    if STAGE_CACHE:
+        log("stage cache: {:d} hits, {:d} misses, {:d} stored, {:d} evicted".format(cache_stats["hit"], cache_stats["miss"], cache_stats["store"], cache_stats["evict"]))
+    if ADMISSION_CONTROL:
+        log("admission control: up to {:d} of {:d} slots in use".format(max_running, num_slots))
+        for stage in STAGES:
+            profile = get_stage_profile(stage)
+            log("  {} profile: {:.2f} GiB, {:.1f} cores from {:d} runs".format(stage, profile["mem"] / 1024**3, profile["cpu"], len(stage_profiles[stage]["mem"])))
+    if FIDELITY_RUNGS:
+        for target, _ in FIDELITY_RUNGS:
+            stopped, promoted = fidelity_stats.get(target, [0, 0])
+            log("successive halving: {:d} runs stopped at {}, {:d} promoted".format(stopped, target, promoted))
+    if SAMPLING == "adaptive":
+        observations = get_observations(ledger)
+        front = get_pareto_front(get_objectives(observations))
+        log("adaptive sampling: pareto front of {:d} runs: {}".format(len(observations), ", ".join(str(list(observations)[i]) for i in front)))
+    if SCRATCH_RUNS_DIR is not None:
+        move_queue.put(None)
+        mover.join()
+        log("scratch mover: {:d} runs, {:.2f} GiB moved in {:.1f}s, up to {:d} runs queued".format(mover_stats["moved"], mover_stats["size"] / 1024**3, mover_stats["time"], mover_stats["max_queue"]))
+    apply_pareto_policy(ledger)
+    if harvest_stats["runs"]:
+        if zstd_tool is None and any(action == "zstd" for pattern, action in HARVEST_POLICY):
+            log("harvest policy: zstd is not on the PATH, files were not compressed")
+        log("harvest policy: {:d} runs, {:d} files, {:.2f} GiB harvested, {:.2f} GiB stored, {:.1f}% saved "
+            "(zstd {:.2f} GiB, drop {:.2f} GiB, pareto {:.2f} GiB, dedup {:.2f} GiB)".format(
+            harvest_stats["runs"], harvest_stats["files"], harvest_stats["size"] / 1024**3, harvest_stats["stored"] / 1024**3,
+            100 * (1 - harvest_stats["stored"] / max(harvest_stats["size"], 1)),
+            *[harvest_stats[action] / 1024**3 for action in ["zstd", "drop", "pareto", "dedup"]]))
+    num_reused = ledger.execute("SELECT COUNT(*) FROM runs WHERE state = 'reused'").fetchone()[0]
+    if num_reused:
+        run_status["reused"] = num_reused
+    log("run status: " + ", ".join("{} {:d}".format(k, v) for k, v in sorted(run_status.items())))
+
+    if BACKEND == "local_workers":
+        for address in workers:
             try:
-                shutil.move(data_folder + "/process" + str(process), target_folder + "/" + data_folder)
-            except:
-                print("no " + data_folder + "/process" + str(process) + " is found for current run")
-        
-        shutil.move("./designs/" + PLATFORM + "/" + DESIGN + "_parallel/process" + str(process), target_folder + "/design")
-        shutil.move("Makefile_process" + str(process), target_folder + "/Makefile")
-        
-        for mk_file in glob.glob("./platforms/" + PLATFORM + "/*.mk"):
-          shutil.copy2(mk_file, target_folder)
-    
-    knob_iter += current_process_num
+                doe_worker.request(address, {"op": "shutdown"})
+            except (OSError, RuntimeError):
+                pass